@@ -1,5 +1,9 @@
 from math import ceil, floor, sqrt
 import copy
+import importlib
+import os
+import sys
+import time
 import numpy
 
 from math import cos, sin, tan, atan2, asin
@@ -10,15 +14,16 @@ from math import pi as PI
 FORMATION_PHASE = 1
 DESTINATION_PHASE = 2
 
+# Velocity obstacle variants for ws_model['mode']
+MODES = ('VO', 'RVO', 'HRVO')
+# HRVO falls back to the RVO apex when the cone legs are this close to parallel
+HRVO_MIN_DET = 1e-3
+
 
 def arrange_in_line(num_bots, start_point, spacing):
     """Generate a list of target positions for bots to arrange in a straight line."""
-    formation_positions = []
-    for i in range(num_bots):
-        x_pos = start_point[0] + i * spacing
-        y_pos = start_point[1]
-        formation_positions.append([x_pos, y_pos])
-    return formation_positions
+    offsets = numpy.arange(num_bots)[:, None] * [spacing, 0.0]
+    return (numpy.asarray(start_point, dtype=float) + offsets).tolist()
 
 
 def distance(p1, p2):
@@ -27,26 +32,25 @@ def distance(p1, p2):
 
 
 def RVO_two_phase_update(X, V_des, V_current, ws_model, phase, formation_points=None):
-    """ Two-phase movement: Formation first, then proceed to destination """
-    if phase == FORMATION_PHASE:
-        # Move to formation points
-        V_new = []
-        for i in range(len(X)):
-            desired_formation = formation_points[i]
-            V_new.append([desired_formation[0] - X[i][0], desired_formation[1] - X[i][1]])
-        return RVO_update(X, V_new, V_current, ws_model)
-
-    elif phase == DESTINATION_PHASE:
+    """
+    Two-phase movement: Formation first, then proceed to destination.
+    phase is a single phase for all bots or one phase per bot (see formation.Formation).
+    """
+    forming = numpy.asarray(phase) == FORMATION_PHASE
+    if not forming.any():
         # Move to final destination (V_des)
         return RVO_update(X, V_des, V_current, ws_model)
+    # Move to formation points
+    P = numpy.asarray(X, dtype=float).reshape(-1, 2)
+    to_formation = numpy.asarray(formation_points, dtype=float).reshape(-1, 2) - P
+    V_new = to_formation if forming.all() else numpy.where(forming.reshape(-1, 1), to_formation, V_des)
+    return RVO_update(X, V_new.tolist(), V_current, ws_model)
 
 
 def check_formation_complete(X, formation_points, tolerance=0.1):
     """Check if all bots have reached their formation points."""
-    for i in range(len(X)):
-        if distance(X[i], formation_points[i]) > tolerance:
-            return False
-    return True
+    d = numpy.asarray(X, dtype=float).reshape(-1, 2) - numpy.asarray(formation_points, dtype=float).reshape(-1, 2)
+    return bool(((d ** 2).sum(axis=1) <= tolerance * tolerance).all())
 
 
 
@@ -66,107 +70,345 @@ def distance_r(pose1, pose2, width1, height1, width2, height2):
     return max(dist_x, 0) + max(dist_y, 0) + 0.001
 
 
-def RVO_update(X, V_des, V_current, ws_model):
-    """ Compute the best velocity given desired velocity, current velocity, and workspace model """
-    SAFETY_MARGIN = 1  # More conservative safety margin to ensure no collisions
-    ROB_RAD = ws_model['robot_radius'] + SAFETY_MARGIN
-    V_opt = list(V_current)
+def RVO_update(X, V_des, V_current, ws_model, time_budget=None, scheduler=None):
+    """
+    Compute the best velocity given desired velocity, current velocity, and workspace model.
+    An optional scheduler (see scheduler.InteractionScheduler) supplies the per-agent
+    velocity obstacles instead of rebuilding every pair each tick; the backend's
+    pack_cones converts them to its own layout.
+    """
+    if time_budget is not None:
+        return RVO_update_budgeted(X, V_des, V_current, ws_model, time_budget, scheduler)[0]
+    backend = get_backend(ws_model)
+    if scheduler is not None:
+        if not hasattr(backend, 'pack_cones'):
+            raise ValueError("RVO backend %s cannot take the cones of a scheduler, it has no pack_cones"
+                             % backend.__name__)
+        agent_RVOs = agent_RVO_builder(X, V_current, ws_model, scheduler)
+        cones = backend.pack_cones(X, [agent_RVOs(i) for i in range(len(X))], ws_model)
+    else:
+        cones = backend.build_cones(X, V_current, ws_model)
+    return backend.select_velocity(X, V_des, V_current, cones, ws_model)
+
+
+# Compute backends: name -> module implementing build_cones, select_velocity and
+# compute_V_des, and pack_cones to take the cones of a scheduler. Modules are imported on first use so optional dependencies
+# (e.g. numba) are only needed when their backend is selected.
+BACKENDS = {
+    'python': __name__,
+    'numpy': 'rvo_numpy',
+    'numba': 'rvo_numba',
+}
+
+
+def register_backend(name, module_name):
+    """ Register a module implementing build_cones, select_velocity, compute_V_des and (optionally) pack_cones """
+    BACKENDS[name] = module_name
+
+
+def get_backend(ws_model=None):
+    """ Backend module chosen by ws_model['backend'], else $RVO_BACKEND, else 'python' """
+    name = (ws_model or {}).get('backend') or os.environ.get('RVO_BACKEND', 'python')
+    if name not in BACKENDS:
+        raise ValueError("Unknown RVO backend %r, choose from %s" % (name, sorted(BACKENDS)))
+    if BACKENDS[name] == __name__:
+        return sys.modules[__name__]
+    return importlib.import_module(BACKENDS[name])
+
+
+def build_cones(X, V_current, ws_model):
+    """ Reference backend: list of velocity obstacles per agent, each agent pair built once """
+    ROB_RAD = ws_model['robot_radius'] + 1
+    mode = cone_mode(ws_model)
+    cones = [[] for _ in range(len(X))]
+    for i in range(len(X)):
+        for j in range(i + 1, len(X)):
+            if is_neighbor(X[i], X[j], ws_model):
+                RVO_ij, RVO_ji = pair_RVOs(X[i], X[j], V_current[i], V_current[j], robot_dimensions(ws_model, i),
+                                           robot_dimensions(ws_model, j), ROB_RAD, mode)
+                cones[i].append(RVO_ij)
+                cones[j].append(RVO_ji)
+        cones[i].extend(obstacle_RVOs(X[i], robot_dimensions(ws_model, i), ws_model, ROB_RAD))
+    return cones
+
 
+def pack_cones(X, agent_cones, ws_model):
+    """ Reference backend: the per-agent velocity obstacle lists of a scheduler are used as they are """
+    return agent_cones
+
+
+def select_velocity(X, V_des, V_current, cones, ws_model):
+    """ Reference backend: pick the admissible velocity closest to V_des for every agent """
+    V_opt = list(V_current)
     for i in range(len(X)):
-        vA = [V_current[i][0], V_current[i][1]]
-        pA = [X[i][0], X[i][1]]
-        width_A, height_A = ws_model['robot_dimensions'][i]
-        RVO_BA_all = []
+        # Calculate velocity based on updated RVOs
+        if ws_model.get('search_resolution'):
+            vA_post = intersect_coarse_to_fine(X[i], V_des[i], cones[i], ws_model['search_resolution'])
+        else:
+            vA_post = intersect(X[i], V_des[i], cones[i])
+        V_opt[i] = post_velocity(X[i], vA_post, V_current[i], ws_model)
+    return V_opt
 
+
+# Candidate grids (angular step, radial samples) used by RVO_update_budgeted,
+# from the reference grid down to the cheapest fallback.
+ANYTIME_LEVELS = [(0.05, 10), (0.1, 5), (0.2, 3)]
+
+
+def RVO_update_budgeted(X, V_des, V_current, ws_model, time_budget, scheduler=None):
+    """
+    Deadline-aware RVO_update.
+    Agents are solved nearest-conflict first; whenever the projected cost of the
+    remaining agents exceeds the time left, the candidate grid drops to the next
+    cheaper level in ANYTIME_LEVELS. Agents not reached before the deadline keep a
+    damped copy of their previous velocity.
+    Returns V_opt and the number of degraded (coarser or unsolved) agents.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    V_opt = list(V_current)
+    level = 0
+    degraded = 0
+    order = conflict_order(X)
+    agent_RVOs = agent_RVO_builder(X, V_current, ws_model, scheduler)
+
+    for n, i in enumerate(order):
+        now = time.perf_counter()
+        if now >= deadline:
+            for k in order[n:]:
+                V_opt[k] = [0.9 * V_current[k][0], 0.9 * V_current[k][1]]
+            degraded += len(order) - n
+            break
+        if n and level < len(ANYTIME_LEVELS) - 1:
+            # Average time per agent so far, scaled to the remaining agents
+            projected = (now - start) / n * (len(order) - n)
+            if projected > deadline - now:
+                level += 1
+
+        RVO_BA_all = agent_RVOs(i)
+        d_theta, n_rad = ANYTIME_LEVELS[level]
+        vA_post = intersect(X[i], V_des[i], RVO_BA_all, d_theta, n_rad)
+        V_opt[i] = post_velocity(X[i], vA_post, V_current[i], ws_model)
+        if level:
+            degraded += 1
+
+    return V_opt, degraded
+
+
+def agent_RVO_builder(X, V_current, ws_model, scheduler=None):
+    """ Return a function i -> RVO_BA_all for the current tick """
+    if scheduler is None:
+        pair_memo = {}
+        return lambda i: build_agent_RVOs(i, X, V_current, ws_model, pair_memo)
+    scheduler.update(X, V_current, ws_model)
+    return scheduler.agent_RVOs
+
+
+def conflict_order(X):
+    """ Agent indices sorted by distance to their nearest neighbour (closest first) """
+    nearest = []
+    for i in range(len(X)):
+        d_min = float('inf')
         for j in range(len(X)):
             if i != j:
-                vB = [V_current[j][0], V_current[j][1]]
-                pB = [X[j][0], X[j][1]]
-                width_B, height_B = ws_model['robot_dimensions'][j]
-
-                # Translating velocity
-                transl_vB_vA = [pA[0] + 0.5 * (vB[0] + vA[0]), pA[1] + 0.5 * (vB[1] + vA[1])]
-
-                # Calculate the safe separation distance with a margin
-                dist_BA = distance_r(pA, pB, width_A, height_A, width_B, height_B)
-                theta_BA = atan2(pB[1] - pA[1], pB[0] - pA[0])
-
-                # Enforce a larger minimum separation (avoid last-second adjustments)
-                MIN_SEPARATION = 4 * ROB_RAD  # Minimum distance they must maintain
-                if dist_BA < MIN_SEPARATION:
-                    dist_BA = MIN_SEPARATION  # Adjust to ensure safe separation
-
-                theta_BAort = asin(MIN_SEPARATION / dist_BA)
-                theta_ort_left = theta_BA + theta_BAort
-                bound_left = [cos(theta_ort_left), sin(theta_ort_left)]
-                theta_ort_right = theta_BA - theta_BAort
-                bound_right = [cos(theta_ort_right), sin(theta_ort_right)]
-
-                RVO_BA = [transl_vB_vA, bound_left, bound_right, dist_BA, MIN_SEPARATION]
-                RVO_BA_all.append(RVO_BA)
-
-        # For circular obstacles
-        for hole in ws_model['circular_obstacles']:
-            vB = [0, 0]
-            pB = hole[0:2]
-            transl_vB_vA = [pA[0] + vB[0], pA[1] + vB[1]]
-
-            # Circular obstacle distance unchanged
-            dist_BA = distance_r(pA, pB, width_A, height_A, hole[2], hole[2])
-            theta_BA = atan2(pB[1] - pA[1], pB[0] - pA[0])
-
-            # Over-approximation of square to circular obstacle
-            OVER_APPROX_C2S = 1.5
-            rad = hole[2] * OVER_APPROX_C2S
-            if (rad + ROB_RAD) > dist_BA:
-                dist_BA = rad + ROB_RAD
-
-            theta_BAort = asin((rad + ROB_RAD) / dist_BA)
-            theta_ort_left = theta_BA + theta_BAort
-            bound_left = [cos(theta_ort_left), sin(theta_ort_left)]
-            theta_ort_right = theta_BA - theta_BAort
-            bound_right = [cos(theta_ort_right), sin(theta_ort_right)]
-
-            RVO_BA = [transl_vB_vA, bound_left, bound_right, dist_BA, rad + ROB_RAD]
+                d_min = min(d_min, (X[i][0] - X[j][0])**2 + (X[i][1] - X[j][1])**2)
+        nearest.append(d_min)
+    return sorted(range(len(X)), key=lambda i: nearest[i])
+
+
+def build_agent_RVOs(i, X, V_current, ws_model, pair_memo=None):
+    """
+    Collect the velocity obstacles [apex, bound_left, bound_right, dist, rad] induced on agent i.
+    With a pair_memo dict shared across the agents of one tick, every unordered pair is
+    built once: the cone for the other agent is stored under (j, i) and used when j is built.
+    """
+    SAFETY_MARGIN = 1  # More conservative safety margin to ensure no collisions
+    ROB_RAD = ws_model['robot_radius'] + SAFETY_MARGIN
+    pA = [X[i][0], X[i][1]]
+    RVO_BA_all = []
+
+    for j in range(len(X)):
+        if i != j and is_neighbor(pA, X[j], ws_model):
+            if pair_memo is not None and (i, j) in pair_memo:
+                RVO_BA_all.append(pair_memo.pop((i, j)))
+                continue
+            RVO_BA, RVO_AB = agent_pair_RVOs(i, j, X, V_current, ws_model, ROB_RAD)
+            if pair_memo is not None:
+                pair_memo[(j, i)] = RVO_AB
             RVO_BA_all.append(RVO_BA)
 
-        # Calculate velocity based on updated RVOs
-        vA_post = intersect(pA, V_des[i], RVO_BA_all)
+    RVO_BA_all.extend(obstacle_RVOs(pA, robot_dimensions(ws_model, i), ws_model, ROB_RAD))
+    return RVO_BA_all
 
-        # Adjust speed if too close
-        if distance(X[i], pA) < MIN_SEPARATION:
-            speed_reduction_factor = 0.5  # Reduce speed when too close
-            V_opt[i] = [speed_reduction_factor * vA_post[0],
-                        speed_reduction_factor * vA_post[1]]
-        else:
-            V_opt[i] = [0.9 * vA_post[0] + 0.1 * V_current[i][0],  # Smoothed velocity update
-                        0.9 * vA_post[1] + 0.1 * V_current[i][1]]
 
-    return V_opt
+def cone_mode(ws_model):
+    """ Velocity obstacle variant chosen by ws_model['mode'] (default 'RVO') """
+    mode = ws_model.get('mode', 'RVO')
+    if mode not in MODES:
+        raise ValueError("Unknown velocity obstacle mode %r, choose from %s" % (mode, list(MODES)))
+    return mode
 
 
-def intersect(pA, vA, RVO_BA_all):
+def robot_dimensions(ws_model, i):
+    """ (width, height) of agent i; a square of side 2 * robot_radius without ws_model['robot_dimensions'] """
+    if ws_model.get('robot_dimensions') is None:
+        return (2 * ws_model['robot_radius'], 2 * ws_model['robot_radius'])
+    return ws_model['robot_dimensions'][i]
+
+
+def is_neighbor(pA, pB, ws_model):
+    """ True if agent B is within ws_model['neighbor_radius'] (centre distance) of A; no limit when unset """
+    R = ws_model.get('neighbor_radius')
+    return R is None or (pA[0] - pB[0])**2 + (pA[1] - pB[1])**2 <= R * R
+
+
+def agent_pair_RVOs(i, j, X, V_current, ws_model, ROB_RAD):
+    """
+    (cone on agent i, cone on agent j), always evaluated from the lower index so the
+    result does not depend on which of the two agents is built first
+    """
+    mode = cone_mode(ws_model)
+    if i < j:
+        return pair_RVOs(X[i], X[j], V_current[i], V_current[j], robot_dimensions(ws_model, i),
+                         robot_dimensions(ws_model, j), ROB_RAD, mode)
+    RVO_j, RVO_i = pair_RVOs(X[j], X[i], V_current[j], V_current[i], robot_dimensions(ws_model, j),
+                             robot_dimensions(ws_model, i), ROB_RAD, mode)
+    return RVO_i, RVO_j
+
+
+def pair_RVO(pA, pB, vA, vB, dim_A, dim_B, ROB_RAD, mode='RVO'):
+    """ Reciprocal velocity obstacle induced on agent A by agent B """
+    return pair_RVOs(pA, pB, vA, vB, dim_A, dim_B, ROB_RAD, mode)[0]
+
+
+def pair_RVOs(pA, pB, vA, vB, dim_A, dim_B, ROB_RAD, mode='RVO'):
+    """
+    Velocity obstacles of one pair, (induced on A by B, induced on B by A).
+    Clearance and bearing are shared and the bearing B->A is the bearing A->B
+    plus pi, so B's cone is A's cone with negated bounds at B's own apex.
+    """
+    width_A, height_A = dim_A
+    width_B, height_B = dim_B
+
+    # Calculate the safe separation distance with a margin
+    dist_BA = distance_r(pA, pB, width_A, height_A, width_B, height_B)
+    theta_BA = atan2(pB[1] - pA[1], pB[0] - pA[0])
+
+    # Enforce a larger minimum separation (avoid last-second adjustments)
+    MIN_SEPARATION = 4 * ROB_RAD  # Minimum distance they must maintain
+    if dist_BA < MIN_SEPARATION:
+        dist_BA = MIN_SEPARATION  # Adjust to ensure safe separation
+
+    theta_BAort = asin(MIN_SEPARATION / dist_BA)
+    theta_ort_left = theta_BA + theta_BAort
+    bound_left = [cos(theta_ort_left), sin(theta_ort_left)]
+    theta_ort_right = theta_BA - theta_BAort
+    bound_right = [cos(theta_ort_right), sin(theta_ort_right)]
+
+    # Translating velocity
+    offset_A, offset_B = apex_offsets(mode, pA, pB, vA, vB, bound_left, bound_right)
+    transl_vB_vA = [pA[0] + offset_A[0], pA[1] + offset_A[1]]
+    transl_vA_vB = [pB[0] + offset_B[0], pB[1] + offset_B[1]]
+
+    return ([transl_vB_vA, bound_left, bound_right, dist_BA, MIN_SEPARATION],
+            [transl_vA_vB, [-bound_left[0], -bound_left[1]], [-bound_right[0], -bound_right[1]],
+             dist_BA, MIN_SEPARATION])
+
+
+def apex_offsets(mode, pA, pB, vA, vB, bound_left, bound_right):
+    """
+    Apex offsets of the cones of one pair, (from pA for A's cone, from pB for B's cone).
+    VO: the other agent's velocity. RVO: the mean velocity (vA + vB) / 2.
+    HRVO: the RVO apex slid along the leg on the side the agent is passing on until
+    it meets the VO's other leg, so crossing over to the other side costs the full
+    VO and agents stop dithering between sides (Snape et al., 2011).
+    """
+    if mode == 'VO':
+        return [vB[0], vB[1]], [vA[0], vA[1]]
+    half_vAB = [0.5 * (vB[0] + vA[0]), 0.5 * (vB[1] + vA[1])]
+    if mode == 'RVO':
+        return half_vAB, half_vAB
+    det = bound_right[0] * bound_left[1] - bound_right[1] * bound_left[0]
+    if det < HRVO_MIN_DET:
+        return half_vAB, half_vAB
+    wx, wy = vA[0] - vB[0], vA[1] - vB[1]
+    if (pB[0] - pA[0]) * wy - (pB[1] - pA[1]) * wx > 0:
+        # Passing B on the left: RVO left leg, VO right leg
+        s = 0.5 * (wx * bound_left[1] - wy * bound_left[0]) / det
+        side = bound_right
+    else:
+        s = -0.5 * (wx * bound_right[1] - wy * bound_right[0]) / det
+        side = bound_left
+    return [vB[0] + s * side[0], vB[1] + s * side[1]], [vA[0] - s * side[0], vA[1] - s * side[1]]
+
+
+def obstacle_rows(ws_model):
+    """
+    Circular obstacles as [x, y, r, vx, vy] rows: the static ws_model['circular_obstacles']
+    at rest, then the moving ws_model['dynamic_obstacles'] (see obstacles.py)
+    """
+    rows = [[hole[0], hole[1], hole[2], 0, 0] for hole in ws_model['circular_obstacles']]
+    rows.extend(list(row) for row in ws_model.get('dynamic_obstacles', []))
+    return rows
+
+
+def obstacle_RVOs(pA, dim_A, ws_model, ROB_RAD):
+    """
+    Velocity obstacles induced on an agent at pA by the circular obstacles. Obstacles
+    do not react to the agents, so the apex of a moving one is translated by its full velocity.
+    """
+    width_A, height_A = dim_A
+    RVO_BA_all = []
+    for hole in obstacle_rows(ws_model):
+        vB = hole[3:5]
+        pB = hole[0:2]
+        transl_vB_vA = [pA[0] + vB[0], pA[1] + vB[1]]
+
+        # Circular obstacle distance unchanged
+        dist_BA = distance_r(pA, pB, width_A, height_A, hole[2], hole[2])
+        theta_BA = atan2(pB[1] - pA[1], pB[0] - pA[0])
+
+        # Over-approximation of square to circular obstacle
+        OVER_APPROX_C2S = 1.5
+        rad = hole[2] * OVER_APPROX_C2S
+        if (rad + ROB_RAD) > dist_BA:
+            dist_BA = rad + ROB_RAD
+
+        theta_BAort = asin((rad + ROB_RAD) / dist_BA)
+        theta_ort_left = theta_BA + theta_BAort
+        bound_left = [cos(theta_ort_left), sin(theta_ort_left)]
+        theta_ort_right = theta_BA - theta_BAort
+        bound_right = [cos(theta_ort_right), sin(theta_ort_right)]
+
+        RVO_BA = [transl_vB_vA, bound_left, bound_right, dist_BA, rad + ROB_RAD]
+        RVO_BA_all.append(RVO_BA)
+    return RVO_BA_all
+
+
+def post_velocity(pA, vA_post, vA, ws_model):
+    """ Turn the velocity picked by intersect into the commanded velocity """
+    SAFETY_MARGIN = 1
+    MIN_SEPARATION = 4 * (ws_model['robot_radius'] + SAFETY_MARGIN)
+
+    # Adjust speed if too close
+    if distance(pA, pA) < MIN_SEPARATION:
+        speed_reduction_factor = 0.5  # Reduce speed when too close
+        return [speed_reduction_factor * vA_post[0],
+                speed_reduction_factor * vA_post[1]]
+    return [0.9 * vA_post[0] + 0.1 * vA[0],  # Smoothed velocity update
+            0.9 * vA_post[1] + 0.1 * vA[1]]
+
+
+def intersect(pA, vA, RVO_BA_all, d_theta=0.05, n_rad=10):
     norm_v = distance(vA, [0, 0])
     suitable_V = []
     unsuitable_V = []
 
     # Sweep through possible velocities
-    for theta in numpy.arange(0, 2 * PI, 0.05):
-        for rad in numpy.arange(0.02, norm_v + 0.02, norm_v / 10.0):
+    for theta in numpy.arange(0, 2 * PI, d_theta):
+        for rad in numpy.arange(0.02, norm_v + 0.02, norm_v / n_rad):
             new_v = [rad * cos(theta), rad * sin(theta)]
-            suit = True
-            for RVO_BA in RVO_BA_all:
-                p_0 = RVO_BA[0]
-                left = RVO_BA[1]
-                right = RVO_BA[2]
-                dif = [new_v[0] + pA[0] - p_0[0], new_v[1] + pA[1] - p_0[1]]
-                theta_dif = atan2(dif[1], dif[0])
-                theta_right = atan2(right[1], right[0])
-                theta_left = atan2(left[1], left[0])
-                if in_between(theta_right, theta_dif, theta_left):
-                    suit = False
-                    break
-            if suit:
+            if is_suitable(pA, new_v, RVO_BA_all):
                 suitable_V.append(new_v)
             else:
                 unsuitable_V.append(new_v)
@@ -178,18 +420,100 @@ def intersect(pA, vA, RVO_BA_all):
     return vA_post
 
 
+def is_suitable(pA, new_v, RVO_BA_all):
+    """ True if new_v lies outside every velocity obstacle in RVO_BA_all """
+    for RVO_BA in RVO_BA_all:
+        p_0 = RVO_BA[0]
+        left = RVO_BA[1]
+        right = RVO_BA[2]
+        dif = [new_v[0] + pA[0] - p_0[0], new_v[1] + pA[1] - p_0[1]]
+        theta_dif = atan2(dif[1], dif[0])
+        theta_right = atan2(right[1], right[0])
+        theta_left = atan2(left[1], left[0])
+        if in_between(theta_right, theta_dif, theta_left):
+            return False
+    return True
+
+
+def intersect_coarse_to_fine(pA, vA, RVO_BA_all, resolution=0.01, coarse_grid=(16, 4)):
+    """
+    Multi-resolution version of intersect.
+    A coarse (theta, rad) grid is evaluated first, then a 3x3 neighbourhood around the
+    best admissible and the best inadmissible candidate is refined, halving the grid
+    spacing each level until the angular spacing drops below resolution (rad).
+    """
+    norm_v = distance(vA, [0, 0])
+    rad_min, rad_max = 0.0, norm_v + 0.02
+    n_theta, n_rad = coarse_grid
+    d_theta = 2 * PI / n_theta
+    d_rad = (rad_max - rad_min) / n_rad
+
+    best = {True: None, False: None}
+    best_dist = {True: float('inf'), False: float('inf')}
+
+    def evaluate(theta, rad):
+        rad = min(max(rad, rad_min), rad_max)
+        new_v = [rad * cos(theta), rad * sin(theta)]
+        suit = is_suitable(pA, new_v, RVO_BA_all)
+        dist = distance(new_v, vA)
+        if dist < best_dist[suit]:
+            best_dist[suit] = dist
+            best[suit] = (theta, rad)
+
+    # The desired velocity itself is the ideal candidate in open space
+    evaluate(atan2(vA[1], vA[0]), norm_v - 0.001)
+    if best[True] is None:
+        for k in range(n_theta):
+            for m in range(1, n_rad + 1):
+                evaluate(k * d_theta, rad_min + m * d_rad)
+
+        while d_theta > resolution:
+            d_theta *= 0.5
+            d_rad *= 0.5
+            for seed in [best[True], best[False]]:
+                if seed is None:
+                    continue
+                for dk in (-1, 0, 1):
+                    for dm in (-1, 0, 1):
+                        if dk or dm:
+                            evaluate(seed[0] + dk * d_theta, seed[1] + dm * d_rad)
+
+    theta, rad = best[True] if best[True] is not None else best[False]
+    return [rad * cos(theta), rad * sin(theta)]
+
+
 def compute_V_des(X, goal, V_max):
     V_des = []
     for i in range(len(X)):
         dif_x = [goal[i][k] - X[i][k] for k in range(2)]
         norm = distance(dif_x, [0, 0])
-        norm_dif_x = [dif_x[k] * V_max[k] / norm for k in range(2)]
+        norm_dif_x = [dif_x[k] * V_max[i] / norm for k in range(2)]
         V_des.append(norm_dif_x[:])
         if reach(X[i], goal[i], 0.1):
             V_des[i][0] = 0
             V_des[i][1] = 0
     return V_des
 
+
+def compute_V_des_batch(X, goal, V_max, bound=0.1, slowdown_radius=None):
+    """
+    Desired velocities of all agents in one array operation.
+    Each agent heads for its goal at its own V_max[i] and stops within `bound` of it;
+    with slowdown_radius the speed ramps down linearly inside that distance so agents
+    settle on their goal instead of oscillating around it.
+    Returns V_des as an (N, 2) array and the boolean arrival mask.
+    """
+    P = numpy.asarray(X, dtype=float).reshape(-1, 2)
+    dif_x = numpy.asarray(goal, dtype=float).reshape(-1, 2) - P
+    norm = numpy.sqrt((dif_x ** 2).sum(axis=1))
+    speed = numpy.broadcast_to(numpy.asarray(V_max, dtype=float), norm.shape).copy()
+    if slowdown_radius:
+        speed *= numpy.minimum(norm / slowdown_radius, 1.0)
+    arrived = norm < bound
+    speed[arrived] = 0.0
+    V_des = dif_x * (speed / numpy.where(arrived, 1.0, norm))[:, None]
+    return V_des, arrived
+
 def reach(p1, p2, bound=0.5):
     return distance(p1, p2) < bound
 
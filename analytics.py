@@ -0,0 +1,171 @@
+"""
+Per-agent analytics of recorded runs (recording.Trajectory).
+
+TrajectoryAnalytics streams a recording chunk by chunk, so memory stays
+bounded by the chunk size however long the run was. It carries the last two
+frames of a chunk into the next one for the finite differences. Per agent it
+reports:
+    path_length       distance travelled
+    time_to_goal      time of the first frame within reach_bound of the goal, nan if never
+    detour_ratio      path_length over the straight distance from the start to the goal
+                      (to the final position for recordings without goals)
+    rms_jerk          RMS of the second difference of the recorded velocities over step**2
+    near_misses       times another agent came closer than near_miss (box clearance)
+    near_miss_time    seconds spent closer than near_miss to some agent
+
+    python analytics.py a.traj b.traj --processes 4 --near-miss 1.0
+
+analyze_many processes several recordings in parallel, one process per recording.
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import sys
+
+import numpy as np
+
+from recording import Trajectory
+from spatial import neighbor_pairs
+
+ANALYTICS_COLUMNS = ('path_length', 'time_to_goal', 'detour_ratio', 'rms_jerk', 'near_misses', 'near_miss_time')
+
+
+class TrajectoryAnalytics:
+    """ Streaming accumulator over consecutive chunks of frames (positions and velocities) """
+    def __init__(self, n_agents, step, half, goal=None, reach_bound=0.1, near_miss=None):
+        self.n_agents, self.step = n_agents, step
+        self.half = np.asarray(half, dtype=float).reshape(-1, 2)
+        self.goal = None if goal is None else np.asarray(goal, dtype=float).reshape(-1, 2)
+        self.reach_bound = reach_bound
+        if near_miss is None:
+            near_miss = float(self.half.max()) if n_agents else 0.0
+        self.near_miss = near_miss
+        box_reach = 2 * float(np.hypot(*self.half.max(axis=0))) if n_agents else 0.0
+        self.search_radius = np.sqrt(2) * near_miss + box_reach
+        self.frames = 0
+        self.start = None
+        self.tail_X = self.tail_V = None
+        self.path_length = np.zeros(n_agents)
+        self.time_to_goal = np.full(n_agents, np.nan)
+        self.jerk_sq = np.zeros(n_agents)
+        self.jerk_count = 0
+        self.near_misses = np.zeros(n_agents, dtype=np.int64)
+        self.near_miss_ticks = np.zeros(n_agents, dtype=np.int64)
+        self.close_pairs = np.empty(0, dtype=np.int64)
+
+    def update(self, X, V):
+        """ Add the next chunk: X, V (K, N, 2) """
+        X = np.asarray(X, dtype=float)
+        V = np.asarray(V, dtype=float)
+        if not len(X):
+            return
+        if self.start is None:
+            self.start = X[0].copy()
+        X_run = X if self.tail_X is None else np.concatenate([self.tail_X[-1:], X])
+        V_run = V if self.tail_V is None else np.concatenate([self.tail_V, V])
+
+        self.path_length += np.sqrt((np.diff(X_run, axis=0) ** 2).sum(axis=2)).sum(axis=0)
+        if len(V_run) > 2:
+            jerk = np.diff(V_run, n=2, axis=0) / self.step ** 2
+            self.jerk_sq += (jerk ** 2).sum(axis=2).sum(axis=0)
+            self.jerk_count += len(jerk)
+        if self.goal is not None:
+            reached = np.sqrt(((X - self.goal) ** 2).sum(axis=2)) < self.reach_bound
+            first = np.argmax(reached, axis=0)
+            new = np.isnan(self.time_to_goal) & reached.any(axis=0)
+            self.time_to_goal[new] = (self.frames + first[new]) * self.step
+        for P in X:
+            self.near_miss_frame(P)
+
+        self.frames += len(X)
+        self.tail_X = X_run[-2:].copy()
+        self.tail_V = V_run[-2:].copy()
+
+    def near_miss_frame(self, P):
+        """ Count the pairs of one frame closer than near_miss, and the ones that just got that close """
+        I, J = neighbor_pairs(P, self.search_radius)
+        gap = np.abs(P[I] - P[J]) - (self.half[I] + self.half[J])
+        close = np.maximum(gap, 0).sum(axis=1) < self.near_miss
+        I, J = I[close], J[close]
+        pairs = np.minimum(I, J) * self.n_agents + np.maximum(I, J)
+        entered = ~np.isin(pairs, self.close_pairs, assume_unique=True)
+        np.add.at(self.near_misses, I[entered], 1)
+        np.add.at(self.near_misses, J[entered], 1)
+        involved = np.zeros(self.n_agents, dtype=bool)
+        involved[I] = involved[J] = True
+        self.near_miss_ticks += involved
+        self.close_pairs = np.unique(pairs)
+
+    def result(self):
+        """ Per-agent arrays keyed by ANALYTICS_COLUMNS """
+        if self.start is None:
+            straight = np.zeros(self.n_agents)
+        else:
+            end = self.goal if self.goal is not None else self.tail_X[-1]
+            straight = np.sqrt(((end - self.start) ** 2).sum(axis=1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            detour = np.where(straight > 0, self.path_length / straight, np.nan)
+            rms_jerk = np.sqrt(self.jerk_sq / self.jerk_count) if self.jerk_count else np.full(self.n_agents, np.nan)
+        return {'path_length': self.path_length, 'time_to_goal': self.time_to_goal, 'detour_ratio': detour,
+                'rms_jerk': rms_jerk, 'near_misses': self.near_misses,
+                'near_miss_time': self.near_miss_ticks * self.step}
+
+
+def analyze(path, chunk=1024, reach_bound=0.1, near_miss=None):
+    """ TrajectoryAnalytics.result of one recording, read chunk frames at a time """
+    trajectory = Trajectory(path)
+    goal = trajectory.header.get('goal')
+    analytics = TrajectoryAnalytics(trajectory.n_agents, trajectory.step, trajectory.dimensions() / 2,
+                                    goal, reach_bound, near_miss)
+    n = trajectory.n_agents
+    for start in range(0, len(trajectory), chunk):
+        frames = np.asarray(trajectory.frames[start:start + chunk, :n * 4], dtype=float).reshape(-1, n, 4)
+        analytics.update(frames[..., 0:2], frames[..., 2:4])
+    return analytics.result()
+
+
+def summary(result):
+    """ Fleet-wide scalars of an analyze result """
+    reached = ~np.isnan(result['time_to_goal'])
+    return {'agents': len(result['path_length']),
+            'reached': int(reached.sum()),
+            'makespan': float(result['time_to_goal'][reached].max()) if reached.any() else None,
+            'mean_path_length': float(result['path_length'].mean()) if len(result['path_length']) else 0.0,
+            'mean_detour_ratio': float(np.nanmean(result['detour_ratio'])) if np.isfinite(result['detour_ratio']).any() else None,
+            'mean_rms_jerk': float(np.nanmean(result['rms_jerk'])) if np.isfinite(result['rms_jerk']).any() else None,
+            'near_misses': int(result['near_misses'].sum()) // 2}
+
+
+def analyze_many(paths, processes=None, **kwargs):
+    """ analyze for several recordings in a process pool; results in the order of paths """
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(functools.partial(analyze, **kwargs), paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python analytics.py', description='Analyze recorded RVO trajectories.')
+    parser.add_argument('recordings', nargs='+', help='trajectory files written by simulate --record')
+    parser.add_argument('--chunk', type=int, default=1024, help='frames per chunk')
+    parser.add_argument('--reach-bound', type=float, default=0.1, help='distance at which a goal counts as reached')
+    parser.add_argument('--near-miss', type=float, help='box clearance counted as a near miss')
+    parser.add_argument('--processes', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', help='write the per-agent results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    options = {'chunk': args.chunk, 'reach_bound': args.reach_bound, 'near_miss': args.near_miss}
+    if len(args.recordings) == 1:
+        results = [analyze(args.recordings[0], **options)]
+    else:
+        results = analyze_many(args.recordings, args.processes, **options)
+    for path, result in zip(args.recordings, results):
+        print(path, json.dumps(summary(result)))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({path: {name: [None if np.isnan(v) else float(v) for v in result[name]]
+                              for name in ANALYTICS_COLUMNS}
+                       for path, result in zip(args.recordings, results)}, f)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Checkpoint/restore of simulation state.
+
+A checkpoint is a single .npz file holding the positions, velocities, goals,
+phase, tick counter and the warm-start cache of an InteractionScheduler. Values
+are stored as float64 arrays, so a restored run continues bit-identically, and
+files are written to a temporary name and moved into place so a crash never
+leaves a half-written checkpoint behind.
+
+Usage:
+    checkpointer = Checkpointer('run.ckpt.npz', every=500)
+    while t * step < total_time:
+        ...
+        checkpointer.maybe_save(t, X, V, goal, phase, scheduler)
+        t += 1
+
+    state = load_checkpoint('run.ckpt.npz', scheduler)
+    X, V, goal, phase, t = state['X'], state['V'], state['goal'], state['phase'], state['tick']
+
+Loading the same checkpoint several times starts independent "what-if" branches.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from RVO import DESTINATION_PHASE
+
+
+def save_checkpoint(path, tick, X, V, goal, phase=DESTINATION_PHASE, scheduler=None):
+    """ Atomically write the simulator state to path """
+    arrays = {
+        'tick': np.array(tick, dtype=np.int64),
+        'X': np.asarray(X, dtype=np.float64).reshape(-1, 2),
+        'V': np.asarray(V, dtype=np.float64).reshape(-1, 2),
+        'goal': np.asarray(goal, dtype=np.float64).reshape(-1, 2),
+        'phase': np.asarray(phase, dtype=np.int8),
+    }
+    if scheduler is not None:
+        arrays.update(scheduler_state(scheduler))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path, scheduler=None):
+    """
+    Read a checkpoint written by save_checkpoint.
+    Returns a dict with tick, X, V, goal (lists) and phase (int, or a list for per-agent phases).
+    When a scheduler is given its warm-start cache is restored as well.
+    """
+    with np.load(path) as data:
+        phase = data['phase']
+        state = {
+            'tick': int(data['tick']),
+            'X': data['X'].tolist(),
+            'V': data['V'].tolist(),
+            'goal': data['goal'].tolist(),
+            'phase': int(phase) if phase.ndim == 0 else phase.tolist(),
+        }
+        if scheduler is not None and 'scheduler_keys' in data:
+            load_scheduler_state(scheduler, data)
+    return state
+
+
+def scheduler_state(scheduler):
+    """ InteractionScheduler cache as flat arrays """
+    keys = sorted(scheduler.cache)
+    entries = [scheduler.cache[key] for key in keys]
+    return {
+        'scheduler_tick': np.array([scheduler.tick, scheduler.n_agents], dtype=np.int64),
+        'scheduler_keys': np.array(keys, dtype=np.int64).reshape(-1, 2),
+        'scheduler_next': np.array([e[0] for e in entries], dtype=np.int64),
+        'scheduler_bounds': np.array([e[1] + e[2] + [e[3], e[4]] for e in entries],
+                                     dtype=np.float64).reshape(-1, 6),
+        'scheduler_stats': np.array([scheduler.stats['built'], scheduler.stats['reused']], dtype=np.int64),
+    }
+
+
+def load_scheduler_state(scheduler, data):
+    tick, n_agents = data['scheduler_tick'].tolist()
+    scheduler.reset(n_agents)
+    scheduler.tick = tick
+    for (i, j), next_tick, b in zip(data['scheduler_keys'].tolist(), data['scheduler_next'].tolist(),
+                                    data['scheduler_bounds'].tolist()):
+        scheduler.cache[(i, j)] = [next_tick, b[0:2], b[2:4], b[4], b[5]]
+    scheduler.stats['built'], scheduler.stats['reused'] = data['scheduler_stats'].tolist()
+
+
+class Checkpointer:
+    """ Save a checkpoint every `every` ticks """
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+
+    def maybe_save(self, tick, X, V, goal, phase=DESTINATION_PHASE, scheduler=None):
+        if tick % self.every == 0:
+            save_checkpoint(self.path, tick, X, V, goal, phase, scheduler)
+            return True
+        return False
+
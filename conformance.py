@@ -0,0 +1,193 @@
+"""
+Conformance check of the RVO compute backends against the reference backend.
+
+Every backend is fed the reference state of each tick of the standard scenarios
+and has to return the same desired and optimal velocities within a tolerance.
+
+    python conformance.py [backend ...]
+    python conformance.py --precision
+    python conformance.py --modes
+"""
+import sys
+import tracemalloc
+
+from RVO import BACKENDS, MODES, RVO_update, get_backend
+
+
+def standard_scenarios():
+    """ (name, X, goal, V_max, ws_model, step) of the scenarios shipped with the examples """
+    crossing_X = [[-0.5 + 1.0 * i, 0.0] for i in range(7)] + [[-0.5 + 1.0 * i, 5.0] for i in range(7)]
+    crossing_goal = [[5.5 - 1.0 * i, 5.0] for i in range(7)] + [[5.5 - 1.0 * i, 0.0] for i in range(7)]
+    crossing_ws = {
+        'robot_radius': 0.2,
+        'robot_dimensions': [(0.4, 0.4) for _ in range(14)],
+        'circular_obstacles': [],
+        'boundary': []
+    }
+    obstacles_ws = dict(crossing_ws, circular_obstacles=[[-0.3, 2.5, 0.3], [1.5, 2.5, 0.3],
+                                                         [3.3, 2.5, 0.3], [5.1, 2.5, 0.3]])
+
+    bots_X = [[125, 125], [50, 50], [75, 200], [150, 50], [200, 125],
+              [225, 75], [175, 175], [100, 300], [300, 150], [50, 300]]
+    bots_goal = [[200, 200], [350, 350], [300, 50], [100, 100], [275, 275],
+                 [375, 100], [50, 50], [150, 300], [300, 300], [100, 200]]
+    bots_ws = {
+        'robot_radius': 10,
+        'robot_dimensions': [(2, 2) for _ in range(10)],
+        'circular_obstacles': [],
+        'boundary': []
+    }
+
+    return [
+        ('crossing', crossing_X, crossing_goal, [1.0] * 14, crossing_ws, 0.01),
+        ('crossing_obstacles', crossing_X, crossing_goal, [1.0] * 14, obstacles_ws, 0.01),
+        ('bots10', bots_X, bots_goal, [40] * 10, bots_ws, 0.1),
+    ]
+
+
+def max_deviation(A, B):
+    return max([abs(a[k] - b[k]) for a, b in zip(A, B) for k in range(2)] or [0.0])
+
+
+def check_backends(names=None, ticks=100, tol=1e-6, modes=MODES, resolutions=(None, 0.01)):
+    """
+    Return {backend: {scenario: max velocity deviation}} against the reference backend,
+    with the scenarios run in every velocity obstacle mode, on the fixed candidate grid
+    (resolution None) and with the coarse-to-fine search of every other resolution
+    ('crossing/HRVO', 'crossing/HRVO/0.01', ...).
+    The reference trajectory is computed once per scenario and shared by all backends.
+    """
+    reference = get_backend({'backend': 'python'})
+    names = names or [name for name in BACKENDS if name != 'python']
+    backends = {name: get_backend({'backend': name}) for name in names}
+    runs = [('%s/%s' % (scenario, mode) + ('/%g' % resolution if resolution else ''), X, goal, V_max,
+             dict(ws_model, mode=mode, search_resolution=resolution), step)
+            for resolution in resolutions for mode in modes
+            for scenario, X, goal, V_max, ws_model, step in standard_scenarios()]
+    report = {name: {} for name in names}
+    for scenario, X, goal, V_max, ws_model, step in runs:
+        X = [list(p) for p in X]
+        V = [[0, 0] for _ in X]
+        worst = dict.fromkeys(names, 0.0)
+        for t in range(ticks):
+            V_des = reference.compute_V_des(X, goal, V_max)
+            V_ref = reference.select_velocity(X, V_des, V, reference.build_cones(X, V, ws_model), ws_model)
+            for name, backend in backends.items():
+                cones = backend.build_cones(X, V, ws_model)
+                V_new = backend.select_velocity(X, V_des, V, cones, ws_model)
+                worst[name] = max(worst[name], max_deviation(V_des, backend.compute_V_des(X, goal, V_max)),
+                                  max_deviation(V_ref, V_new))
+            V = V_ref
+            X = [[X[i][0] + V[i][0] * step, X[i][1] + V[i][1] * step] for i in range(len(X))]
+        for name in names:
+            report[name][scenario] = worst[name]
+    return report
+
+
+def precision_report(ticks=100, precision='float32'):
+    """
+    Compare the compact precision mode of the numpy backend with float64.
+    Returns {scenario: {'max_dV', 'max_dX', 'max_dX_float64', 'bytes_per_agent',
+    'bytes_per_agent_float64', 'peak_bytes_per_agent', 'peak_bytes_per_agent_float64'}}:
+        max_dV          worst per-tick velocity error on identical inputs
+        max_dX          position drift between full float32 and float64 rollouts
+        max_dX_float64  drift of a float64 rollout started one float32 ulp off: the
+                        candidate grid turns tiny state differences into different
+                        picks, so max_dX is of this order rather than of float32 rounding
+        bytes_per_agent buffers returned by build_cones (rvo_numpy.memory_per_agent)
+        peak_bytes_...  tracemalloc peak of one build_cones and select_velocity
+    """
+    backend = get_backend({'backend': 'numpy'})
+    report = {}
+    for scenario, X, goal, V_max, ws_model, step in standard_scenarios():
+        ws_64 = dict(ws_model, backend='numpy', precision='float64')
+        ws_32 = dict(ws_model, backend='numpy', precision=precision)
+        X_64 = [list(p) for p in X]
+        X_32 = [list(p) for p in X]
+        X_off = [[c * (1 + 2 ** -24) for c in p] for p in X]
+        V_64 = [[0, 0] for _ in X]
+        V_32 = [[0, 0] for _ in X]
+        V_off = [[0, 0] for _ in X]
+        max_dV = 0.0
+        for t in range(ticks):
+            V_des = backend.compute_V_des(X_64, goal, V_max)
+            cones_64 = backend.build_cones(X_64, V_64, ws_64)
+            cones_32 = backend.build_cones(X_64, V_64, ws_32)
+            V_new = backend.select_velocity(X_64, V_des, V_64, cones_64, ws_64)
+            max_dV = max(max_dV, max_deviation(V_new, backend.select_velocity(X_64, V_des, V_64, cones_32, ws_32)))
+            V_64 = V_new
+            X_64 = [[X_64[i][0] + V_64[i][0] * step, X_64[i][1] + V_64[i][1] * step] for i in range(len(X))]
+
+            V_des = backend.compute_V_des(X_32, goal, V_max)
+            V_32 = backend.select_velocity(X_32, V_des, V_32, backend.build_cones(X_32, V_32, ws_32), ws_32)
+            X_32 = [[X_32[i][0] + V_32[i][0] * step, X_32[i][1] + V_32[i][1] * step] for i in range(len(X))]
+
+            V_des = backend.compute_V_des(X_off, goal, V_max)
+            V_off = backend.select_velocity(X_off, V_des, V_off, backend.build_cones(X_off, V_off, ws_64), ws_64)
+            X_off = [[X_off[i][0] + V_off[i][0] * step, X_off[i][1] + V_off[i][1] * step] for i in range(len(X))]
+        report[scenario] = {
+            'max_dV': max_dV,
+            'max_dX': max_deviation(X_64, X_32),
+            'max_dX_float64': max_deviation(X_64, X_off),
+            'bytes_per_agent': backend.memory_per_agent(cones_32),
+            'bytes_per_agent_float64': backend.memory_per_agent(cones_64),
+            'peak_bytes_per_agent': peak_memory(backend, X_64, V_des, V_64, ws_32) / len(X),
+            'peak_bytes_per_agent_float64': peak_memory(backend, X_64, V_des, V_64, ws_64) / len(X),
+        }
+    return report
+
+
+def peak_memory(backend, X, V_des, V, ws_model):
+    """ Peak bytes allocated by one build_cones and select_velocity, all temporaries included """
+    tracemalloc.start()
+    backend.select_velocity(X, V_des, V, backend.build_cones(X, V, ws_model), ws_model)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def mode_report(max_ticks=3000, backend='numpy'):
+    """
+    Ticks until every agent of the standard scenarios is within robot_radius of its
+    goal, per velocity obstacle mode: {scenario: {mode: ticks, or None if not reached}}
+    """
+    compute_V_des = get_backend({'backend': backend}).compute_V_des
+    report = {}
+    for scenario, X, goal, V_max, ws_model, step in standard_scenarios():
+        report[scenario] = {}
+        bound = ws_model['robot_radius']
+        for mode in MODES:
+            ws = dict(ws_model, mode=mode, backend=backend)
+            P = [list(p) for p in X]
+            V = [[0, 0] for _ in X]
+            report[scenario][mode] = None
+            for t in range(max_ticks):
+                V = RVO_update(P, compute_V_des(P, goal, V_max), V, ws)
+                P = [[P[i][0] + V[i][0] * step, P[i][1] + V[i][1] * step] for i in range(len(P))]
+                if all((p[0] - g[0]) ** 2 + (p[1] - g[1]) ** 2 < bound ** 2 for p, g in zip(P, goal)):
+                    report[scenario][mode] = t + 1
+                    break
+    return report
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--modes']:
+        for scenario, row in mode_report().items():
+            print('%-20s %s' % (scenario, '  '.join('%s %s' % (mode, 'not reached' if ticks is None else '%d ticks' % ticks)
+                                                      for mode, ticks in row.items())))
+        sys.exit(0)
+    if sys.argv[1:] == ['--precision']:
+        for scenario, row in precision_report().items():
+            print('%-20s max |dV| = %.3g  drift = %.3g (float64 from one ulp off: %.3g)  '
+                  'bytes/agent = %d (float64: %d)  peak bytes/agent = %d (float64: %d)'
+                  % (scenario, row['max_dV'], row['max_dX'], row['max_dX_float64'], row['bytes_per_agent'],
+                     row['bytes_per_agent_float64'], row['peak_bytes_per_agent'], row['peak_bytes_per_agent_float64']))
+        sys.exit(0)
+    tol = 1e-6
+    failed = False
+    for name, scenarios in check_backends(sys.argv[1:] or None, tol=tol).items():
+        for scenario, worst in scenarios.items():
+            status = 'ok' if worst <= tol else 'FAIL'
+            failed = failed or worst > tol
+            print('%-8s %-29s max |dV| = %.3g  %s' % (name, scenario, worst, status))
+    sys.exit(1 if failed else 0)
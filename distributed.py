@@ -0,0 +1,168 @@
+"""
+Domain-decomposed multi-process simulation with ghost zones.
+
+The workspace is split into nx x ny rectangular tiles and every tile is simulated
+by its own worker process. Each tick a worker
+    1. sends its agents within neighbor_radius of an adjacent tile to that tile
+       as read-only "ghost" agents and receives the ghosts of its neighbours,
+    2. runs the RVO step for its own agents against own + ghost agents,
+    3. moves its agents and hands the ones that left the tile to their new owner.
+Neighbouring workers talk over multiprocessing pipes. Because RVO only looks at
+agents within ws_model['neighbor_radius'], the ghosts are exactly the agents a
+single process would have considered and the result matches a single-process
+run with the same ws_model.
+
+    X, V = run_distributed(X, goal, V_max, ws_model, step, ticks, tiles=(2, 2))
+"""
+import multiprocessing
+
+from RVO import build_agent_RVOs, select_velocity, compute_V_des
+from footprint import dimensions
+
+
+def tile_rects(bounds, tiles):
+    """ (xmin, xmax, ymin, ymax) of every tile; outer edges extend to infinity so every point has an owner """
+    xmin, xmax, ymin, ymax = bounds
+    nx, ny = tiles
+    inf = float('inf')
+    xs = [xmin + (xmax - xmin) * k / nx for k in range(nx + 1)]
+    ys = [ymin + (ymax - ymin) * k / ny for k in range(ny + 1)]
+    xs[0], xs[-1], ys[0], ys[-1] = -inf, inf, -inf, inf
+    return [(xs[tx], xs[tx + 1], ys[ty], ys[ty + 1]) for ty in range(ny) for tx in range(nx)]
+
+
+def tile_of(pos, bounds, tiles):
+    """ Index of the tile owning position pos """
+    xmin, xmax, ymin, ymax = bounds
+    nx, ny = tiles
+    tx = min(max(int((pos[0] - xmin) / (xmax - xmin) * nx), 0), nx - 1)
+    ty = min(max(int((pos[1] - ymin) / (ymax - ymin) * ny), 0), ny - 1)
+    return ty * nx + tx
+
+
+def tile_neighbors(k, tiles):
+    """ Indices of the (up to 8) tiles adjacent to tile k """
+    nx, ny = tiles
+    tx, ty = k % nx, k // nx
+    return sorted((ty + dy) * nx + tx + dx for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                  if (dx or dy) and 0 <= tx + dx < nx and 0 <= ty + dy < ny)
+
+
+def rect_distance(pos, rect):
+    xmin, xmax, ymin, ymax = rect
+    dx = max(xmin - pos[0], 0, pos[0] - xmax)
+    dy = max(ymin - pos[1], 0, pos[1] - ymax)
+    return (dx ** 2 + dy ** 2) ** 0.5
+
+
+def exchange(me, conns, outgoing):
+    """
+    Send outgoing[n] to every neighbour n and return what they sent.
+    Pairs are served in increasing neighbour order and the lower id sends first,
+    which keeps the blocking pipe exchange deadlock-free.
+    """
+    incoming = {}
+    for n in sorted(conns):
+        if me < n:
+            conns[n].send(outgoing[n])
+            incoming[n] = conns[n].recv()
+        else:
+            incoming[n] = conns[n].recv()
+            conns[n].send(outgoing[n])
+    return incoming
+
+
+def tile_worker(me, agents, conns, rects, bounds, tiles, V_max, ws_model, step, ticks, results, trajectories=None):
+    """
+    Simulate the agents owned by tile `me`.
+    agents: dict global id -> [x, y, vx, vy, gx, gy, width, height]
+    """
+    R = ws_model['neighbor_radius']
+    for t in range(ticks):
+        # Ghost exchange
+        outgoing = {n: {g: a for g, a in agents.items() if rect_distance(a[0:2], rects[n]) <= R}
+                    for n in conns}
+        ghosts = {}
+        for sent in exchange(me, conns, outgoing).values():
+            ghosts.update(sent)
+
+        # RVO step for the own agents against own + ghost agents
+        # Local indices follow the global ids, so every pair is evaluated from the
+        # same side as in a single-process run
+        own = sorted(agents)
+        everyone = sorted(own + list(ghosts))
+        local = {g: k for k, g in enumerate(everyone)}
+        table = {**ghosts, **agents}
+        X = [table[g][0:2] for g in everyone]
+        V = [table[g][2:4] for g in everyone]
+        local_ws = dict(ws_model, robot_dimensions=[table[g][6:8] for g in everyone])
+        if trajectories is not None:
+            trajectories.apply(local_ws, t * step)
+        X_own = [X[local[g]] for g in own]
+        V_des = compute_V_des(X_own, [agents[g][4:6] for g in own], [V_max[g] for g in own])
+        pair_memo = {}
+        cones = [build_agent_RVOs(local[g], X, V, local_ws, pair_memo) for g in own]
+        V_new = select_velocity(X_own, V_des, [V[local[g]] for g in own], cones, local_ws)
+        for g, p, v in zip(own, X_own, V_new):
+            agents[g][0:4] = [p[0] + v[0] * step, p[1] + v[1] * step, v[0], v[1]]
+
+        # Migration of agents that left the tile
+        outgoing = {n: {} for n in conns}
+        for g in own:
+            owner = tile_of(agents[g][0:2], bounds, tiles)
+            if owner != me:
+                if owner not in outgoing:
+                    raise RuntimeError("Agent %d jumped from tile %d to non-adjacent tile %d" % (g, me, owner))
+                outgoing[owner][g] = agents.pop(g)
+        for arrived in exchange(me, conns, outgoing).values():
+            agents.update(arrived)
+
+    results.put((me, {g: a[0:4] for g, a in agents.items()}))
+
+
+def run_distributed(X, goal, V_max, ws_model, step, ticks, tiles=(2, 2), bounds=None, trajectories=None):
+    """
+    Run `ticks` steps with one worker process per tile and return the final X and V
+    in the original agent order. ws_model['neighbor_radius'] must be set and must
+    not exceed the tile size. trajectories (obstacles.ObstacleTrajectories) moves
+    dynamic obstacles; every worker evaluates them itself each tick.
+    """
+    R = ws_model.get('neighbor_radius')
+    if R is None:
+        raise ValueError("run_distributed needs ws_model['neighbor_radius']")
+    if bounds is None:
+        xs = [p[0] for p in list(X) + list(goal)]
+        ys = [p[1] for p in list(X) + list(goal)]
+        bounds = (min(xs), max(xs) + 1e-9, min(ys), max(ys) + 1e-9)
+    nx, ny = tiles
+    if (nx > 1 and R > (bounds[1] - bounds[0]) / nx) or (ny > 1 and R > (bounds[3] - bounds[2]) / ny):
+        raise ValueError("neighbor_radius %s is larger than a tile" % R)
+
+    rects = tile_rects(bounds, tiles)
+    partitions = [{} for _ in rects]
+    dims = dimensions(ws_model, len(X)).tolist()
+    for g in range(len(X)):
+        partitions[tile_of(X[g], bounds, tiles)][g] = [X[g][0], X[g][1], 0.0, 0.0, goal[g][0], goal[g][1],
+                                                       dims[g][0], dims[g][1]]
+
+    conns = [{} for _ in rects]
+    for k in range(len(rects)):
+        for n in tile_neighbors(k, tiles):
+            if k < n:
+                conns[k][n], conns[n][k] = multiprocessing.Pipe()
+
+    results = multiprocessing.Queue()
+    ws_worker = {key: value for key, value in ws_model.items() if key != 'robot_dimensions'}
+    workers = [multiprocessing.Process(target=tile_worker,
+                                       args=(k, partitions[k], conns[k], rects, bounds, tiles,
+                                             list(V_max), ws_worker, step, ticks, results, trajectories))
+               for k in range(len(rects))]
+    for w in workers:
+        w.start()
+    final = {}
+    for _ in workers:
+        final.update(results.get()[1])
+    for w in workers:
+        w.join()
+
+    return [final[g][0:2] for g in range(len(X))], [final[g][2:4] for g in range(len(X))]
@@ -36,22 +36,22 @@ total_time = 15
 # simulation step
 step = 0.01
 
-#------------------------------
-#simulation starts
-t = 0
-while t*step < total_time:
-    # compute desired vel to goal
-    V_des = compute_V_des(X, goal, V_max)
-    # compute the optimal vel to avoid collision
-    V = RVO_update(X, V_des, V, ws_model)
-    # update position
-    for i in range(len(X)):
-        X[i][0] += V[i][0]*step
-        X[i][1] += V[i][1]*step
-    #----------------------------------------
-    # visualization
-    if t%10 == 0:
-        visualize_traj_dynamic(ws_model, X, V, goal, time=t*step, name='data/snap%s.png'%str(t/10))
-        #visualize_traj_dynamic(ws_model, X, V, goal, time=t*step, name='data/snap%s.png'%str(t/10))
-    t += 1
-    
+if __name__ == "__main__":
+    #------------------------------
+    #simulation starts
+    t = 0
+    while t*step < total_time:
+        # compute desired vel to goal
+        V_des = compute_V_des(X, goal, V_max)
+        # compute the optimal vel to avoid collision
+        V = RVO_update(X, V_des, V, ws_model)
+        # update position
+        for i in range(len(X)):
+            X[i][0] += V[i][0]*step
+            X[i][1] += V[i][1]*step
+        #----------------------------------------
+        # visualization
+        if t%10 == 0:
+            visualize_traj_dynamic(ws_model, X, V, goal, time=t*step, name='data/snap%s.png'%str(t/10))
+            #visualize_traj_dynamic(ws_model, X, V, goal, time=t*step, name='data/snap%s.png'%str(t/10))
+        t += 1
@@ -1,7 +1,7 @@
 import sys
-import cv2
 import numpy as np
-from RVO import RVO_update, reach, compute_V_des, reach
+from RVO import RVO_update, reach, compute_V_des
+from formation import Formation, line_formation
 
 ###just for fun
 
@@ -12,8 +12,11 @@ from RVO import RVO_update, reach, compute_V_des, reach
 
 
 
-def draw_bots(image, positions, radius, color=(255, 0, 255), font=cv2.FONT_HERSHEY_SIMPLEX):
+def draw_bots(image, positions, radius, color=(255, 0, 255), font=None):
     """ Function to draw the positions of bots or goals on the image. """
+    import cv2
+    if font is None:
+        font = cv2.FONT_HERSHEY_SIMPLEX
     for c, i in enumerate(positions):
         x1 = int(i[0]) - radius
         y1 = int(i[1]) - radius
@@ -29,8 +32,13 @@ def update_positions(X, V, step):
     return [[X[i][0] + V[i][0] * step, X[i][1] + V[i][1] * step] for i in range(len(X))]
 
 
-def visualize_simulation(X, goal, radius, step, total_time, ws_model, V_max):
-    """ Main function to simulate and visualize bot movements with collision avoidance. """
+def visualize_simulation(X, goal, radius, step, total_time, ws_model, V_max, formation=None):
+    """
+    Main function to simulate and visualize bot movements with collision avoidance.
+    With a formation.Formation the bots first gather in the formation, each one heading
+    on to its goal as soon as it has reached its own slot.
+    """
+    import cv2  # Imported here so the module loads without OpenCV
     # Visualization setup
     initial_image = np.zeros((400, 400, 3), dtype=np.uint8)
     goal_image = np.zeros((400, 400, 3), dtype=np.uint8)
@@ -52,8 +60,13 @@ def visualize_simulation(X, goal, radius, step, total_time, ws_model, V_max):
     # Simulation loop
     t = 0
     while t * step < total_time:
-        # Compute desired velocity to goal
-        V_des = compute_V_des(X, goal, V_max)
+        # Compute desired velocity to the formation slot or goal
+        if formation is not None:
+            V_des = formation.V_des(X, V_max, slowdown_radius=radius).tolist()
+            if formation.done(X):
+                break
+        else:
+            V_des = compute_V_des(X, goal, V_max)
 
         # Compute the optimal velocity to avoid collision
         V = RVO_update(X, V_des, V, ws_model)
@@ -99,35 +112,11 @@ if __name__ == "__main__":
     total_time = 1000  # Total simulation time (s)
     step = 0.1  # Simulation step
 
-    # Run the simulation
-    visualize_simulation(X, goal, ws_model['robot_radius'], step, total_time, ws_model, V_max)
-    # Main control loop (pseudo-code)
+    # Line formation the bots gather in before heading for their goals
     num_bots = len(X)  # Number of bots
-    start_point = [0, 0]  # Starting point of the line formation
-    spacing = 1.5  # Distance between each bot in the line formation
-
-    # Generate the formation points
-    formation_points = arrange_in_line(num_bots, start_point, spacing)
-
-    phase = FORMATION_PHASE  # Start with the formation phase
-
-    while True:
-        if phase == FORMATION_PHASE:
-            # Update velocities to arrange in line
-            V_current = RVO_two_phase_update(X, V_des, V_current, ws_model, phase, formation_points)
+    start_point = [50, 375]  # Starting point of the line formation
+    spacing = 30  # Distance between each bot in the line formation
+    formation = Formation(line_formation(num_bots, start_point, spacing), goal, X=X, tolerance=1.0)
 
-            # Check if bots have arranged themselves in the line
-            if check_formation_complete(X, formation_points):
-                phase = DESTINATION_PHASE  # Move to destination phase
-
-        elif phase == DESTINATION_PHASE:
-            # Update velocities to move to final destination
-            V_current = RVO_two_phase_update(X, V_des, V_current, ws_model, phase)
-
-        # Update bot positions
-        X = update_positions(X, V_current)
-        visualize_simulation(X, goal, ws_model['robot_radius'], step, total_time, ws_model, V_max)
-
-        # Check for final goal condition (bots reaching their target destinations)
-        if all_bots_reached_goal(X, V_des):
-            break
+    # Run the simulation
+    visualize_simulation(X, goal, ws_model['robot_radius'], step, total_time, ws_model, V_max, formation)
@@ -0,0 +1,58 @@
+"""
+Array-backed rectangular robot footprints.
+
+Every agent is an axis-aligned box described by its half-extents (hw, hh).
+ws_model['robot_dimensions'] holds full (width, height) pairs, one per agent;
+without it every agent is a square of side 2 * robot_radius.
+
+box_clearance reproduces RVO.distance_r (sum of the per-axis gaps, 0 when the
+boxes overlap) for whole arrays of agents, so clearances for any fleet size and
+mix of robot sizes come out of a single vectorized pass.
+"""
+import numpy as np
+
+from spatial import neighbor_pairs
+
+
+def dimensions(ws_model, n, dtype=np.float64):
+    """ (n, 2) array of agent (width, height) """
+    if ws_model.get('robot_dimensions') is None:
+        side = 2 * ws_model['robot_radius']
+        return np.full((n, 2), side, dtype=dtype)
+    dims = np.asarray(ws_model['robot_dimensions'], dtype=dtype).reshape(-1, 2)
+    if len(dims) < n:
+        raise ValueError("ws_model['robot_dimensions'] has %d entries for %d agents" % (len(dims), n))
+    return dims[:n]
+
+
+def half_extents(ws_model, n, dtype=np.float64):
+    """ (n, 2) array of agent half-extents """
+    return dimensions(ws_model, n, dtype) / 2
+
+
+def box_clearance(pA, pB, half_A, half_B):
+    """ RVO.distance_r over broadcast positions (..., 2) and half-extents (..., 2) """
+    gap = np.abs(pA - pB) - (half_A + half_B)
+    dist = np.maximum(gap[..., 0], 0) + np.maximum(gap[..., 1], 0) + 0.001
+    return np.where((gap[..., 0] < 0) & (gap[..., 1] < 0), 0.0, dist)
+
+
+def all_pairs_clearance(P, half):
+    """ (N, N) clearance between every pair of agents """
+    P = np.asarray(P, dtype=half.dtype).reshape(-1, 2)
+    return box_clearance(P[:, None, :], P[None, :, :], half[:, None, :], half[None, :, :])
+
+
+def neighbor_clearance(P, half, radius):
+    """ (I, J, clearance) for the unordered agent pairs within centre distance radius """
+    P = np.asarray(P, dtype=half.dtype).reshape(-1, 2)
+    I, J = neighbor_pairs(P, radius)
+    return I, J, box_clearance(P[I], P[J], half[I], half[J])
+
+
+def circle_box_clearance(P, half, circles):
+    """ (N, H) Euclidean clearance between agent boxes and circles [x, y, rad], 0 when they touch """
+    P = np.asarray(P, dtype=half.dtype).reshape(-1, 2)
+    circles = np.asarray(circles, dtype=half.dtype).reshape(-1, 3)
+    gap = np.maximum(np.abs(P[:, None, :] - circles[None, :, :2]) - half[:, None, :], 0)
+    return np.maximum(np.sqrt((gap ** 2).sum(axis=2)) - circles[None, :, 2], 0)
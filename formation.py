@@ -0,0 +1,126 @@
+"""
+Two-phase formation control: gather in a formation, then head for the goals.
+
+Formation slots are computed once as an (N, 2) array (line, grid, circle or a
+shape sampled from an image) and assigned to the agents up front. Every tick
+Formation.update compares all agents with their slots in one array operation and
+switches each agent to DESTINATION_PHASE as soon as it has reached its own slot,
+so early arrivals move on while the others are still forming.
+
+    formation = Formation(circle_formation(len(X), (200, 200), 80), goal, X=X)
+    while not formation.done(X):
+        V_des = formation.V_des(X, V_max)
+        V = RVO_update(X, V_des, V, ws_model)
+        ...
+"""
+import numpy as np
+
+from RVO import FORMATION_PHASE, DESTINATION_PHASE, compute_V_des_batch
+
+
+def line_formation(n, start, spacing, direction=(1.0, 0.0)):
+    """ n slots `spacing` apart from start along direction """
+    direction = np.asarray(direction, dtype=float)
+    direction = direction / np.hypot(*direction)
+    return np.asarray(start, dtype=float) + np.arange(n)[:, None] * spacing * direction
+
+
+def grid_formation(n, origin, spacing, columns=None):
+    """ n slots on a row-major grid starting at origin; square-ish unless columns is given """
+    if columns is None:
+        columns = max(int(np.ceil(np.sqrt(n))), 1)
+    k = np.arange(n)
+    cells = np.stack([k % columns, k // columns], axis=1)
+    return np.asarray(origin, dtype=float) + cells * np.broadcast_to(np.asarray(spacing, dtype=float), (2,))
+
+
+def circle_formation(n, center, radius, start_angle=0.0):
+    """ n slots evenly spread on a circle """
+    theta = start_angle + 2 * np.pi * np.arange(n) / max(n, 1)
+    return np.asarray(center, dtype=float) + radius * np.stack([np.cos(theta), np.sin(theta)], axis=1)
+
+
+def image_formation(image, n, origin=(0.0, 0.0), scale=1.0, threshold=128, dark=True):
+    """
+    n slots spread over the shape of an image (a path or a 2D/3D array):
+    pixels darker than threshold (brighter with dark=False) form the shape, and
+    slots are picked by farthest-point sampling so they cover it evenly.
+    Pixel (col, row) maps to origin + scale * (col, row).
+    """
+    if isinstance(image, str):
+        from PIL import Image  # Only needed when reading image files
+        image = np.asarray(Image.open(image).convert('L'))
+    image = np.asarray(image, dtype=float)
+    if image.ndim == 3:
+        image = image[..., :3].mean(axis=2)
+    mask = image < threshold if dark else image >= threshold
+    rows, cols = np.nonzero(mask)
+    if len(rows) < n:
+        raise ValueError("Image shape has %d pixels for %d slots" % (len(rows), n))
+    pixels = np.stack([cols, rows], axis=1).astype(float)
+
+    chosen = np.empty(n, dtype=np.int64)
+    chosen[0] = np.argmin(pixels[:, 0] + pixels[:, 1])
+    nearest = ((pixels - pixels[chosen[0]]) ** 2).sum(axis=1)
+    for k in range(1, n):
+        chosen[k] = np.argmax(nearest)
+        nearest = np.minimum(nearest, ((pixels - pixels[chosen[k]]) ** 2).sum(axis=1))
+    return np.asarray(origin, dtype=float) + scale * pixels[chosen]
+
+
+def assign_slots(X, slots):
+    """
+    Reorder slots so agent i gets slots[i]: greedy nearest pairs first, which
+    keeps paths short and mostly uncrossed.
+    """
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    slots = np.asarray(slots, dtype=float).reshape(-1, 2)
+    if len(slots) < len(P):
+        raise ValueError("%d formation slots for %d agents" % (len(slots), len(P)))
+    d = ((P[:, None, :] - slots[None, :, :]) ** 2).sum(axis=2)
+    agent_free = np.ones(len(P), dtype=bool)
+    slot_free = np.ones(len(slots), dtype=bool)
+    assigned = np.empty((len(P), 2))
+    for flat in np.argsort(d, axis=None, kind='stable'):
+        i, j = divmod(int(flat), len(slots))
+        if agent_free[i] and slot_free[j]:
+            assigned[i] = slots[j]
+            agent_free[i] = slot_free[j] = False
+            if not agent_free.any():
+                break
+    return assigned
+
+
+def formation_reached(X, targets, tolerance=0.1):
+    """ Boolean mask of the agents within tolerance of their formation slot """
+    d = np.asarray(X, dtype=float).reshape(-1, 2) - np.asarray(targets, dtype=float).reshape(-1, 2)
+    return (d ** 2).sum(axis=1) <= tolerance * tolerance
+
+
+class Formation:
+    def __init__(self, slots, goal, X=None, tolerance=0.1):
+        """ With X the slots are assigned to the nearest agents, otherwise agent i takes slots[i] """
+        self.targets = assign_slots(X, slots) if X is not None else np.asarray(slots, dtype=float).reshape(-1, 2)
+        self.goal = np.asarray(goal, dtype=float).reshape(-1, 2)
+        self.tolerance = tolerance
+        self.phase = np.full(len(self.goal), FORMATION_PHASE, dtype=np.int8)
+
+    def update(self, X):
+        """ Move the agents that reached their slot on to DESTINATION_PHASE; returns the phase array """
+        forming = self.phase == FORMATION_PHASE
+        self.phase[forming & formation_reached(X, self.targets, self.tolerance)] = DESTINATION_PHASE
+        return self.phase
+
+    def current_targets(self):
+        """ (N, 2) formation slot or goal of every agent, depending on its phase """
+        return np.where((self.phase == FORMATION_PHASE)[:, None], self.targets, self.goal)
+
+    def V_des(self, X, V_max, bound=0.1, slowdown_radius=None):
+        """ Update the phases and return the desired velocities towards the current targets """
+        self.update(X)
+        return compute_V_des_batch(X, self.current_targets(), V_max, bound, slowdown_radius)[0]
+
+    def done(self, X, bound=0.1):
+        """ True once every agent is in DESTINATION_PHASE and at its goal """
+        d = np.asarray(X, dtype=float).reshape(-1, 2) - self.goal
+        return bool((self.phase == DESTINATION_PHASE).all() and ((d ** 2).sum(axis=1) < bound * bound).all())
@@ -0,0 +1,127 @@
+"""
+Per-frame latency instrumentation for the interactive apps.
+
+A FrameTimer splits every frame into named phases (solver, draw, image
+conversion, event loop) and records their durations. Nested phases are
+exclusive: time spent in 'image' inside 'draw' counts for 'image' only, and
+'total' is the whole frame. Each frame goes into a ring of the last `window`
+frames, which feeds the overlay text and export_frames. It is also added to
+fixed log-spaced histograms covering the whole run (export_histograms), and
+appended to a metrics.ColumnLog when one is given.
+
+    timer = FrameTimer()
+    while running:
+        timer.start_frame()
+        with timer.phase('solver'):
+            V = RVO_update(X, V_des, V, ws_model)
+        with timer.phase('draw'):
+            ...
+            with timer.phase('image'):
+                photo = ImageTk.PhotoImage(tile)
+        with timer.phase('events'):
+            root.update()
+        timer.end_frame()
+    timer.export_histograms('frames_hist.csv')
+
+With log=metrics.ColumnLog(path, FRAME_COLUMNS) every frame is kept on disk and
+can be read back with metrics.read_columns.
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+PHASES = ('solver', 'draw', 'image', 'events')
+# Columns of a metrics.ColumnLog passed as log= with the default phases
+FRAME_COLUMNS = ('frame',) + PHASES + ('total',)
+# Histogram bin edges in milliseconds; the last bin collects everything above 1 s
+HISTOGRAM_EDGES_MS = np.concatenate([[0.0], np.geomspace(0.1, 1000.0, 41)])
+
+
+class FrameTimer:
+    def __init__(self, phases=PHASES, window=240, edges=HISTOGRAM_EDGES_MS, log=None, clock=time.perf_counter):
+        self.columns = tuple(phases) + ('total',)
+        self.index = {name: k for k, name in enumerate(self.columns)}
+        self.window = window
+        self.edges = np.asarray(edges, dtype=float)
+        self.log = log
+        self.clock = clock
+        self.recent = np.zeros((window, len(self.columns)))
+        self.histograms = np.zeros((len(self.columns), len(self.edges)), dtype=np.int64)
+        self.frames = 0
+        self.current = np.zeros(len(self.columns))
+        self.stack = []
+        self.frame_start = None
+
+    def start_frame(self):
+        self.current[:] = 0
+        self.frame_start = self.clock()
+
+    @contextmanager
+    def phase(self, name):
+        """ Time a phase of the current frame, excluding the phases nested in it """
+        k = self.index[name]
+        start = self.clock()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            nested = self.stack.pop()
+            self.current[k] += elapsed - nested
+            if self.stack:
+                self.stack[-1] += elapsed
+
+    def end_frame(self):
+        """ Close the current frame; returns its phase durations in ms """
+        self.current[-1] = self.clock() - self.frame_start
+        ms = self.current * 1000.0
+        self.recent[self.frames % self.window] = ms
+        bins = np.searchsorted(self.edges, ms, side='right') - 1
+        self.histograms[np.arange(len(self.columns)), bins] += 1
+        if self.log is not None:
+            row = dict(zip(self.columns, ms))
+            row['frame'] = self.frames
+            self.log.append(row)
+        self.frames += 1
+        return {name: float(value) for name, value in zip(self.columns, ms)}
+
+    def recent_frames(self):
+        """ (n, phases + 1) durations in ms of the frames in the window, oldest first """
+        if self.frames <= self.window:
+            return self.recent[:self.frames]
+        return np.roll(self.recent, -(self.frames % self.window), axis=0)
+
+    def stats(self):
+        """ {phase: (mean, p95, max)} in ms over the window """
+        recent = self.recent_frames()
+        if not len(recent):
+            return {name: (0.0, 0.0, 0.0) for name in self.columns}
+        mean, p95, worst = recent.mean(axis=0), np.percentile(recent, 95, axis=0), recent.max(axis=0)
+        return {name: (mean[k], p95[k], worst[k]) for k, name in enumerate(self.columns)}
+
+    def overlay_text(self):
+        """ Multi-line summary of the window for an on-screen overlay """
+        stats = self.stats()
+        fps = 1000.0 / stats['total'][0] if stats['total'][0] > 0 else 0.0
+        lines = ['%.0f fps over %d frames  (mean / p95 / max ms)' % (fps, len(self.recent_frames()))]
+        lines += ['%-7s %6.1f %6.1f %6.1f' % ((name,) + stats[name]) for name in self.columns]
+        return '\n'.join(lines)
+
+    def export_histograms(self, path):
+        """ CSV of the frame counts per duration bin and phase over the whole run """
+        upper = np.append(self.edges[1:], np.inf)
+        with open(path, 'w') as f:
+            f.write(','.join(('from_ms', 'to_ms') + self.columns) + '\n')
+            for b in range(len(self.edges)):
+                f.write(','.join(['%g' % self.edges[b], '%g' % upper[b]]
+                                 + ['%d' % count for count in self.histograms[:, b]]) + '\n')
+
+    def export_frames(self, path):
+        """ CSV of the per-frame durations in the window """
+        recent = self.recent_frames()
+        first = self.frames - len(recent)
+        with open(path, 'w') as f:
+            f.write(','.join(('frame',) + self.columns) + '\n')
+            for k, row in enumerate(recent):
+                f.write(','.join(['%d' % (first + k)] + ['%.4f' % value for value in row]) + '\n')
@@ -0,0 +1,206 @@
+"""
+Differential correctness and performance gate for solver variants.
+
+A candidate RVO_update (a backend name, or any function with RVO_update's
+signature given as module:function) runs side by side with the reference on
+randomized seeded scenarios:
+    lockstep   both solve the reference state of every tick; the candidate's V_opt
+               has to match within tol and both are timed on identical inputs
+    rollout    the candidate then drives its own rollout, whose minimum separation
+               (box clearance) and box overlaps (metrics.SafetyMetrics) must be no
+               worse than the reference rollout's
+The speedup is the reference time over the candidate time on the same machine,
+so baselines stay comparable across machines. With a baseline file the gate
+fails when the speedup drops more than `threshold` (a fraction) below the
+stored one.
+
+    python gate.py numpy --seeds 5 --baseline gate_baseline.json --update-baseline
+    python gate.py numpy --seeds 5 --baseline gate_baseline.json --threshold 0.2
+    python gate.py mysolver:RVO_update --reference numpy
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from RVO import BACKENDS, RVO_update, compute_V_des
+from conformance import max_deviation
+from metrics import SafetyMetrics
+
+
+def random_scenario(seed, n_agents=20, n_obstacles=3, size=400.0):
+    """ Seeded (X, goal, V_max, ws_model, step) with agents of mixed box sizes and circular obstacles """
+    rng = np.random.default_rng(seed)
+    robot_radius = 10
+    spacing = 4 * (robot_radius + 1)
+
+    def scatter(count, taken):
+        points = []
+        while len(points) < count:
+            p = rng.random(2) * size
+            if all(np.hypot(*(p - q)) > spacing for q in taken + points):
+                points.append(p)
+        return points
+
+    holes = scatter(n_obstacles, [])
+    X = scatter(n_agents, holes)
+    goal = scatter(n_agents, holes)
+    ws_model = {
+        'robot_radius': robot_radius,
+        'robot_dimensions': (rng.uniform(2, 2 * robot_radius, (n_agents, 2))).tolist(),
+        'circular_obstacles': [[p[0], p[1], float(rng.uniform(2, 8))] for p in holes],
+        'boundary': []
+    }
+    V_max = rng.uniform(20, 40, n_agents).tolist()
+    return [p.tolist() for p in X], [p.tolist() for p in goal], V_max, ws_model, 0.1
+
+
+def load_solver(spec):
+    """ (name, update) for a backend name or a module:function with RVO_update's signature """
+    if spec in BACKENDS:
+        return spec, lambda X, V_des, V, ws_model: RVO_update(X, V_des, V, dict(ws_model, backend=spec))
+    module, _, function = spec.partition(':')
+    if not function:
+        raise ValueError("Unknown solver %r: give a backend (%s) or module:function" % (spec, ', '.join(BACKENDS)))
+    return spec, getattr(importlib.import_module(module), function)
+
+
+def differential(candidate, reference='python', seeds=range(5), ticks=40, tol=1e-6, **scenario):
+    """
+    Run one candidate against the reference on every seed. Returns
+    {'max_dV', 'mismatched_ticks', 'separation', 'overlaps', 'reference_seconds',
+     'candidate_seconds', 'speedup', 'seeds': {seed: {...}}}; separation and overlaps
+    are the worst candidate rollout values minus the reference ones.
+    """
+    ref_name, ref_update = load_solver(reference)
+    cand_name, cand_update = load_solver(candidate)
+    rows = {}
+    for seed in seeds:
+        X0, goal, V_max, ws_model, step = random_scenario(seed, **scenario)
+
+        # Lockstep on the reference trajectory, after one untimed call each (JIT compilation, caches)
+        X, V = [list(p) for p in X0], [[0.0, 0.0] for _ in X0]
+        ref_update(X, compute_V_des(X, goal, V_max), V, ws_model)
+        cand_update(X, compute_V_des(X, goal, V_max), V, ws_model)
+        ref_metrics = SafetyMetrics(ws_model, goal, step)
+        max_dV, mismatched, ref_seconds, cand_seconds = 0.0, 0, 0.0, 0.0
+        # min_clearance is NaN on ticks without a pair in range (fmin skips it), so start at
+        # that range: a rollout that never had one counts as search_radius and the difference
+        # stays finite
+        ref_sep, ref_overlaps = ref_metrics.search_radius, 0
+        for t in range(ticks):
+            V_des = compute_V_des(X, goal, V_max)
+            start = time.perf_counter()
+            V_ref = ref_update(X, V_des, V, ws_model)
+            ref_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            V_cand = cand_update(X, V_des, V, ws_model)
+            cand_seconds += time.perf_counter() - start
+            dV = max_deviation(V_ref, [list(v) for v in V_cand])
+            max_dV = max(max_dV, dV)
+            mismatched += dV > tol
+            V = [list(v) for v in V_ref]
+            X = [[X[i][0] + V[i][0] * step, X[i][1] + V[i][1] * step] for i in range(len(X))]
+            row = ref_metrics.update(t, X, V, V_des)
+            ref_sep, ref_overlaps = np.fmin(ref_sep, row['min_clearance']), max(ref_overlaps, row['box_overlaps'])
+
+        # Free rollout of the candidate
+        X, V = [list(p) for p in X0], [[0.0, 0.0] for _ in X0]
+        cand_metrics = SafetyMetrics(ws_model, goal, step)
+        cand_sep, cand_overlaps = cand_metrics.search_radius, 0
+        for t in range(ticks):
+            V_des = compute_V_des(X, goal, V_max)
+            V = [list(v) for v in cand_update(X, V_des, V, ws_model)]
+            X = [[X[i][0] + V[i][0] * step, X[i][1] + V[i][1] * step] for i in range(len(X))]
+            row = cand_metrics.update(t, X, V, V_des)
+            cand_sep, cand_overlaps = np.fmin(cand_sep, row['min_clearance']), max(cand_overlaps, row['box_overlaps'])
+
+        rows[seed] = {'max_dV': max_dV, 'mismatched_ticks': mismatched,
+                      'separation': float(cand_sep - ref_sep), 'overlaps': cand_overlaps - ref_overlaps,
+                      'reference_seconds': ref_seconds, 'candidate_seconds': cand_seconds}
+
+    report = {'candidate': cand_name, 'reference': ref_name, 'tol': tol,
+              'settings': dict(scenario, seeds=len(rows), ticks=ticks),
+              'max_dV': max(row['max_dV'] for row in rows.values()),
+              'mismatched_ticks': sum(row['mismatched_ticks'] for row in rows.values()),
+              'separation': min(row['separation'] for row in rows.values()),
+              'overlaps': max(row['overlaps'] for row in rows.values()),
+              'reference_seconds': sum(row['reference_seconds'] for row in rows.values()),
+              'candidate_seconds': sum(row['candidate_seconds'] for row in rows.values()),
+              'seeds': rows}
+    report['speedup'] = report['reference_seconds'] / max(report['candidate_seconds'], 1e-12)
+    return report
+
+
+def gate(report, baseline=None, threshold=0.2, sep_tol=1e-6):
+    """ List of failure messages for a differential report, checked against a baseline entry when given """
+    failures = []
+    if report['mismatched_ticks']:
+        failures.append("V_opt differs from %s on %d ticks (max |dV| = %.3g > %.3g)"
+                        % (report['reference'], report['mismatched_ticks'], report['max_dV'], report['tol']))
+    if report['separation'] < -sep_tol:
+        failures.append("minimum separation %.3g below the reference rollout" % -report['separation'])
+    if report['overlaps'] > 0:
+        failures.append("%d more box overlaps than the reference rollout" % report['overlaps'])
+    if baseline is not None:
+        slowdown = baseline['speedup'] / report['speedup'] - 1
+        if slowdown > threshold:
+            failures.append("speedup %.2fx: %.0f%% slower than the baseline %.2fx (threshold %.0f%%)"
+                            % (report['speedup'], 100 * slowdown, baseline['speedup'], 100 * threshold))
+    return failures
+
+
+def read_baseline(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def write_baseline(path, baselines, report):
+    baselines[report['candidate']] = {'reference': report['reference'], 'settings': report['settings'],
+                                      'speedup': report['speedup']}
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python gate.py', description='Differential gate for RVO solver variants.')
+    parser.add_argument('candidates', nargs='+', help='backend names or module:function')
+    parser.add_argument('--reference', default='python', help='reference solver (default: python)')
+    parser.add_argument('--seeds', type=int, default=5, help='number of random scenarios')
+    parser.add_argument('--agents', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=40)
+    parser.add_argument('--tol', type=float, default=1e-6, help='allowed |V_opt| deviation')
+    parser.add_argument('--baseline', metavar='FILE', help='JSON file of stored speedups per candidate')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional drop below the baseline speedup')
+    parser.add_argument('--update-baseline', action='store_true', help='store the measured speedups as the new baseline')
+    args = parser.parse_args(argv)
+
+    baselines = read_baseline(args.baseline)
+    failed = False
+    for candidate in args.candidates:
+        report = differential(candidate, args.reference, range(args.seeds), args.ticks, args.tol, n_agents=args.agents)
+        stored = baselines.get(report['candidate'])
+        if stored is not None and (stored.get('reference'), stored.get('settings')) != (report['reference'],
+                                                                                    report['settings']):
+            print('%-12s baseline ignored: recorded with other settings or reference' % report['candidate'])
+            stored = None
+        failures = gate(report, None if args.update_baseline else stored, args.threshold)
+        print('%-12s vs %-8s max |dV| = %.3g  separation %+.3g  speedup %.2fx%s  %s'
+              % (report['candidate'], report['reference'], report['max_dV'], report['separation'], report['speedup'],
+                 ' (baseline %.2fx)' % stored['speedup'] if stored else '', 'FAIL' if failures else 'ok'))
+        for failure in failures:
+            print('    ' + failure)
+        failed = failed or bool(failures)
+        if args.update_baseline and args.baseline and not failures:
+            write_baseline(args.baseline, baselines, report)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Goal placement: overlap checks on a background grid and bulk goal generation from images.
+
+Goals are squares of side `size`; two goals overlap when they are closer than
+`size` on both axes. GoalGrid buckets goals into cells of side `size`, so a cell
+holds at most one goal and a new goal only has to be checked against the 3x3
+cells around it instead of every goal placed so far.
+
+goals_from_image draws goals by weighted Poisson-disk sampling: candidate
+positions are drawn in batches with probability proportional to the image
+brightness (or alpha) and accepted when they overlap no accepted goal, so dense
+parts of the image collect more goals and no two goals overlap.
+
+    goals = goals_from_image(image, n=500, size=40)
+"""
+import numpy as np
+
+
+class GoalGrid:
+    def __init__(self, size, positions=()):
+        self.size = size
+        self.cells = {}
+        for x, y in positions:
+            self.add(x, y)
+
+    def cell(self, x, y):
+        return int(np.floor(x / self.size)), int(np.floor(y / self.size))
+
+    def fits(self, x, y):
+        """ True when a goal at (x, y) overlaps none of the goals added so far """
+        cx, cy = self.cell(x, y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                other = self.cells.get((cx + dx, cy + dy))
+                if other is not None and abs(other[0] - x) < self.size and abs(other[1] - y) < self.size:
+                    return False
+        return True
+
+    def add(self, x, y):
+        self.cells[self.cell(x, y)] = (x, y)
+
+    def clear(self):
+        self.cells = {}
+
+
+def image_weights(image, mode='brightness', invert=False):
+    """
+    (H, W) sampling weights from a PIL image or array: the brightness in [0, 1]
+    (1 - brightness with invert=True) or, with mode='alpha', the alpha channel.
+    """
+    array = np.asarray(image, dtype=float)
+    if mode == 'alpha':
+        if array.ndim != 3 or array.shape[2] != 4:
+            raise ValueError("Image has no alpha channel")
+        weights = array[..., 3] / 255.0
+    elif mode == 'brightness':
+        weights = (array[..., :3].mean(axis=2) if array.ndim == 3 else array) / 255.0
+    else:
+        raise ValueError("Unknown weight mode %r" % mode)
+    return 1.0 - weights if invert else weights
+
+
+def poisson_disk_goals(weights, n, size, existing=(), batch=1024, max_candidates=None, rng=None):
+    """
+    Up to n non-overlapping goal centres (x, y) drawn with probability proportional
+    to weights (H, W), kept at least size / 2 away from the edges. Returns an
+    (m, 2) array with m < n only when max_candidates (default 100 * n) candidates
+    did not leave room for more goals.
+    """
+    rng = np.random.default_rng(rng)
+    weights = np.asarray(weights, dtype=float)
+    height, width = weights.shape
+    half = size / 2
+    border = np.zeros_like(weights)
+    y0, y1 = int(np.ceil(half)), int(np.floor(height - half))
+    x0, x1 = int(np.ceil(half)), int(np.floor(width - half))
+    border[y0:y1, x0:x1] = weights[y0:y1, x0:x1]
+    total = border.sum()
+    if total <= 0:
+        raise ValueError("Image weights leave no room for goals")
+    p = border.ravel() / total
+
+    grid = GoalGrid(size, existing)
+    goals = []
+    max_candidates = 100 * n if max_candidates is None else max_candidates
+    drawn = 0
+    while len(goals) < n and drawn < max_candidates:
+        flat = rng.choice(p.size, size=min(batch, max_candidates - drawn), p=p)
+        drawn += len(flat)
+        # Jitter inside the pixel so goals are not locked to the pixel lattice
+        xs = flat % width + rng.random(len(flat))
+        ys = flat // width + rng.random(len(flat))
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            if grid.fits(x, y):
+                grid.add(x, y)
+                goals.append([x, y])
+                if len(goals) == n:
+                    break
+    return np.asarray(goals, dtype=float).reshape(-1, 2)
+
+
+def goals_from_image(image, n, size, mode='brightness', invert=False, rng=None):
+    """ n non-overlapping goals of side size sampled from a PIL image or array (pixel coordinates) """
+    return poisson_disk_goals(image_weights(image, mode, invert), n, size, rng=rng)
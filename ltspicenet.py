@@ -1,5 +1,3 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
 import re
 
 
@@ -61,6 +59,7 @@ def draw_capacitor(ax, x, y, label):
 
 
 def draw_diode(ax, x, y, label):
+    from matplotlib.patches import Polygon
     ax.plot([x, x + 0.5], [y, y], color='black', lw=2)
     ax.plot([x + 1.5, x + 2], [y, y], color='black', lw=2)
     triangle = Polygon([[x + 0.5, y - 0.5], [x + 1.5, y], [x + 0.5, y + 0.5]], closed=True, color='black')
@@ -74,6 +73,7 @@ def draw_wire(ax, x_start, y_start, x_end, y_end):
 
 
 def draw_circuit(components, wires):
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(10, 6))
 
 
@@ -101,9 +101,10 @@ def draw_circuit(components, wires):
     plt.show()
 
 
-# Example usage
-file_path = 'Draft1.asc'  # Replace with the actual file path
-components, wires = parse_asc_file(file_path)
+if __name__ == "__main__":
+    # Example usage
+    file_path = 'Draft1.asc'  # Replace with the actual file path
+    components, wires = parse_asc_file(file_path)
 
-# Draw the circuit
-draw_circuit(components, wires)
+    # Draw the circuit
+    draw_circuit(components, wires)
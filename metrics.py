@@ -0,0 +1,135 @@
+"""
+Per-tick safety metrics and a columnar audit log.
+
+SafetyMetrics computes, for every tick and with grid-accelerated neighbour pairs
+(spatial.neighbor_pairs):
+    min_separation         smallest centre distance between two agents
+    min_clearance          smallest box clearance between two agents (distance_r, 0 when touching)
+    box_overlaps           agent pairs whose bounding boxes overlap (distance_r == 0)
+    obstacle_penetrations  agent boxes touching a circular obstacle, static or moving
+    mean_deviation         mean |V - V_des|, the price paid for avoidance
+    arrived, throughput    agents at their goal and new arrivals per second
+min_separation and min_clearance are NaN on ticks without a pair of agents within
+search_radius.
+Rows are appended to a ColumnLog, one raw float64 file per column, which can be
+memory-mapped back with read_columns to tune safety margins against throughput.
+
+    metrics = SafetyMetrics(ws_model, goal, step, log=ColumnLog('run.metrics', METRIC_COLUMNS))
+    ...
+    metrics.update(t, X, V, V_des)
+"""
+import json
+import os
+
+import numpy as np
+
+from footprint import box_clearance, circle_box_clearance, half_extents
+from spatial import neighbor_pairs
+
+METRIC_COLUMNS = ('tick', 'time', 'min_separation', 'min_clearance', 'box_overlaps', 'obstacle_penetrations',
+                  'mean_deviation', 'arrived', 'throughput')
+
+
+class ColumnLog:
+    """ Append-only columnar log: <path>/columns.json plus one raw float64 file per column """
+    def __init__(self, path, columns, flush_every=256):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = tuple(columns)
+        self.flush_every = flush_every
+        self.rows = []
+        with open(os.path.join(path, 'columns.json'), 'w') as f:
+            json.dump({'columns': self.columns, 'dtype': '<f8'}, f)
+        for name in self.columns:
+            open(self.column_path(name), 'wb').close()
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + '.f8')
+
+    def append(self, row):
+        self.rows.append([row[name] for name in self.columns])
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = np.asarray(self.rows, dtype='<f8')
+        for k, name in enumerate(self.columns):
+            with open(self.column_path(name), 'ab') as f:
+                table[:, k].tofile(f)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+
+def read_columns(path):
+    """ Memory-mapped columns of a ColumnLog as a dict name -> array """
+    with open(os.path.join(path, 'columns.json')) as f:
+        meta = json.load(f)
+    columns = {}
+    for name in meta['columns']:
+        file_path = os.path.join(path, name + '.f8')
+        size = os.path.getsize(file_path)
+        columns[name] = np.memmap(file_path, dtype=meta['dtype'], mode='r') if size else np.empty(0)
+    return columns
+
+
+class SafetyMetrics:
+    def __init__(self, ws_model, goal, step, reach_bound=0.1, search_radius=None, log=None):
+        self.ws_model = ws_model
+        self.goal = np.asarray(goal, dtype=float).reshape(-1, 2)
+        self.step = step
+        self.reach_bound = reach_bound
+        self.log = log
+        self.half = half_extents(ws_model, len(self.goal))
+        self.holes = np.asarray(ws_model['circular_obstacles'], dtype=float).reshape(-1, 3)
+        if search_radius is None:
+            # Far enough to see MIN_SEPARATION violations and every possible box overlap
+            MIN_SEPARATION = 4 * (ws_model['robot_radius'] + 1)
+            box_reach = 2 * float(np.hypot(*self.half.max(axis=0))) if len(self.half) else 0
+            search_radius = max(2 * MIN_SEPARATION, box_reach)
+        self.search_radius = search_radius
+        self.arrived = np.zeros(len(self.goal), dtype=bool)
+
+    def update(self, tick, X, V, V_des):
+        """ Metrics of one tick; appended to the log when there is one """
+        P = np.asarray(X, dtype=float).reshape(-1, 2)
+        I, J = neighbor_pairs(P, self.search_radius)
+        if len(I):
+            clearance = box_clearance(P[I], P[J], self.half[I], self.half[J])
+            min_separation = float(np.sqrt(((P[I] - P[J]) ** 2).sum(axis=1)).min())
+            min_clearance = float(clearance.min())
+            box_overlaps = int((clearance == 0).sum())
+        else:
+            min_separation = min_clearance = float('nan')
+            box_overlaps = 0
+
+        holes = self.holes
+        if len(self.ws_model.get('dynamic_obstacles', [])):
+            moving = np.asarray(self.ws_model['dynamic_obstacles'], dtype=float).reshape(-1, 5)
+            holes = np.concatenate([holes, moving[:, :3]])
+        obstacle_penetrations = 0
+        if len(holes):
+            obstacle_penetrations = int((circle_box_clearance(P, self.half, holes) == 0).sum())
+
+        deviation = np.asarray(V, dtype=float).reshape(-1, 2) - np.asarray(V_des, dtype=float).reshape(-1, 2)
+        arrived = np.sqrt(((P - self.goal) ** 2).sum(axis=1)) < self.reach_bound
+        new_arrivals = int((arrived & ~self.arrived).sum())
+        self.arrived = arrived
+
+        row = {
+            'tick': tick,
+            'time': tick * self.step,
+            'min_separation': min_separation,
+            'min_clearance': min_clearance,
+            'box_overlaps': box_overlaps,
+            'obstacle_penetrations': obstacle_penetrations,
+            'mean_deviation': float(np.sqrt((deviation ** 2).sum(axis=1)).mean()) if len(P) else 0.0,
+            'arrived': int(arrived.sum()),
+            'throughput': new_arrivals / self.step,
+        }
+        if self.log is not None:
+            self.log.append(row)
+        return row
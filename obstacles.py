@@ -0,0 +1,133 @@
+"""
+Moving obstacles on scripted trajectories.
+
+Forklifts, people and other traffic that does not react to the agents follow
+precomputed paths: a list of waypoints per obstacle with the times they are
+reached, joined by straight segments or by a cubic (Catmull-Rom) spline.
+ObstacleTrajectories pads the waypoints of all obstacles into one (M, K, 2)
+array, so the positions and velocities of every obstacle come out of a single
+vectorized evaluation per tick.
+
+RVO sees them through ws_model['dynamic_obstacles'], rows [x, y, r, vx, vy].
+Every backend gives them velocity-aware cones with apex pA + vB: the obstacles
+do not reciprocate, so the agents take all of the avoidance, and the obstacles
+cost no intersect solve of their own.
+
+    traffic = ObstacleTrajectories([[[0, 0], [10, 0]], [[5, -5], [5, 5], [0, 5]]],
+                                   [[0, 20], [0, 10, 15]], radius=[0.5, 0.3], spline=True)
+    for t in range(ticks):
+        traffic.apply(ws_model, t * step)
+        V = RVO_update(X, V_des, V, ws_model)
+
+Before its first waypoint time an obstacle waits at the first waypoint and after
+the last one at the last waypoint. With loop=True it restarts from the first
+waypoint instead, so closed paths should end where they start.
+"""
+import numpy as np
+
+# Columns of a ws_model['dynamic_obstacles'] row
+DYNAMIC_COLUMNS = ('x', 'y', 'r', 'vx', 'vy')
+
+
+class ObstacleTrajectories:
+    def __init__(self, waypoints, times, radius, spline=False, loop=False):
+        """
+        waypoints: per obstacle a (K, 2) list of positions, times: per obstacle the K
+        increasing times they are reached, radius and loop: one value or one per obstacle
+        """
+        if len(waypoints) != len(times):
+            raise ValueError("%d waypoint lists for %d time lists" % (len(waypoints), len(times)))
+        m = len(waypoints)
+        k = max([len(path) for path in waypoints] or [2])
+        self.points = np.zeros((m, k, 2))
+        self.times = np.full((m, k), np.inf)
+        self.last = np.zeros(m, dtype=np.intp)
+        for o, (path, stamps) in enumerate(zip(waypoints, times)):
+            path = np.asarray(path, dtype=float).reshape(-1, 2)
+            stamps = np.asarray(stamps, dtype=float).reshape(-1)
+            if len(path) < 2 or len(path) != len(stamps):
+                raise ValueError("Obstacle %d needs at least two waypoints with one time each" % o)
+            if np.any(np.diff(stamps) <= 0):
+                raise ValueError("Waypoint times of obstacle %d are not increasing" % o)
+            self.points[o, :len(path)] = path
+            self.points[o, len(path):] = path[-1]
+            self.times[o, :len(path)] = stamps
+            self.last[o] = len(path) - 1
+        self.radius = np.broadcast_to(np.asarray(radius, dtype=float), (m,)).copy()
+        self.loop = np.broadcast_to(np.asarray(loop, dtype=bool), (m,)).copy()
+        self.spline = spline
+        rows = np.arange(m)
+        self.start = self.times[:, 0]
+        self.end = self.times[rows, self.last]
+        self.tangents = self.spline_tangents() if spline else None
+
+    def __len__(self):
+        return len(self.points)
+
+    def spline_tangents(self):
+        """ Catmull-Rom tangents (M, K, 2) for non-uniform times; one-sided at the ends of open paths """
+        P, T = self.points, self.times
+        m, k = T.shape
+        tangents = np.zeros_like(P)
+        if k > 2:
+            dt = (T[:, 2:] - T[:, :-2])[..., None]
+            with np.errstate(invalid='ignore'):
+                tangents[:, 1:-1] = (P[:, 2:] - P[:, :-2]) / dt
+        rows = np.arange(m)
+        first = (P[:, 1] - P[:, 0]) / (T[:, 1] - T[:, 0])[:, None]
+        last = ((P[rows, self.last] - P[rows, self.last - 1])
+                / (T[rows, self.last] - T[rows, self.last - 1])[:, None])
+        # A looping path continues from its last segment into its first
+        wrap = (P[:, 1] - P[rows, self.last - 1]) / (T[:, 1] - T[:, 0] + T[rows, self.last]
+                                                     - T[rows, self.last - 1])[:, None]
+        tangents[:, 0] = np.where(self.loop[:, None], wrap, first)
+        tangents[rows, self.last] = np.where(self.loop[:, None], wrap, last)
+        return tangents
+
+    def state(self, t):
+        """ Positions and velocities (M, 2) of all obstacles at time t """
+        m = len(self.points)
+        rows = np.arange(m)
+        t = np.full(m, float(t))
+        period = self.end - self.start
+        t = np.where(self.loop, self.start + np.mod(t - self.start, period), t)
+        moving = (t >= self.start) & (t < self.end)
+
+        seg = np.clip((self.times <= t[:, None]).sum(axis=1) - 1, 0, self.last - 1)
+        t0, t1 = self.times[rows, seg], self.times[rows, seg + 1]
+        p0, p1 = self.points[rows, seg], self.points[rows, seg + 1]
+        h = (t1 - t0)[:, None]
+        s = np.clip((t - t0) / (t1 - t0), 0, 1)[:, None]
+        if self.spline:
+            m0, m1 = self.tangents[rows, seg] * h, self.tangents[rows, seg + 1] * h
+            s2, s3 = s * s, s * s * s
+            pos = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0
+                   + (3 * s2 - 2 * s3) * p1 + (s3 - s2) * m1)
+            vel = ((6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * m0
+                   + (6 * s - 6 * s2) * p1 + (3 * s2 - 2 * s) * m1) / h
+        else:
+            pos = p0 + s * (p1 - p0)
+            vel = (p1 - p0) / h
+        return pos, np.where(moving[:, None], vel, 0.0)
+
+    def rows(self, t):
+        """ (M, 5) ws_model['dynamic_obstacles'] rows [x, y, r, vx, vy] at time t """
+        pos, vel = self.state(t)
+        return np.concatenate([pos, self.radius[:, None], vel], axis=1)
+
+    def apply(self, ws_model, t):
+        """ Publish the obstacles at time t to ws_model['dynamic_obstacles'] and return the rows """
+        ws_model['dynamic_obstacles'] = self.rows(t)
+        return ws_model['dynamic_obstacles']
+
+    def to_dict(self):
+        """ JSON-ready description, the inverse of from_dict """
+        waypoints = [self.points[o, :self.last[o] + 1].tolist() for o in range(len(self))]
+        times = [self.times[o, :self.last[o] + 1].tolist() for o in range(len(self))]
+        return {'waypoints': waypoints, 'times': times, 'radius': self.radius.tolist(),
+                'spline': self.spline, 'loop': self.loop.tolist()}
+
+    @classmethod
+    def from_dict(cls, spec):
+        """ ObstacleTrajectories from a scenario's 'trajectories' entry """
+        return cls(spec['waypoints'], spec['times'], spec['radius'], spec.get('spline', False), spec.get('loop', False))
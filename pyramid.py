@@ -0,0 +1,113 @@
+"""
+Tiled image pyramid for the mosaic GUIs.
+
+ImagePyramid decodes an uploaded image once, halves it level by level until it
+fits in one tile, and stores every level as a memory-mapped .npy file. Tiles of
+tile_size pixels are read from those files on first use and kept in an LRU
+cache of cache_size tiles. region() serves any part of the image at the size it
+is displayed at, from the coarsest level that still has at least that
+resolution. A bot tile or the canvas background therefore touches only a few
+small tiles, whatever the resolution of the original.
+
+    pyramid = ImagePyramid('mosaic.png')
+    background = pyramid.view((400, 400))                  # whole image at canvas size
+    tile = pyramid.region((x0, y0, x1, y1), (40, 40))      # box in full-resolution pixels
+
+Pillow is imported on first use.
+"""
+import math
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ImagePyramid:
+    def __init__(self, source, tile_size=256, cache_size=128, directory=None):
+        """ source: an image path or a PIL image; directory holds the level files (a temporary one by default) """
+        from PIL import Image
+        image = Image.open(source) if isinstance(source, (str, os.PathLike)) else source
+        self.mode = 'RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB'
+        self.tile_size = tile_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
+        if directory is None:
+            self.tempdir = tempfile.TemporaryDirectory(prefix='pyramid')
+            directory = self.tempdir.name
+        self.directory = directory
+
+        level = image.convert(self.mode)
+        self.size = level.size
+        self.levels = []
+        while True:
+            path = os.path.join(directory, 'level%d.npy' % len(self.levels))
+            pixels = np.asarray(level)
+            stored = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=pixels.shape)
+            stored[:] = pixels
+            stored.flush()
+            del stored
+            self.levels.append(np.load(path, mmap_mode='r'))
+            if max(level.size) <= tile_size:
+                break
+            level = level.reduce(2)
+
+    def level_for(self, scale):
+        """ Coarsest level with at least `scale` displayed pixels per full-resolution pixel """
+        if scale >= 1:
+            return 0
+        return min(int(math.floor(math.log2(1 / scale))), len(self.levels) - 1)
+
+    def tile(self, level, tx, ty):
+        """ (h, w, channels) pixels of tile (tx, ty) of a level, through the LRU cache """
+        key = (level, tx, ty)
+        pixels = self.cache.get(key)
+        if pixels is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return pixels
+        self.misses += 1
+        t = self.tile_size
+        pixels = np.array(self.levels[level][ty * t:(ty + 1) * t, tx * t:(tx + 1) * t])
+        self.cache[key] = pixels
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return pixels
+
+    def region(self, box, size):
+        """
+        PIL image of box (x0, y0, x1, y1), in full-resolution pixels, resized to size (w, h).
+        Parts of the box outside the image are transparent (RGBA) or black.
+        """
+        from PIL import Image
+        x0, y0, x1, y1 = box
+        w, h = size
+        level = self.level_for(min(w / max(x1 - x0, 1e-9), h / max(y1 - y0, 1e-9)))
+        factor = 2 ** level
+        pixels = self.levels[level]
+        lh, lw = pixels.shape[:2]
+        # Whole level pixels covering the box, and the box within them
+        bx0, by0 = int(math.floor(x0 / factor)), int(math.floor(y0 / factor))
+        bx1, by1 = max(int(math.ceil(x1 / factor)), bx0 + 1), max(int(math.ceil(y1 / factor)), by0 + 1)
+        canvas = np.zeros((by1 - by0, bx1 - bx0, pixels.shape[2]), dtype=np.uint8)
+        t = self.tile_size
+        for ty in range(max(by0, 0) // t, (min(by1, lh) - 1) // t + 1):
+            for tx in range(max(bx0, 0) // t, (min(bx1, lw) - 1) // t + 1):
+                tile = self.tile(level, tx, ty)
+                # Overlap of the tile and the covering pixels, in level coordinates
+                ox0, oy0 = max(bx0, tx * t), max(by0, ty * t)
+                ox1, oy1 = min(bx1, tx * t + tile.shape[1]), min(by1, ty * t + tile.shape[0])
+                if ox0 < ox1 and oy0 < oy1:
+                    canvas[oy0 - by0:oy1 - by0, ox0 - bx0:ox1 - bx0] = tile[oy0 - ty * t:oy1 - ty * t,
+                                                                            ox0 - tx * t:ox1 - tx * t]
+        inner = (x0 / factor - bx0, y0 / factor - by0, x1 / factor - bx0, y1 / factor - by0)
+        return Image.fromarray(canvas).resize((w, h), Image.LANCZOS, box=inner)
+
+    def view(self, size):
+        """ The whole image resized to size (w, h) """
+        return self.region((0, 0) + self.size, size)
+
+    def to_full(self, size):
+        """ Scale factors (sx, sy) from a view of `size` to full-resolution pixels """
+        return self.size[0] / size[0], self.size[1] / size[1]
@@ -0,0 +1,150 @@
+"""
+Trajectory recordings for replay without re-simulating.
+
+A recording is one file: a JSON header followed by fixed-size frames, one per
+recorded tick, each holding every agent's x, y, vx, vy and the
+ws_model['dynamic_obstacles'] rows of that tick. The number of frames follows
+from the file size, so the reader memory-maps the frames without scanning them:
+opening a multi-gigabyte recording only reads the header, and a recording that
+is still being written can be reopened (or refresh()ed) to see the new frames.
+
+Layout:
+    MAGIC            8 bytes
+    header length    uint32, little endian
+    header           JSON, padded with spaces so the frames start on a 64-byte boundary
+    frames           (n_frames, n_agents * 4 + n_dynamic * 5) values of header['dtype']
+
+    recorder = TrajectoryRecorder('run.traj', len(X), step, ws_model, goal)
+    recorder.record(X, V, ws_model.get('dynamic_obstacles'))   # once per tick
+    recorder.close()
+
+    trajectory = Trajectory('run.traj')
+    X, V, dynamic = trajectory.frame(len(trajectory) - 1)
+"""
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'RVOTRAJ\x00'
+TRAJECTORY_VERSION = 1
+ALIGNMENT = 64
+
+
+class TrajectoryRecorder:
+    """ Append-only writer of a trajectory recording, buffering flush_every frames """
+    def __init__(self, path, n_agents, step, ws_model, goal=None, n_dynamic=None, dtype='<f4', flush_every=64):
+        if n_dynamic is None:
+            n_dynamic = len(ws_model.get('dynamic_obstacles', []))
+        dims = ws_model.get('robot_dimensions')
+        header = {'version': TRAJECTORY_VERSION, 'n_agents': n_agents, 'n_dynamic': n_dynamic,
+                  'step': step, 'dtype': np.dtype(dtype).str, 'robot_radius': ws_model['robot_radius'],
+                  'robot_dimensions': np.asarray(dims, dtype=float).tolist() if dims is not None and len(dims) else None,
+                  'circular_obstacles': np.asarray(ws_model.get('circular_obstacles', []), dtype=float).tolist(),
+                  'goal': np.asarray(goal, dtype=float).tolist() if goal is not None else None}
+        text = json.dumps(header).encode()
+        start = len(MAGIC) + 4 + len(text)
+        text += b' ' * (-start % ALIGNMENT)
+        self.n_agents, self.n_dynamic = n_agents, n_dynamic
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+        self.frames = []
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(text)) + text)
+        self.file.flush()
+
+    def record(self, X, V, dynamic=None):
+        """ Append one frame; dynamic holds the n_dynamic rows [x, y, r, vx, vy] of the tick """
+        frame = np.empty(self.n_agents * 4 + self.n_dynamic * 5, dtype=self.dtype)
+        agents = frame[:self.n_agents * 4].reshape(-1, 4)
+        agents[:, 0:2] = np.asarray(X, dtype=float).reshape(-1, 2)
+        agents[:, 2:4] = np.asarray(V, dtype=float).reshape(-1, 2)
+        if self.n_dynamic:
+            frame[self.n_agents * 4:] = np.asarray(dynamic, dtype=float).reshape(-1)
+        self.frames.append(frame)
+        if len(self.frames) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.frames:
+            np.stack(self.frames).tofile(self.file)
+            self.file.flush()
+            self.frames = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class Trajectory:
+    """ Memory-mapped reader of a trajectory recording; frames are read lazily by the OS """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a trajectory recording" % path)
+            length, = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(length).decode())
+        if self.header['version'] > TRAJECTORY_VERSION:
+            raise ValueError("Recording %s has version %s, newer than supported %d"
+                             % (path, self.header['version'], TRAJECTORY_VERSION))
+        self.offset = len(MAGIC) + 4 + length
+        self.n_agents, self.n_dynamic = self.header['n_agents'], self.header['n_dynamic']
+        self.step = self.header['step']
+        self.dtype = np.dtype(self.header['dtype'])
+        self.width = self.n_agents * 4 + self.n_dynamic * 5
+        self.frames = None
+        self.refresh()
+
+    def refresh(self):
+        """ Re-map the file to pick up frames appended since it was opened; returns the frame count """
+        frame_bytes = self.width * self.dtype.itemsize
+        n_frames = (os.path.getsize(self.path) - self.offset) // frame_bytes if frame_bytes else 0
+        if self.frames is None or n_frames != len(self.frames):
+            if n_frames:
+                self.frames = np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset,
+                                        shape=(n_frames, self.width))
+            else:
+                self.frames = np.empty((0, self.width), dtype=self.dtype)
+        return len(self.frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def duration(self):
+        return max(len(self) - 1, 0) * self.step
+
+    def frame(self, k):
+        """ Positions (N, 2), velocities (N, 2) and dynamic obstacle rows (M, 5) of frame k, as views """
+        frame = self.frames[k]
+        agents = frame[:self.n_agents * 4].reshape(-1, 4)
+        return agents[:, 0:2], agents[:, 2:4], frame[self.n_agents * 4:].reshape(-1, 5)
+
+    def frame_at(self, t):
+        """ Index of the frame shown at time t, clamped to the recording """
+        # k * step / step can land just below k; the epsilon keeps seek_frame(k) on frame k
+        return min(max(int(math.floor(t / self.step + 1e-6)), 0), max(len(self) - 1, 0))
+
+    def dimensions(self):
+        """ (N, 2) box width and height per agent, as in footprint.dimensions """
+        dims = self.header.get('robot_dimensions')
+        if dims:
+            return np.asarray(dims, dtype=float).reshape(-1, 2)
+        return np.full((self.n_agents, 2), 2.0 * self.header['robot_radius'])
+
+    def bounds(self, frames=(0, -1)):
+        """ (xmin, xmax, ymin, ymax) over the given frames, the goals and the static obstacles """
+        points = [self.frame(k)[0] for k in frames if len(self)]
+        if self.header.get('goal'):
+            points.append(np.asarray(self.header['goal'], dtype=float).reshape(-1, 2))
+        holes = np.asarray(self.header.get('circular_obstacles') or [], dtype=float).reshape(-1, 3)
+        points += [holes[:, :2] - holes[:, 2:3], holes[:, :2] + holes[:, 2:3]]
+        points = np.concatenate([np.asarray(p, dtype=float).reshape(-1, 2) for p in points])
+        if not len(points):
+            return 0.0, 1.0, 0.0, 1.0
+        pad = float(self.dimensions().max()) if self.n_agents else 0.0
+        return (points[:, 0].min() - pad, points[:, 0].max() + pad,
+                points[:, 1].min() - pad, points[:, 1].max() + pad)
@@ -0,0 +1,263 @@
+"""
+Replay of recorded trajectories (recording.Trajectory) without RVO_update.
+
+    python -m simulate scenarios/bots10.json --record bots10.traj
+    python replay.py bots10.traj                  # Tk viewer
+    python replay.py bots10.traj --opencv         # OpenCV viewer
+    python replay.py bots10.traj --speed 4
+
+Playback runs at any speed, negative speeds play backwards, and the slider
+(Tk) or trackbar (OpenCV) seeks and scrubs. Only the frames that are drawn are
+read from the memory-mapped file. When playback reaches the last frame the
+viewer checks for frames appended by a recording that is still running.
+
+Keys in both viewers:
+    space        play / pause
+    + / -        double / halve the speed
+    r            reverse the direction
+    , / .        one frame back / forward (pauses)
+    q, Escape    quit
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from recording import Trajectory
+
+# Tk is imported by load_gui() so the module can be imported headless
+tk = None
+
+
+def load_gui():
+    """Import the GUI toolkit on first use."""
+    global tk
+    if tk is None:
+        import tkinter as tk
+
+
+class Playback:
+    """ Playback position in a Trajectory: time, speed and pause, advanced by wall-clock time """
+    def __init__(self, trajectory, speed=1.0):
+        self.trajectory = trajectory
+        self.time = 0.0
+        self.speed = speed
+        self.paused = False
+
+    @property
+    def frame(self):
+        return self.trajectory.frame_at(self.time)
+
+    def advance(self, elapsed):
+        """ Move on by `elapsed` wall-clock seconds; pauses at either end of the recording """
+        if self.paused:
+            return
+        if self.speed > 0 and self.time >= self.trajectory.duration:
+            self.trajectory.refresh()
+        self.time += elapsed * self.speed
+        if not 0 <= self.time <= self.trajectory.duration:
+            self.seek(self.time)
+            self.paused = True
+
+    def seek(self, t):
+        self.time = min(max(t, 0.0), self.trajectory.duration)
+
+    def seek_frame(self, k):
+        self.seek(k * self.trajectory.step)
+
+    def step(self, frames):
+        """ Pause and move by a number of frames """
+        self.paused = True
+        self.seek_frame(self.frame + frames)
+
+    def toggle(self):
+        self.trajectory.refresh()
+        if self.paused and self.speed > 0 and self.frame == len(self.trajectory) - 1:
+            self.seek(0.0)
+        self.paused = not self.paused
+
+    def key(self, char):
+        """ Apply a viewer key; returns False for quit """
+        if char in ('q', '\x1b'):
+            return False
+        if char == ' ':
+            self.toggle()
+        elif char in ('+', '='):
+            self.speed *= 2
+        elif char == '-':
+            self.speed /= 2
+        elif char == 'r':
+            self.speed = -self.speed
+        elif char == ',':
+            self.step(-1)
+        elif char == '.':
+            self.step(1)
+        return True
+
+    def status(self):
+        return 't=%.2fs  frame %d/%d  x%g%s' % (self.frame * self.trajectory.step, self.frame,
+                                               max(len(self.trajectory) - 1, 0), self.speed,
+                                               '  paused' if self.paused else '')
+
+
+class Viewport:
+    """ Uniform scaling of the recording's bounds to a view of at most `size` pixels """
+    def __init__(self, bounds, size=800):
+        xmin, xmax, ymin, ymax = bounds
+        self.scale = size / max(xmax - xmin, ymax - ymin, 1e-9)
+        self.origin = np.array([xmin, ymin])
+        self.width = int(np.ceil((xmax - xmin) * self.scale))
+        self.height = int(np.ceil((ymax - ymin) * self.scale))
+
+    def boxes(self, P, half):
+        """ (N, 4) pixel corners x1, y1, x2, y2 of boxes centred at P with half-extents half """
+        P = (np.asarray(P, dtype=float) - self.origin) * self.scale
+        half = half * self.scale
+        return np.concatenate([P - half, P + half], axis=1)
+
+
+def draw_frame_opencv(image, trajectory, k, viewport, half, status=None):
+    """ Draw frame k of the trajectory into a BGR image """
+    import cv2
+    image[:] = 0
+    holes = np.asarray(trajectory.header.get('circular_obstacles') or [], dtype=float).reshape(-1, 3)
+    X, V, dynamic = trajectory.frame(k)
+    for hole, color in ((holes, (0, 0, 255)), (dynamic[:, :3], (0, 165, 255))):
+        for x1, y1, x2, y2 in viewport.boxes(hole[:, :2], hole[:, 2:3]).astype(int):
+            cv2.circle(image, ((x1 + x2) // 2, (y1 + y2) // 2), max((x2 - x1) // 2, 1), color, -1, cv2.LINE_AA)
+    if trajectory.header.get('goal'):
+        goal = np.asarray(trajectory.header['goal'], dtype=float).reshape(-1, 2)
+        for x1, y1, x2, y2 in viewport.boxes(goal, half).astype(int):
+            cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 1, cv2.LINE_AA)
+    for x1, y1, x2, y2 in viewport.boxes(X, half).astype(int):
+        cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 255), 2, cv2.LINE_AA)
+    if status:
+        cv2.putText(image, status, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return image
+
+
+def replay_opencv(path, speed=1.0, size=800, fps=30):
+    """ Play a recording in an OpenCV window with a frame trackbar """
+    import cv2  # Imported here so the module loads without OpenCV
+    trajectory = Trajectory(path)
+    playback = Playback(trajectory, speed)
+    viewport = Viewport(trajectory.bounds(), size)
+    half = trajectory.dimensions() / 2
+    image = np.zeros((viewport.height, viewport.width, 3), dtype=np.uint8)
+    window = 'Replay %s' % path
+
+    def on_trackbar(k):
+        if k != playback.frame:
+            playback.seek_frame(k)
+
+    cv2.namedWindow(window)
+    cv2.createTrackbar('frame', window, 0, max(len(trajectory) - 1, 1), on_trackbar)
+    last = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        playback.advance(now - last)
+        last = now
+        cv2.setTrackbarMax('frame', window, max(len(trajectory) - 1, 1))
+        cv2.setTrackbarPos('frame', window, playback.frame)
+        if len(trajectory):
+            draw_frame_opencv(image, trajectory, playback.frame, viewport, half, playback.status())
+        cv2.imshow(window, image)
+        key = cv2.waitKey(max(int(1000 / fps), 1))
+        if key >= 0 and not playback.key(chr(key & 0xFF)):
+            break
+    cv2.destroyWindow(window)
+
+
+class ReplayApp:
+    """ Tk viewer of a recording; root may be a Tk or a Toplevel """
+    def __init__(self, root, path, speed=1.0, size=800, fps=30):
+        load_gui()
+        self.root = root
+        self.trajectory = Trajectory(path)
+        self.playback = Playback(self.trajectory, speed)
+        self.viewport = Viewport(self.trajectory.bounds(), size)
+        self.half = self.trajectory.dimensions() / 2
+        self.delay = max(int(1000 / fps), 1)
+        self.shown = None
+        self.last = time.perf_counter()
+        self.root.title("Replay %s" % path)
+        self.setup_ui()
+        self.tick()
+
+    def setup_ui(self):
+        """Set up the canvas, the frame slider and the playback buttons."""
+        viewport = self.viewport
+        self.canvas = tk.Canvas(self.root, width=viewport.width, height=viewport.height, bg='white')
+        self.canvas.grid(row=0, column=0, columnspan=5, padx=10, pady=10)
+        self.slider = tk.Scale(self.root, from_=0, to=max(len(self.trajectory) - 1, 0), orient=tk.HORIZONTAL,
+                               length=viewport.width, showvalue=False, command=self.on_scrub)
+        self.slider.grid(row=1, column=0, columnspan=5, padx=10)
+        for column, (text, char) in enumerate((("<<", ','), ("Play/Pause", ' '), (">>", '.'),
+                                               ("Slower", '-'), ("Faster", '+'))):
+            tk.Button(self.root, text=text, command=lambda char=char: self.playback.key(char)).grid(
+                row=2, column=column, pady=10)
+        self.status = tk.Label(self.root, text="")
+        self.status.grid(row=3, column=0, columnspan=5)
+        self.root.bind("<Key>", self.on_key)
+
+        # One canvas item per obstacle, goal and agent, moved with coords() on every frame
+        holes = np.asarray(self.trajectory.header.get('circular_obstacles') or [], dtype=float).reshape(-1, 3)
+        for x1, y1, x2, y2 in viewport.boxes(holes[:, :2], holes[:, 2:3]):
+            self.canvas.create_oval(x1, y1, x2, y2, fill='red', outline='')
+        if self.trajectory.header.get('goal'):
+            goal = np.asarray(self.trajectory.header['goal'], dtype=float).reshape(-1, 2)
+            for x1, y1, x2, y2 in viewport.boxes(goal, self.half):
+                self.canvas.create_rectangle(x1, y1, x2, y2, outline='blue')
+        self.movers = [self.canvas.create_oval(0, 0, 0, 0, fill='orange', outline='red')
+                       for _ in range(self.trajectory.n_dynamic)]
+        self.bots = [self.canvas.create_rectangle(0, 0, 0, 0, outline='magenta', width=2)
+                     for _ in range(self.trajectory.n_agents)]
+
+    def draw(self, k):
+        X, V, dynamic = self.trajectory.frame(k)
+        for item, box in zip(self.bots, self.viewport.boxes(X, self.half).tolist()):
+            self.canvas.coords(item, *box)
+        for item, box in zip(self.movers, self.viewport.boxes(dynamic[:, :2], dynamic[:, 2:3]).tolist()):
+            self.canvas.coords(item, *box)
+        self.shown = k
+
+    def tick(self):
+        now = time.perf_counter()
+        self.playback.advance(now - self.last)
+        self.last = now
+        self.slider.configure(to=max(len(self.trajectory) - 1, 0))
+        k = self.playback.frame
+        if len(self.trajectory) and k != self.shown:
+            self.draw(k)
+            self.slider.set(k)
+        self.status.configure(text=self.playback.status())
+        self.root.after(self.delay, self.tick)
+
+    def on_scrub(self, value):
+        if int(value) != self.playback.frame:
+            self.playback.seek_frame(int(value))
+
+    def on_key(self, event):
+        if event.char and not self.playback.key(event.char):
+            self.root.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python replay.py', description='Replay a recorded RVO trajectory.')
+    parser.add_argument('recording', help='trajectory file written by simulate --record')
+    parser.add_argument('--opencv', action='store_true', help='use the OpenCV viewer instead of Tk')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed relative to simulated time')
+    parser.add_argument('--size', type=int, default=800, help='size of the view in pixels')
+    args = parser.parse_args(argv)
+    if args.opencv:
+        replay_opencv(args.recording, args.speed, args.size)
+    else:
+        load_gui()
+        root = tk.Tk()
+        ReplayApp(root, args.recording, args.speed, args.size)
+        root.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
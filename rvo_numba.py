@@ -0,0 +1,263 @@
+"""
+Numba-compiled RVO backend.
+
+Explicit-loop kernels over the cones of rvo_numpy, stored per neighbour in the
+same start-offset layout (start, apex, left, right), so memory grows with the
+number of neighbours rather than N**2. Kernels are compiled with cache=True, so the
+compiled machine code is written next to this module (or to $NUMBA_CACHE_DIR)
+and later processes load it instead of paying the JIT warm-up again.
+
+Select it with ws_model['backend'] = 'numba' or RVO_BACKEND=numba; numba must be
+installed.
+"""
+import numpy as np
+from numba import njit
+
+from RVO import HRVO_MIN_DET, MODES, cone_mode, post_velocity
+from footprint import dimensions
+from rvo_numpy import obstacle_table, pack_cones
+
+
+@njit(cache=True)
+def _distance_r(ax, ay, bx, by, wa, ha, wb, hb):
+    dist_x = abs(ax - bx) - (wa + wb) / 2
+    dist_y = abs(ay - by) - (ha + hb) / 2
+    if dist_x < 0 and dist_y < 0:
+        return 0.0
+    return max(dist_x, 0.0) + max(dist_y, 0.0) + 0.001
+
+
+@njit(cache=True)
+def _bounds(theta_BA, half_angle):
+    left = theta_BA + half_angle
+    right = theta_BA - half_angle
+    return np.arctan2(np.sin(left), np.cos(left)), np.arctan2(np.sin(right), np.cos(right))
+
+
+@njit(cache=True)
+def _apex_offsets(mode, dx, dy, vAx, vAy, vBx, vBy, sin_l, cos_l, sin_r, cos_r):
+    # mode is the index in RVO.MODES: 0 VO, 1 RVO, 2 HRVO
+    if mode == 0:
+        return vBx, vBy, vAx, vAy
+    hx = 0.5 * (vBx + vAx)
+    hy = 0.5 * (vBy + vAy)
+    det = cos_r * sin_l - sin_r * cos_l
+    if mode == 1 or det < HRVO_MIN_DET:
+        return hx, hy, hx, hy
+    wx = vAx - vBx
+    wy = vAy - vBy
+    if dx * wy - dy * wx > 0:
+        s = 0.5 * (wx * sin_l - wy * cos_l) / det
+        sx, sy = cos_r, sin_r
+    else:
+        s = -0.5 * (wx * sin_r - wy * cos_r) / det
+        sx, sy = cos_l, sin_l
+    return vBx + s * sx, vBy + s * sy, vAx - s * sx, vAy - s * sy
+
+
+@njit(cache=True)
+def _build_cones(P, V, dims, holes, ROB_RAD, neighbor_radius, mode):
+    n = P.shape[0]
+    # The cones of agent i are rows start[i]:start[i + 1], as in rvo_numpy: count
+    # the neighbours of every agent first, then fill each agent's rows in order
+    count = np.full(n, holes.shape[0], dtype=np.int64)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if (P[j, 0] - P[i, 0]) ** 2 + (P[j, 1] - P[i, 1]) ** 2 <= neighbor_radius ** 2:
+                count[i] += 1
+                count[j] += 1
+    start = np.zeros(n + 1, dtype=np.int64)
+    start[1:] = np.cumsum(count)
+    fill = start[:-1].copy()
+    apex = np.empty((start[n], 2))
+    left = np.empty(start[n])
+    right = np.empty(start[n])
+    MIN_SEPARATION = 4 * ROB_RAD
+    # Each unordered pair once: clearance and bound vectors are shared and
+    # j's bound vectors are i's negated
+    for i in range(n):
+        for j in range(i + 1, n):
+            dx = P[j, 0] - P[i, 0]
+            dy = P[j, 1] - P[i, 1]
+            if dx ** 2 + dy ** 2 > neighbor_radius ** 2:
+                continue
+            dist_BA = _distance_r(P[i, 0], P[i, 1], P[j, 0], P[j, 1],
+                                  dims[i, 0], dims[i, 1], dims[j, 0], dims[j, 1])
+            dist_BA = max(dist_BA, MIN_SEPARATION)
+            half_angle = np.arcsin(MIN_SEPARATION / dist_BA)
+            theta_BA = np.arctan2(dy, dx)
+            sin_l, cos_l = np.sin(theta_BA + half_angle), np.cos(theta_BA + half_angle)
+            sin_r, cos_r = np.sin(theta_BA - half_angle), np.cos(theta_BA - half_angle)
+            ox_i, oy_i, ox_j, oy_j = _apex_offsets(mode, dx, dy, V[i, 0], V[i, 1], V[j, 0], V[j, 1],
+                                                   sin_l, cos_l, sin_r, cos_r)
+            a, b = fill[i], fill[j]
+            apex[a, 0] = P[i, 0] + ox_i
+            apex[a, 1] = P[i, 1] + oy_i
+            apex[b, 0] = P[j, 0] + ox_j
+            apex[b, 1] = P[j, 1] + oy_j
+            left[a], right[a] = np.arctan2(sin_l, cos_l), np.arctan2(sin_r, cos_r)
+            left[b], right[b] = np.arctan2(-sin_l, -cos_l), np.arctan2(-sin_r, -cos_r)
+            fill[i] += 1
+            fill[j] += 1
+    for i in range(n):
+        for h in range(holes.shape[0]):
+            rad = holes[h, 2] * 1.5 + ROB_RAD
+            dist_BA = _distance_r(P[i, 0], P[i, 1], holes[h, 0], holes[h, 1],
+                                  dims[i, 0], dims[i, 1], holes[h, 2], holes[h, 2])
+            dist_BA = max(dist_BA, rad)
+            theta_BA = np.arctan2(holes[h, 1] - P[i, 1], holes[h, 0] - P[i, 0])
+            a = fill[i] + h
+            apex[a, 0] = P[i, 0] + holes[h, 3]
+            apex[a, 1] = P[i, 1] + holes[h, 4]
+            left[a], right[a] = _bounds(theta_BA, np.arcsin(rad / dist_BA))
+    return start, apex, left, right
+
+
+@njit(cache=True)
+def _in_between(theta_right, theta_dif, theta_left):
+    if abs(theta_right - theta_left) <= np.pi:
+        return theta_right <= theta_dif <= theta_left
+    if theta_left < 0 and theta_right > 0:
+        theta_left += 2 * np.pi
+        if theta_dif < 0:
+            theta_dif += 2 * np.pi
+        return theta_right <= theta_dif <= theta_left
+    elif theta_left > 0 and theta_right < 0:
+        theta_right += 2 * np.pi
+        if theta_dif < 0:
+            theta_dif += 2 * np.pi
+        return theta_left <= theta_dif <= theta_right
+    return False
+
+
+@njit(cache=True)
+def _intersect(pA, vA, apex, left, right, thetas):
+    norm_v = np.sqrt(vA[0] ** 2 + vA[1] ** 2) + 0.001
+    rads = np.arange(0.02, norm_v + 0.02, norm_v / 10.0)
+    best = np.zeros(2)
+    best_suitable = False
+    best_dist = np.inf
+    for theta in thetas:
+        for rad in rads:
+            vx = rad * np.cos(theta)
+            vy = rad * np.sin(theta)
+            suit = True
+            for k in range(apex.shape[0]):
+                theta_dif = np.arctan2(vy + pA[1] - apex[k, 1], vx + pA[0] - apex[k, 0])
+                if _in_between(right[k], theta_dif, left[k]):
+                    suit = False
+                    break
+            dist = np.sqrt((vx - vA[0]) ** 2 + (vy - vA[1]) ** 2) + 0.001
+            # A suitable candidate always beats an unsuitable one
+            if (suit and not best_suitable) or (suit == best_suitable and dist < best_dist):
+                best_suitable = suit
+                best_dist = dist
+                best[0] = vx
+                best[1] = vy
+    return best
+
+
+@njit(cache=True)
+def _suitable(pA, vx, vy, apex, left, right):
+    for k in range(apex.shape[0]):
+        if _in_between(right[k], np.arctan2(vy + pA[1] - apex[k, 1], vx + pA[0] - apex[k, 0]), left[k]):
+            return False
+    return True
+
+
+@njit(cache=True)
+def _evaluate(pA, vA, apex, left, right, theta, rad, rad_min, rad_max, best, best_dist):
+    # best[0] / best[1]: (theta, rad) of the best suitable / unsuitable candidate so far
+    rad = min(max(rad, rad_min), rad_max)
+    vx = rad * np.cos(theta)
+    vy = rad * np.sin(theta)
+    s = 0 if _suitable(pA, vx, vy, apex, left, right) else 1
+    dist = np.sqrt((vx - vA[0]) ** 2 + (vy - vA[1]) ** 2) + 0.001
+    if dist < best_dist[s]:
+        best_dist[s] = dist
+        best[s, 0] = theta
+        best[s, 1] = rad
+
+
+@njit(cache=True)
+def _intersect_coarse_to_fine(pA, vA, apex, left, right, resolution, n_theta, n_rad):
+    norm_v = np.sqrt(vA[0] ** 2 + vA[1] ** 2) + 0.001
+    rad_min, rad_max = 0.0, norm_v + 0.02
+    d_theta = 2 * np.pi / n_theta
+    d_rad = (rad_max - rad_min) / n_rad
+    best = np.zeros((2, 2))
+    best_dist = np.full(2, np.inf)
+    _evaluate(pA, vA, apex, left, right, np.arctan2(vA[1], vA[0]), norm_v - 0.001,
+              rad_min, rad_max, best, best_dist)
+    if best_dist[0] == np.inf:
+        for k in range(n_theta):
+            for m in range(1, n_rad + 1):
+                _evaluate(pA, vA, apex, left, right, k * d_theta, rad_min + m * d_rad,
+                          rad_min, rad_max, best, best_dist)
+        while d_theta > resolution:
+            d_theta *= 0.5
+            d_rad *= 0.5
+            seeds = best.copy()
+            seeded = best_dist < np.inf
+            for s in range(2):
+                if not seeded[s]:
+                    continue
+                for dk in range(-1, 2):
+                    for dm in range(-1, 2):
+                        if dk != 0 or dm != 0:
+                            _evaluate(pA, vA, apex, left, right, seeds[s, 0] + dk * d_theta,
+                                      seeds[s, 1] + dm * d_rad, rad_min, rad_max, best, best_dist)
+    s = 0 if best_dist[0] < np.inf else 1
+    out = np.empty(2)
+    out[0] = best[s, 1] * np.cos(best[s, 0])
+    out[1] = best[s, 1] * np.sin(best[s, 0])
+    return out
+
+
+@njit(cache=True)
+def _compute_V_des(P, G, V_max):
+    V_des = np.zeros_like(P)
+    for i in range(P.shape[0]):
+        dx = G[i, 0] - P[i, 0]
+        dy = G[i, 1] - P[i, 1]
+        norm = np.sqrt(dx ** 2 + dy ** 2) + 0.001
+        if norm >= 0.1:
+            V_des[i, 0] = dx * V_max[i] / norm
+            V_des[i, 1] = dy * V_max[i] / norm
+    return V_des
+
+
+def build_cones(X, V_current, ws_model):
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    V = np.asarray(V_current, dtype=float).reshape(-1, 2)
+    dims = dimensions(ws_model, len(P))
+    holes = obstacle_table(ws_model)
+    neighbor_radius = ws_model.get('neighbor_radius')
+    start, apex, left, right = _build_cones(P, V, dims, holes, float(ws_model['robot_radius'] + 1),
+                                            np.inf if neighbor_radius is None else float(neighbor_radius),
+                                            MODES.index(cone_mode(ws_model)))
+    return {'start': start, 'apex': apex, 'left': left, 'right': right}
+
+
+def select_velocity(X, V_des, V_current, cones, ws_model):
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    D = np.asarray(V_des, dtype=float).reshape(-1, 2)
+    thetas = np.arange(0, 2 * np.pi, 0.05)
+    resolution = ws_model.get('search_resolution')
+    V_opt = list(V_current)
+    start = cones['start']
+    for i in range(len(P)):
+        k = slice(start[i], start[i + 1])
+        if resolution:
+            vA_post = _intersect_coarse_to_fine(P[i], D[i], cones['apex'][k], cones['left'][k], cones['right'][k],
+                                                float(resolution), 16, 4)
+        else:
+            vA_post = _intersect(P[i], D[i], cones['apex'][k], cones['left'][k], cones['right'][k], thetas)
+        V_opt[i] = post_velocity(X[i], vA_post.tolist(), V_current[i], ws_model)
+    return V_opt
+
+
+def compute_V_des(X, goal, V_max):
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    G = np.asarray(goal, dtype=float).reshape(-1, 2)
+    return _compute_V_des(P, G, np.asarray(V_max, dtype=float).reshape(-1)).tolist()
@@ -0,0 +1,330 @@
+"""
+NumPy-vectorized RVO backend.
+
+Same geometry as the reference backend in RVO.py, computed for all agent pairs
+at once. Velocity obstacles are stored per neighbour, grouped by the agent they
+constrain, so memory grows with the number of neighbours rather than N**2:
+    position (N, 2)      agent positions
+    start    (N + 1,)    the cones of agent i are rows start[i]:start[i + 1]
+    apex     (M, 2)      cone apex
+    left     (M,)        angle of the left boundary
+    right    (M,)        angle of the right boundary
+    wrap     (M,)        branch of in_between taken by the cone
+M is twice the number of agent pairs (within ws_model['neighbor_radius'] when set)
+plus N times the number of circular obstacles.
+
+Select it with ws_model['backend'] = 'numpy' or RVO_BACKEND=numpy.
+
+ws_model['precision'] = 'float32' stores the positions, the cones and the
+candidate grids in single precision, halving their memory traffic. The geometry
+is still evaluated in float64 before it is stored, and wrap keeps the float64
+branch, so a half-plane cone (bounds pi apart) blocks the same side as in float64;
+see memory_per_agent and conformance.precision_report for the cost and accuracy.
+"""
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+from RVO import HRVO_MIN_DET, cone_mode, post_velocity
+from footprint import box_clearance, half_extents
+from spatial import neighbor_pairs
+
+PI = np.pi
+
+
+def libm(function):
+    """ Elementwise version of a math module function, rounding exactly as the reference backend """
+    def apply(*args):
+        values = [np.asarray(a, dtype=float).ravel().tolist() for a in args]
+        return np.array([function(*v) for v in zip(*values)], dtype=float).reshape(np.shape(args[0]))
+    return apply
+
+
+# NumPy's arctan2 and arcsin can round differently from libm by an ulp. That only
+# matters for half-plane cones (clearance clamped to the minimum distance), whose
+# bounds are pi apart: RVO.in_between takes its wrap branch or not on the last ulp.
+# Cones within KNIFE_EDGE ulps of that are recomputed with LIBM.
+LIBM = SimpleNamespace(sin=libm(math.sin), cos=libm(math.cos), arctan2=libm(math.atan2), arcsin=libm(math.asin))
+KNIFE_EDGE = 64
+
+
+def knife_edge(left, right):
+    """ Mask of the cones whose bounds are within KNIFE_EDGE ulps of pi apart """
+    return np.abs(np.abs(left - right) - PI) < KNIFE_EDGE * np.finfo(left.dtype).eps * PI
+
+
+def on_bound(theta, bound):
+    """ Mask of the angles within KNIFE_EDGE ulps of a cone bound, modulo 2 pi """
+    return np.abs(np.remainder(theta - bound + PI, 2 * PI) - PI) < KNIFE_EDGE * np.finfo(theta.dtype).eps * PI
+
+
+def precision(ws_model):
+    """ Floating point dtype of the agent state, cone buffers and candidate grids """
+    return np.dtype(ws_model.get('precision', 'float64'))
+
+
+def obstacle_table(ws_model, dtype=np.float64):
+    """ RVO.obstacle_rows as a (K, 5) array: static circular obstacles at rest, then the dynamic ones """
+    static = np.asarray(ws_model['circular_obstacles'], dtype=dtype).reshape(-1, 3)
+    moving = np.asarray(ws_model.get('dynamic_obstacles', []), dtype=dtype).reshape(-1, 5)
+    return np.concatenate([np.pad(static, ((0, 0), (0, 2))), moving])
+
+
+def memory_per_agent(cones):
+    """ Bytes per agent of all buffers returned from build_cones: the agent positions and the cones """
+    n = max(len(cones['start']) - 1, 1)
+    return sum(array.nbytes for array in cones.values()) / n
+
+
+def cone_bounds(theta_BA, half_angle, ops=np):
+    """ Angles of the left/right cone boundaries, wrapped to (-pi, pi] like atan2 of the bound vectors """
+    left = theta_BA + half_angle
+    right = theta_BA - half_angle
+    return ops.arctan2(ops.sin(left), ops.cos(left)), ops.arctan2(ops.sin(right), ops.cos(right))
+
+
+def pair_sides(theta_BA, half_angle, ops=np):
+    """ Bound vectors (cos, sin) of the left and right cone boundaries as sin_l, cos_l, sin_r, cos_r """
+    left = theta_BA + half_angle
+    right = theta_BA - half_angle
+    return ops.sin(left), ops.cos(left), ops.sin(right), ops.cos(right)
+
+
+def pair_bounds(sin_l, cos_l, sin_r, cos_r, ops=np):
+    """
+    cone_bounds for both sides of a pair from its bound vectors: (left, right) for A
+    and for B. B's bound vectors are A's negated, so only the arctan2 is evaluated twice.
+    """
+    return ((ops.arctan2(sin_l, cos_l), ops.arctan2(sin_r, cos_r)),
+            (ops.arctan2(-sin_l, -cos_l), ops.arctan2(-sin_r, -cos_r)))
+
+
+def pair_cones(d, ratio):
+    """
+    Bound vectors (pair_sides) and bound angles (pair_bounds) of m pairs from d = pB - pA
+    and ratio = minimum distance / clearance, with the knife-edge cones computed with LIBM
+    """
+    sides = pair_sides(np.arctan2(d[:, 1], d[:, 0]), np.arcsin(ratio))
+    bounds = pair_bounds(*sides)
+    edge = knife_edge(*bounds[0]) | knife_edge(*bounds[1])
+    if edge.any():
+        exact = pair_sides(LIBM.arctan2(d[edge, 1], d[edge, 0]), LIBM.arcsin(ratio[edge]), LIBM)
+        exact_bounds = pair_bounds(*exact, ops=LIBM)
+        for array, value in zip(sides + bounds[0] + bounds[1], exact + exact_bounds[0] + exact_bounds[1]):
+            array[edge] = value
+    return sides, bounds
+
+
+def obstacle_cones(d, ratio):
+    """ cone_bounds from d = obstacle - pA and ratio = radius / clearance, knife-edge cones with LIBM """
+    left, right = cone_bounds(np.arctan2(d[..., 1], d[..., 0]), np.arcsin(ratio))
+    edge = knife_edge(left, right)
+    if edge.any():
+        left[edge], right[edge] = cone_bounds(LIBM.arctan2(d[edge][:, 1], d[edge][:, 0]),
+                                              LIBM.arcsin(ratio[edge]), LIBM)
+    return left, right
+
+
+def apex_offsets(mode, d, vA, vB, sin_l, cos_l, sin_r, cos_r):
+    """
+    RVO.apex_offsets for m pairs at once: d = pB - pA, vA, vB (m, 2) and the bound
+    vectors of A's cones. Returns the (m, 2) offsets from pA and from pB.
+    """
+    if mode == 'VO':
+        return vB, vA
+    half_vAB = 0.5 * (vB + vA)
+    if mode == 'RVO':
+        return half_vAB, half_vAB
+    det = cos_r * sin_l - sin_r * cos_l
+    degenerate = det < HRVO_MIN_DET
+    w = vA - vB
+    left_pass = d[:, 0] * w[:, 1] - d[:, 1] * w[:, 0] > 0
+    s = np.where(left_pass, 0.5 * (w[:, 0] * sin_l - w[:, 1] * cos_l),
+                 -0.5 * (w[:, 0] * sin_r - w[:, 1] * cos_r)) / np.where(degenerate, 1, det)
+    side = np.where(left_pass[:, None], np.stack([cos_r, sin_r], axis=1), np.stack([cos_l, sin_l], axis=1))
+    shift = s[:, None] * side
+    offset_A = np.where(degenerate[:, None], half_vAB, vB + shift)
+    offset_B = np.where(degenerate[:, None], half_vAB, vA - shift)
+    return offset_A, offset_B
+
+
+def build_cones(X, V_current, ws_model):
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    V = np.asarray(V_current, dtype=float).reshape(-1, 2)
+    n = len(P)
+    half = half_extents(ws_model, n)
+    holes = obstacle_table(ws_model)
+    ROB_RAD = ws_model['robot_radius'] + 1
+    MIN_SEPARATION = 4 * ROB_RAD
+    mode = cone_mode(ws_model)
+
+    # Clearance, bearing and bound vectors once per unordered pair i < j, every pair
+    # evaluated from its lower index as in the reference backend; j's bound vectors
+    # are i's negated
+    if ws_model.get('neighbor_radius') is not None:
+        I, J = neighbor_pairs(P, ws_model['neighbor_radius'])
+        I, J = np.minimum(I, J), np.maximum(I, J)
+    else:
+        I, J = np.triu_indices(n, 1)
+    d = P[J] - P[I]
+    dist_BA = np.maximum(box_clearance(P[I], P[J], half[I], half[J]), MIN_SEPARATION)
+    sides, ((left_ij, right_ij), (left_ji, right_ji)) = pair_cones(d, MIN_SEPARATION / dist_BA)
+    # Apex translated by the offset of the mode (VO, RVO or HRVO)
+    offset_ij, offset_ji = apex_offsets(mode, d, V[I], V[J], *sides)
+
+    # Circular obstacles, over-approximated as in the reference backend; the apex
+    # moves with the obstacle's velocity (zero for the static ones)
+    H = np.repeat(np.arange(n), len(holes))
+    k = np.tile(np.arange(len(holes)), n)
+    rad = holes[k, 2] * 1.5 + ROB_RAD
+    hole_half = np.repeat(holes[k, 2:3] / 2, 2, axis=1)
+    dist_BA = np.maximum(box_clearance(P[H], holes[k, :2], half[H], hole_half), rad)
+    left_h, right_h = obstacle_cones(holes[k, :2] - P[H], rad / dist_BA)
+
+    # Group the cones by the agent they constrain
+    owner = np.concatenate([I, J, H])
+    order = np.argsort(owner, kind='stable')
+    start = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n), out=start[1:])
+    left = np.concatenate([left_ij, left_ji, left_h])[order]
+    right = np.concatenate([right_ij, right_ji, right_h])[order]
+    apex = np.concatenate([P[I] + offset_ij, P[J] + offset_ji, P[H] + holes[k, 3:5]])[order]
+    dtype = precision(ws_model)
+    return {'position': P.astype(dtype), 'start': start, 'apex': apex.astype(dtype),
+            'left': left.astype(dtype), 'right': right.astype(dtype), 'wrap': np.abs(right - left) > PI}
+
+
+def pack_cones(X, agent_cones, ws_model):
+    """
+    build_cones layout of per-agent RVO.py cone lists [apex, bound_left, bound_right, dist, rad],
+    as built by an InteractionScheduler; the bound angles are taken with LIBM like the reference
+    """
+    dtype = precision(ws_model)
+    rows = [cone for cones in agent_cones for cone in cones]
+    start = np.zeros(len(agent_cones) + 1, dtype=np.int64)
+    np.cumsum([len(cones) for cones in agent_cones], out=start[1:])
+    apex = np.array([cone[0] for cone in rows], dtype=float).reshape(-1, 2)
+    bound_left = np.array([cone[1] for cone in rows], dtype=float).reshape(-1, 2)
+    bound_right = np.array([cone[2] for cone in rows], dtype=float).reshape(-1, 2)
+    left = LIBM.arctan2(bound_left[:, 1], bound_left[:, 0])
+    right = LIBM.arctan2(bound_right[:, 1], bound_right[:, 0])
+    return {'position': np.asarray(X, dtype=float).reshape(-1, 2).astype(dtype), 'start': start,
+            'apex': apex.astype(dtype), 'left': left.astype(dtype), 'right': right.astype(dtype),
+            'wrap': np.abs(right - left) > PI}
+
+
+def in_between(theta_right, theta_dif, theta_left, wrap=None):
+    """ Vectorized RVO.in_between; wrap, the branch taken per cone, is derived from the bounds when not given """
+    if wrap is None:
+        wrap = np.abs(theta_right - theta_left) > PI
+    dif_wrapped = np.where(theta_dif < 0, theta_dif + 2 * PI, theta_dif)
+    plain = (theta_right <= theta_dif) & (theta_dif <= theta_left)
+    left_neg = (theta_left < 0) & (theta_right > 0)
+    case_a = (theta_right <= dif_wrapped) & (dif_wrapped <= theta_left + 2 * PI)
+    left_pos = (theta_left > 0) & (theta_right < 0)
+    case_b = (theta_left <= dif_wrapped) & (dif_wrapped <= theta_right + 2 * PI)
+    return np.where(wrap, (left_neg & case_a) | (left_pos & case_b), plain)
+
+
+def candidate_grid(norm_v, d_theta=0.05, n_rad=10, dtype=np.float64):
+    """ The reference (theta, rad) sweep of RVO.intersect, flattened theta-major """
+    theta = np.arange(0, 2 * PI, d_theta, dtype=dtype)
+    rad = np.arange(0.02, norm_v + 0.02, norm_v / n_rad, dtype=dtype)
+    return np.stack([np.outer(np.cos(theta), rad).ravel(), np.outer(np.sin(theta), rad).ravel()], axis=1)
+
+
+def intersect(pA, vA, apex, left, right, wrap=None):
+    """ Vectorized RVO.intersect for one agent against its K cones """
+    vA = np.asarray(vA, dtype=pA.dtype)
+    norm_v = np.sqrt(vA[0] ** 2 + vA[1] ** 2) + 0.001
+    new_v = candidate_grid(norm_v, dtype=pA.dtype)
+    dif = new_v[:, None, :] + (pA - apex)[None, :, :]
+    theta_dif = np.arctan2(dif[..., 1], dif[..., 0])
+    suitable = ~in_between(right[None, :], theta_dif, left[None, :], None if wrap is None else wrap[None, :]).any(axis=1)
+    dist = np.sqrt(((new_v - vA) ** 2).sum(axis=1)) + 0.001
+    if suitable.any():
+        dist = np.where(suitable, dist, np.inf)
+    return new_v[np.argmin(dist)]
+
+
+def intersect_coarse_to_fine(pA, vA, apex, left, right, wrap=None, resolution=0.01, coarse_grid=(16, 4)):
+    """
+    Vectorized RVO.intersect_coarse_to_fine: the coarse grid and each refinement level
+    are evaluated as one batch, keeping the first best candidate as the loop does
+    """
+    vA = np.asarray(vA, dtype=float)
+    norm_v = math.sqrt(vA[0] ** 2 + vA[1] ** 2) + 0.001
+    rad_min, rad_max = 0.0, norm_v + 0.02
+    n_theta, n_rad = coarse_grid
+    d_theta = 2 * PI / n_theta
+    d_rad = (rad_max - rad_min) / n_rad
+    best = {True: None, False: None}
+    best_dist = {True: np.inf, False: np.inf}
+
+    def evaluate(theta, rad):
+        rad = np.minimum(np.maximum(rad, rad_min), rad_max)
+        new_v = np.stack([rad * np.cos(theta), rad * np.sin(theta)], axis=1)
+        dif = (new_v.astype(pA.dtype)[:, None, :] + pA) - apex[None, :, :]
+        theta_dif = np.arctan2(dif[..., 1], dif[..., 0])
+        # Coarse candidates (multiples of pi / 8) can lie exactly on a cone bound, where the
+        # last ulp of the bearing decides; take those from libm as the reference does
+        edge = on_bound(theta_dif, left[None, :]) | on_bound(theta_dif, right[None, :])
+        if edge.any():
+            theta_dif[edge] = LIBM.arctan2(dif[edge][:, 1], dif[edge][:, 0])
+        suitable = ~in_between(right[None, :], theta_dif, left[None, :], None if wrap is None else wrap[None, :]).any(axis=1)
+        dist = np.sqrt(((new_v - vA) ** 2).sum(axis=1)) + 0.001
+        for suit in (True, False):
+            k = np.flatnonzero(suitable == suit)
+            if len(k):
+                k = k[np.argmin(dist[k])]
+                if dist[k] < best_dist[suit]:
+                    best_dist[suit] = dist[k]
+                    best[suit] = (theta[k], rad[k])
+
+    # The desired velocity itself is the ideal candidate in open space
+    evaluate(np.array([math.atan2(vA[1], vA[0])]), np.array([norm_v - 0.001]))
+    if best[True] is None:
+        k, m = np.divmod(np.arange(n_theta * n_rad), n_rad)
+        evaluate(k * d_theta, rad_min + (m + 1) * d_rad)
+        # 3x3 neighbourhood minus the centre, in the reference's (dk, dm) order
+        dk, dm = np.array([(a, b) for a in (-1, 0, 1) for b in (-1, 0, 1) if a or b]).T
+        while d_theta > resolution:
+            d_theta *= 0.5
+            d_rad *= 0.5
+            seeds = [seed for seed in (best[True], best[False]) if seed is not None]
+            evaluate(np.concatenate([seed[0] + dk * d_theta for seed in seeds]),
+                     np.concatenate([seed[1] + dm * d_rad for seed in seeds]))
+
+    theta, rad = best[True] if best[True] is not None else best[False]
+    return np.array([rad * math.cos(theta), rad * math.sin(theta)])
+
+
+def agent_cones(cones, i):
+    """ (apex, left, right, wrap) of the cones constraining agent i, as views """
+    k = slice(cones['start'][i], cones['start'][i + 1])
+    return cones['apex'][k], cones['left'][k], cones['right'][k], cones['wrap'][k]
+
+
+def select_velocity(X, V_des, V_current, cones, ws_model):
+    P = cones['position']
+    resolution = ws_model.get('search_resolution')
+    V_opt = list(V_current)
+    for i in range(len(P)):
+        if resolution:
+            vA_post = intersect_coarse_to_fine(P[i], V_des[i], *agent_cones(cones, i), resolution=resolution)
+        else:
+            vA_post = intersect(P[i], V_des[i], *agent_cones(cones, i))
+        V_opt[i] = post_velocity(X[i], vA_post.tolist(), V_current[i], ws_model)
+    return V_opt
+
+
+def compute_V_des(X, goal, V_max):
+    """ Vectorized RVO.compute_V_des """
+    P = np.asarray(X, dtype=float).reshape(-1, 2)
+    G = np.asarray(goal, dtype=float).reshape(-1, 2)
+    dif_x = G - P
+    norm = np.sqrt((dif_x ** 2).sum(axis=1)) + 0.001
+    V_des = dif_x * (np.asarray(V_max, dtype=float) / norm)[:, None]
+    V_des[norm < 0.1] = 0
+    return V_des.tolist()
@@ -0,0 +1,116 @@
+"""
+Scenario files for headless runs and the Tk apps.
+
+Two layouts are supported:
+
+* a single JSON document (small, hand-written scenarios)
+    {
+        "X": [[x, y], ...],              initial positions
+        "goal": [[x, y], ...],           goal positions
+        "V_max": [v, ...],               maximal velocity norm per agent
+        "ws_model": {...},               workspace model passed to RVO_update
+        "step": 0.01,                    simulation step (s)
+        "total_time": 15,                total simulation time (s)
+        "trajectories": {...}            optional moving obstacles, see
+                                         obstacles.ObstacleTrajectories.to_dict
+    }
+
+* a scenario directory (large swarms): scenario.json holds the scalar metadata
+  and the ws_model scalars, and every per-agent or per-obstacle table is a .npy
+  file next to it (X, goal, V_max, V, robot_dimensions, circular_obstacles).
+  The arrays are memory-mapped on load, so opening a 100k-agent scenario only
+  reads the headers.
+"""
+import json
+import os
+
+import numpy as np
+
+SCENARIO_VERSION = 1
+# Per-agent tables stored as .npy files in a scenario directory
+AGENT_ARRAYS = ('X', 'goal', 'V_max', 'V')
+# ws_model tables stored as .npy files in a scenario directory
+WS_ARRAYS = ('robot_dimensions', 'circular_obstacles')
+
+
+def load_scenario(path, mmap=True):
+    """
+    Read a scenario file or directory into a dict with X, V, goal, V_max, ws_model, step and total_time.
+    Tables of a scenario directory are numpy arrays (memory-mapped read-only when mmap is True).
+    """
+    if os.path.isdir(path):
+        scenario = load_scenario_dir(path, mmap)
+    else:
+        with open(path) as f:
+            scenario = json.load(f)
+    if scenario.get('V') is None:
+        scenario['V'] = [[0, 0] for _ in range(len(scenario['X']))]
+    scenario.setdefault('step', 0.01)
+    scenario.setdefault('total_time', 15)
+    ws_model = scenario['ws_model']
+    ws_model.setdefault('circular_obstacles', [])
+    ws_model.setdefault('boundary', [])
+    return scenario
+
+
+def load_scenario_dir(path, mmap=True):
+    with open(os.path.join(path, 'scenario.json')) as f:
+        meta = json.load(f)
+    if meta.get('version', SCENARIO_VERSION) > SCENARIO_VERSION:
+        raise ValueError("Scenario %s has version %s, newer than supported %d"
+                         % (path, meta['version'], SCENARIO_VERSION))
+    mmap_mode = 'r' if mmap else None
+
+    def array(name):
+        file_path = os.path.join(path, name + '.npy')
+        return np.load(file_path, mmap_mode=mmap_mode) if os.path.exists(file_path) else None
+
+    scenario = {name: array(name) for name in AGENT_ARRAYS}
+    scenario['ws_model'] = dict(meta.get('ws_model', {}))
+    for name in WS_ARRAYS:
+        table = array(name)
+        if table is not None:
+            scenario['ws_model'][name] = table
+    for key in ('step', 'total_time', 'trajectories'):
+        if key in meta:
+            scenario[key] = meta[key]
+    return scenario
+
+
+def save_scenario(path, X, goal, V_max, ws_model, step=0.01, total_time=15, V=None, trajectories=None):
+    """
+    Write a scenario; paths ending in .json get the inline JSON layout, anything else a scenario directory.
+    trajectories is an obstacles.ObstacleTrajectories; ws_model['dynamic_obstacles'] is not saved,
+    the trajectories recreate it when the scenario runs.
+    """
+    ws_model = {key: value for key, value in ws_model.items() if key != 'dynamic_obstacles'}
+    if path.endswith('.json'):
+        ws_model = {key: np.asarray(value).tolist() if key in WS_ARRAYS else value
+                    for key, value in ws_model.items()}
+        scenario = {'X': np.asarray(X).tolist(), 'goal': np.asarray(goal).tolist(),
+                    'V_max': np.asarray(V_max).tolist(), 'ws_model': ws_model,
+                    'step': step, 'total_time': total_time}
+        if V is not None:
+            scenario['V'] = np.asarray(V).tolist()
+        if trajectories is not None:
+            scenario['trajectories'] = trajectories.to_dict()
+        with open(path, 'w') as f:
+            json.dump(scenario, f)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    tables = {'X': (X, 2), 'goal': (goal, 2), 'V_max': (V_max, None), 'V': (V, 2),
+              'robot_dimensions': (ws_model.get('robot_dimensions'), 2),
+              'circular_obstacles': (ws_model.get('circular_obstacles'), 3)}
+    for name, (table, width) in tables.items():
+        if table is None:
+            continue
+        table = np.asarray(table, dtype=np.float64)
+        np.save(os.path.join(path, name + '.npy'), table.reshape(-1, width) if width else table)
+
+    meta = {'version': SCENARIO_VERSION, 'n_agents': len(X), 'step': step, 'total_time': total_time,
+            'ws_model': {key: value for key, value in ws_model.items() if key not in WS_ARRAYS}}
+    if trajectories is not None:
+        meta['trajectories'] = trajectories.to_dict()
+    with open(os.path.join(path, 'scenario.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
@@ -0,0 +1,93 @@
+"""
+Level-of-detail scheduling of pairwise velocity obstacles.
+
+Pairs of agents that are far apart relative to how fast they can close the gap
+cannot collide for many ticks. InteractionScheduler buckets each directed pair by
+its time-to-possible-contact and only rebuilds the cone of a distant pair every
+k ticks; in between the cached cone boundaries are reused and only the apex is
+translated to the current positions and velocities. Pairs within one tick of
+contact are rebuilt on every tick.
+
+Each unordered pair is cached once, as seen from its lower-index agent; the other
+agent's cone has the negated boundaries, so building a pair serves both agents.
+
+Usage:
+    scheduler = InteractionScheduler(step, max_speed=max(V_max))
+    V = RVO_update(X, V_des, V, ws_model, scheduler=scheduler)
+"""
+from RVO import is_neighbor, agent_pair_RVOs, apex_offsets, cone_mode, obstacle_RVOs, robot_dimensions
+
+
+class InteractionScheduler:
+    def __init__(self, step, max_speed, periods=(1, 2, 4, 8, 16)):
+        # step: simulation step (s), max_speed: largest speed any agent can reach
+        self.step = step
+        self.max_speed = max_speed
+        self.periods = sorted(periods)
+        self.reset()
+
+    def reset(self, n_agents=0):
+        """ Drop all cached cones """
+        self.n_agents = n_agents
+        self.tick = 0
+        # (i, j), i < j -> [next_tick, bound_left, bound_right, dist_BA, rad] of agent i
+        self.cache = {}
+        self.stats = {'built': 0, 'reused': 0}
+
+    def update(self, X, V_current, ws_model):
+        """ Start a new tick; called once by RVO_update before agent_RVOs """
+        if len(X) != self.n_agents:
+            self.reset(len(X))
+        self.X = X
+        self.V_current = V_current
+        self.ws_model = ws_model
+        self.ROB_RAD = ws_model['robot_radius'] + 1
+        self.mode = cone_mode(ws_model)
+        self.tick += 1
+
+    def period(self, dist_BA, rad):
+        """ Number of ticks a cone with clearance dist_BA can be reused for """
+        closing_speed = 2 * self.max_speed
+        if closing_speed <= 0:
+            return self.periods[-1]
+        ticks_to_contact = (dist_BA - rad) / (closing_speed * self.step)
+        period = self.periods[0]
+        for k in self.periods:
+            if k <= ticks_to_contact:
+                period = k
+        return period
+
+    def agent_RVOs(self, i):
+        """ Velocity obstacles of agent i, rebuilding only the pairs that are due """
+        X, V_current, ws_model = self.X, self.V_current, self.ws_model
+        vA = V_current[i]
+        pA = X[i]
+        RVO_BA_all = []
+
+        for j in range(len(X)):
+            if i == j or not is_neighbor(pA, X[j], ws_model):
+                continue
+            vB = V_current[j]
+            key = (i, j) if i < j else (j, i)
+            entry = self.cache.get(key)
+            if entry is None or entry[0] <= self.tick:
+                RVO_BA, RVO_AB = agent_pair_RVOs(i, j, X, V_current, ws_model, self.ROB_RAD)
+                next_tick = self.tick + self.period(RVO_BA[3], RVO_BA[4])
+                self.cache[key] = [next_tick] + (RVO_BA if i < j else RVO_AB)[1:]
+                self.stats['built'] += 1
+            else:
+                # Cheap translation of the cached cone to the current apex
+                bound_left, bound_right = entry[1], entry[2]
+                if i < j:
+                    offset = apex_offsets(self.mode, pA, X[j], vA, vB, bound_left, bound_right)[0]
+                else:
+                    offset = apex_offsets(self.mode, X[j], pA, vB, vA, bound_left, bound_right)[1]
+                    bound_left = [-bound_left[0], -bound_left[1]]
+                    bound_right = [-bound_right[0], -bound_right[1]]
+                transl_vB_vA = [pA[0] + offset[0], pA[1] + offset[1]]
+                RVO_BA = [transl_vB_vA, bound_left, bound_right, entry[3], entry[4]]
+                self.stats['reused'] += 1
+            RVO_BA_all.append(RVO_BA)
+
+        RVO_BA_all.extend(obstacle_RVOs(pA, robot_dimensions(ws_model, i), ws_model, self.ROB_RAD))
+        return RVO_BA_all
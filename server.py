@@ -0,0 +1,306 @@
+"""
+Asyncio simulation server for external controllers.
+
+External planners connect over TCP or a Unix socket, submit desired velocities
+for the agents they control and subscribe to state updates. The server applies
+every submission that arrived since the last tick to the V_des table in one
+batch, takes one RVO step for the whole swarm on a workspace.Workspace, and
+publishes the new state to the subscribers.
+
+Frames are binary and little-endian: a 5-byte header (type uint8, payload length
+uint32) followed by the payload.
+    HELLO        server -> client  n_agents uint32, step float64
+    V_DES        client -> server  count uint32, ids int32[count], V_des float64[count, 2]
+    SUBSCRIBE    client -> server  every uint32 (0 unsubscribes)
+    STATE        server -> client  tick uint64, n_agents uint32, state float64[n_agents, 4] (x, y, vx, vy)
+    ERROR        server -> client  UTF-8 message
+Submitted V_des hold until they are replaced; agents nobody controls have V_des 0.
+
+Backpressure: every subscriber has a queue of at most queue_size STATE frames,
+drained by its own writer task that waits for the socket (StreamWriter.drain).
+A subscriber that falls behind loses its oldest queued frames, so it always gets
+the newest state. It cannot stall the tick loop or grow the server's memory.
+
+    python server.py scenarios/bots10.json --port 8765 --rate 20
+
+    client = await SimulationClient.connect('127.0.0.1', 8765)
+    await client.subscribe()
+    await client.send_V_des([0, 1], [[1.0, 0.0], [0.0, 1.0]])
+    tick, X, V = await client.state()
+"""
+import argparse
+import asyncio
+import logging
+import struct
+import sys
+import time
+
+import numpy as np
+
+from workspace import Workspace
+
+HEADER = struct.Struct('<BI')
+HELLO, V_DES, SUBSCRIBE, STATE, ERROR = range(5)
+
+log = logging.getLogger(__name__)
+
+
+def encode(kind, payload=b''):
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_frame(reader):
+    """ (type, payload) of the next frame; raises asyncio.IncompleteReadError at end of stream """
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+def encode_V_des(ids, V_des):
+    ids = np.asarray(ids, dtype='<i4').reshape(-1)
+    V_des = np.asarray(V_des, dtype='<f8').reshape(-1, 2)
+    if len(ids) != len(V_des):
+        raise ValueError("%d ids for %d desired velocities" % (len(ids), len(V_des)))
+    return encode(V_DES, struct.pack('<I', len(ids)) + ids.tobytes() + V_des.tobytes())
+
+
+def decode_V_des(payload):
+    count, = struct.unpack_from('<I', payload)
+    if len(payload) != 4 + count * 20:
+        raise ValueError("V_DES payload of %d bytes for %d agents" % (len(payload), count))
+    ids = np.frombuffer(payload, dtype='<i4', count=count, offset=4)
+    V_des = np.frombuffer(payload, dtype='<f8', count=2 * count, offset=4 + 4 * count).reshape(-1, 2)
+    return ids, V_des
+
+
+def encode_state(tick, X, V):
+    state = np.concatenate([X, V], axis=1).astype('<f8', copy=False)
+    return encode(STATE, struct.pack('<QI', tick, len(state)) + state.tobytes())
+
+
+def decode_state(payload):
+    tick, n = struct.unpack_from('<QI', payload)
+    state = np.frombuffer(payload, dtype='<f8', count=4 * n, offset=12).reshape(n, 4)
+    return tick, state[:, 0:2], state[:, 2:4]
+
+
+class Subscriber:
+    """ One subscribed connection: a bounded queue of STATE frames and the task writing them out """
+    def __init__(self, writer, every, queue_size):
+        self.writer = writer
+        self.every = every
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.task = asyncio.ensure_future(self.pump())
+        self.task.add_done_callback(self.finished)
+
+    def offer(self, frame):
+        """ Queue a frame without waiting, dropping the oldest queued one when full """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def pump(self):
+        while True:
+            frame = await self.queue.get()
+            self.writer.write(frame)
+            await self.writer.drain()
+
+    def finished(self, task):
+        """ Retrieve the writer task's exception, so a failed subscriber is logged rather than lost """
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("subscriber %s stopped: %r", self.writer.get_extra_info('peername'), task.exception())
+
+
+class SimulationServer:
+    """ The swarm state on a Workspace, ticked by run() and served to any number of connections """
+    def __init__(self, X, V, ws_model, step, max_neighbors=None, queue_size=4, trajectories=None):
+        self.trajectories = trajectories
+        if trajectories is not None:
+            trajectories.apply(ws_model, 0.0)
+        self.work = Workspace(len(X), ws_model, max_neighbors)
+        self.work.load(X, V)
+        self.n_agents = len(X)
+        self.ws_model = ws_model
+        self.step = step
+        self.queue_size = queue_size
+        self.tick_count = 0
+        self.pending = []
+        self.subscribers = {}
+        self.connections = {}
+        self.servers = []
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """ Listen on TCP host:port, or on the Unix socket path when given; returns the asyncio server """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.servers.append(server)
+        return server
+
+    async def handle(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            writer.write(encode(HELLO, struct.pack('<Id', self.n_agents, self.step)))
+            await writer.drain()
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == V_DES:
+                    try:
+                        ids, V_des = decode_V_des(payload)
+                        if len(ids) and (ids.min() < 0 or ids.max() >= self.n_agents):
+                            raise ValueError("agent ids outside 0..%d" % (self.n_agents - 1))
+                        if not np.isfinite(V_des).all():
+                            raise ValueError("desired velocities must be finite")
+                    except (ValueError, struct.error) as e:
+                        writer.write(encode(ERROR, str(e).encode()))
+                        await writer.drain()
+                        continue
+                    self.pending.append((ids, V_des))
+                elif kind == SUBSCRIBE:
+                    try:
+                        every, = struct.unpack('<I', payload)
+                    except struct.error:
+                        writer.write(encode(ERROR, ("SUBSCRIBE payload of %d bytes, expected 4" % len(payload)).encode()))
+                        await writer.drain()
+                        continue
+                    self.unsubscribe(writer)
+                    if every:
+                        self.subscribers[writer] = Subscriber(writer, every, self.queue_size)
+                else:
+                    writer.write(encode(ERROR, ("unexpected frame type %d" % kind).encode()))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.unsubscribe(writer)
+            self.connections.pop(writer, None)
+            writer.close()
+
+    def unsubscribe(self, writer):
+        subscriber = self.subscribers.pop(writer, None)
+        if subscriber is not None:
+            subscriber.task.cancel()
+
+    def apply_pending(self):
+        """ Scatter all V_des submitted since the last tick into the V_des table, later submissions winning """
+        pending, self.pending = self.pending, []
+        if pending:
+            ids = np.concatenate([ids for ids, _ in pending])[::-1]
+            V_des = np.concatenate([V_des for _, V_des in pending])[::-1]
+            ids, last = np.unique(ids, return_index=True)
+            self.work.V_des[ids] = V_des[last]
+        return len(pending)
+
+    async def tick(self):
+        """ One solver step for all agents, run in the default executor; then publish the state """
+        self.apply_pending()
+        if self.trajectories is not None:
+            self.trajectories.apply(self.ws_model, self.tick_count * self.step)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.solve)
+        self.tick_count += 1
+        if self.subscribers:
+            frame = encode_state(self.tick_count, self.work.X, self.work.V)
+            for subscriber in list(self.subscribers.values()):
+                if self.tick_count % subscriber.every == 0:
+                    subscriber.offer(frame)
+
+    def solve(self):
+        self.work.update()
+        self.work.advance(self.step)
+
+    async def run(self, ticks=None, rate=None):
+        """ Tick `ticks` times (forever when None), at most `rate` ticks per second when given """
+        t = 0
+        next_tick = time.perf_counter()
+        while ticks is None or t < ticks:
+            await self.tick()
+            t += 1
+            if rate:
+                next_tick += 1.0 / rate
+                await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+            else:
+                await asyncio.sleep(0)
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        handlers = list(self.connections.values())
+        for writer in list(self.connections):
+            self.unsubscribe(writer)
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+
+class SimulationClient:
+    """ Client side of the protocol over asyncio streams """
+    def __init__(self, reader, writer, n_agents, step):
+        self.reader, self.writer = reader, writer
+        self.n_agents, self.step = n_agents, step
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        kind, payload = await read_frame(reader)
+        if kind != HELLO:
+            raise ConnectionError("expected HELLO, got frame type %d" % kind)
+        n_agents, step = struct.unpack('<Id', payload)
+        return cls(reader, writer, n_agents, step)
+
+    async def send_V_des(self, ids, V_des):
+        self.writer.write(encode_V_des(ids, V_des))
+        await self.writer.drain()
+
+    async def subscribe(self, every=1):
+        self.writer.write(encode(SUBSCRIBE, struct.pack('<I', every)))
+        await self.writer.drain()
+
+    async def state(self):
+        """ (tick, X, V) of the next STATE frame; raises RuntimeError on an ERROR frame """
+        while True:
+            kind, payload = await read_frame(self.reader)
+            if kind == STATE:
+                return decode_state(payload)
+            if kind == ERROR:
+                raise RuntimeError(payload.decode())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(scenario, host='127.0.0.1', port=8765, path=None, rate=None, ticks=None):
+    ws_model = dict(scenario['ws_model'])
+    trajectories = None
+    if scenario.get('trajectories'):
+        from obstacles import ObstacleTrajectories
+        trajectories = ObstacleTrajectories.from_dict(scenario['trajectories'])
+    server = SimulationServer(scenario['X'], scenario['V'], ws_model, scenario['step'], trajectories=trajectories)
+    await server.start(host, port, path)
+    try:
+        await server.run(ticks, rate)
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    from scenario import load_scenario
+    parser = argparse.ArgumentParser(prog='python server.py', description='Serve an RVO scenario to external controllers.')
+    parser.add_argument('scenario', help='scenario file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--rate', type=float, help='ticks per second (default: as fast as possible)')
+    parser.add_argument('--ticks', type=int, help='stop after this many ticks')
+    args = parser.parse_args(argv)
+    asyncio.run(serve(load_scenario(args.scenario), args.host, args.port, args.unix, args.rate, args.ticks))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
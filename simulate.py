@@ -0,0 +1,166 @@
+"""
+Headless command-line runner.
+
+    python -m simulate scenarios/crossing.json
+    python -m simulate scenarios/crossing.json --backend numpy --output final.json
+    python -m simulate scenarios/crossing.json --render data --every 10
+    python -m simulate scenarios/crossing.json --bus rvo_state
+    python -m simulate scenarios/crossing.json --metrics crossing.metrics
+    python -m simulate scenarios/crossing.json --workspace
+    python -m simulate scenarios/crossing.json --workspace --max-neighbors 32
+    python -m simulate scenarios/crossing.json --record crossing.traj   (python replay.py crossing.traj)
+    python -m simulate scenarios/crossing.json --scheduler
+    python -m simulate scenarios/crossing.json --checkpoint run.ckpt.npz --checkpoint-every 500
+    python -m simulate scenarios/crossing.json --resume run.ckpt.npz
+
+Only RVO and numpy are imported up front; rendering backends are loaded when
+--render is given.
+"""
+import argparse
+import json
+import sys
+
+from RVO import RVO_update, get_backend
+from scenario import load_scenario
+
+
+def run(scenario, ticks=None, render=None, every=10, bus=None, metrics=None, workspace=False, recorder=None,
+        checkpointer=None, start=0, scheduler=None, max_neighbors=None):
+    """
+    Simulate a loaded scenario and return the final positions and velocities.
+    Every tick is published to the statebus.StateBus `bus`, fed to the
+    metrics.SafetyMetrics `metrics` and appended to the recording.TrajectoryRecorder
+    `recorder` (after the initial state) when given. With workspace=True the ticks run
+    on the preallocated buffers of a workspace.Workspace (numpy backend geometry), sized
+    for max_neighbors neighbours per agent (workspace.neighbor_bound when None).
+    The checkpoint.Checkpointer `checkpointer` is offered the state after every tick,
+    with the number of ticks done; a run resumed from a checkpoint passes that number
+    as `start` and continues up to `ticks`. A scheduler.InteractionScheduler `scheduler`
+    supplies the cones of distant pairs from its cache; it is saved with the checkpoints.
+    """
+    X = [list(p) for p in scenario['X']]
+    V = [list(v) for v in scenario['V']]
+    goal, V_max, ws_model, step = scenario['goal'], scenario['V_max'], scenario['ws_model'], scenario['step']
+    backend = get_backend(ws_model)
+    if ticks is None:
+        ticks = int(round(scenario['total_time'] / step))
+    traffic = None
+    if scenario.get('trajectories'):
+        from obstacles import ObstacleTrajectories
+        traffic = ObstacleTrajectories.from_dict(scenario['trajectories'])
+        traffic.apply(ws_model, 0.0)
+    if render:
+        from vis import visualize_traj_dynamic
+    if workspace:
+        import numpy as np
+        from workspace import Workspace
+        work = Workspace(len(X), ws_model, max_neighbors)
+        work.load(X, V)
+        goal_array, V_max_array = np.asarray(goal, dtype=float), np.asarray(V_max, dtype=float)
+    if recorder is not None:
+        recorder.record(X, V, ws_model.get('dynamic_obstacles'))
+
+    for t in range(start, ticks):
+        if traffic is not None:
+            traffic.apply(ws_model, t * step)
+        if workspace:
+            V_des = work.compute_V_des(goal_array, V_max_array)
+            V = work.update()
+            X = work.advance(step)
+        else:
+            V_des = backend.compute_V_des(X, goal, V_max)
+            V = RVO_update(X, V_des, V, ws_model, scheduler=scheduler)
+            X = [[X[i][0] + V[i][0] * step, X[i][1] + V[i][1] * step] for i in range(len(X))]
+        if bus is not None:
+            bus.publish(t, X, V)
+        if metrics is not None:
+            metrics.update(t, X, V, V_des)
+        if recorder is not None:
+            recorder.record(X, V, ws_model.get('dynamic_obstacles'))
+        if render and t % every == 0:
+            visualize_traj_dynamic(ws_model, X, V, goal, time=t * step, name='%s/snap%d.png' % (render, t // every))
+        if checkpointer is not None:
+            checkpointer.maybe_save(t + 1, X, V, goal, scheduler=scheduler)
+    if workspace:
+        return X.tolist(), V.tolist()
+    return X, V
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simulate', description='Run an RVO scenario headlessly.')
+    parser.add_argument('scenario', help='scenario file')
+    parser.add_argument('--backend', help='compute backend (python, numpy, numba)')
+    parser.add_argument('--ticks', type=int, help='number of ticks (default: total_time / step)')
+    parser.add_argument('--render', metavar='DIR', help='write matplotlib snapshots to DIR')
+    parser.add_argument('--every', type=int, default=10, help='snapshot every N ticks')
+    parser.add_argument('--bus', metavar='NAME', help='publish every tick to a shared-memory state bus NAME')
+    parser.add_argument('--metrics', metavar='DIR', help='write per-tick safety metrics as a column log to DIR')
+    parser.add_argument('--workspace', action='store_true',
+                        help='run the ticks on preallocated workspace buffers (numpy backend geometry)')
+    parser.add_argument('--max-neighbors', type=int, metavar='K',
+                        help='neighbours per agent the --workspace buffers hold (default: bound from neighbor_radius)')
+    parser.add_argument('--record', metavar='FILE', help='record every tick to a trajectory file for replay.py')
+    parser.add_argument('--scheduler', action='store_true',
+                        help='rebuild the cones of distant pairs only every few ticks (scheduler.InteractionScheduler)')
+    parser.add_argument('--checkpoint', metavar='FILE', help='save a checkpoint to FILE every --checkpoint-every ticks')
+    parser.add_argument('--checkpoint-every', type=int, default=100, metavar='N', help='ticks between checkpoints')
+    parser.add_argument('--resume', metavar='FILE', help='continue from a checkpoint written by --checkpoint')
+    parser.add_argument('--output', help='write final positions and velocities as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.scheduler and args.workspace:
+        parser.error('--scheduler does not apply to --workspace runs')
+    if args.max_neighbors is not None and not args.workspace:
+        parser.error('--max-neighbors sizes the --workspace buffers')
+
+    scenario = load_scenario(args.scenario)
+    if args.backend:
+        scenario['ws_model']['backend'] = args.backend
+    scheduler = None
+    if args.scheduler:
+        from scheduler import InteractionScheduler
+        scheduler = InteractionScheduler(scenario['step'], max_speed=max(scenario['V_max']))
+    start = 0
+    if args.resume:
+        from checkpoint import load_checkpoint
+        state = load_checkpoint(args.resume, scheduler)
+        scenario['X'], scenario['V'], scenario['goal'], start = state['X'], state['V'], state['goal'], state['tick']
+    checkpointer = None
+    if args.checkpoint:
+        from checkpoint import Checkpointer
+        checkpointer = Checkpointer(args.checkpoint, args.checkpoint_every)
+    bus = None
+    if args.bus:
+        from statebus import StateBus
+        bus = StateBus.create(len(scenario['X']), name=args.bus)
+    metrics = None
+    if args.metrics:
+        from metrics import METRIC_COLUMNS, ColumnLog, SafetyMetrics
+        metrics = SafetyMetrics(scenario['ws_model'], scenario['goal'], scenario['step'],
+                                log=ColumnLog(args.metrics, METRIC_COLUMNS))
+    recorder = None
+    if args.record:
+        from recording import TrajectoryRecorder
+        n_dynamic = len(scenario['trajectories']['waypoints']) if scenario.get('trajectories') else 0
+        recorder = TrajectoryRecorder(args.record, len(scenario['X']), scenario['step'], scenario['ws_model'],
+                                      scenario['goal'], n_dynamic)
+    try:
+        X, V = run(scenario, args.ticks, args.render, args.every, bus, metrics, args.workspace, recorder,
+                   checkpointer, start, scheduler, args.max_neighbors)
+    finally:
+        if bus is not None:
+            bus.close()
+        if metrics is not None:
+            metrics.log.close()
+        if recorder is not None:
+            recorder.close()
+
+    result = json.dumps({'X': [[float(c) for c in p] for p in X], 'V': [[float(c) for c in v] for v in V]})
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
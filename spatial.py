@@ -0,0 +1,50 @@
+"""
+Uniform-grid spatial hashing for neighbour queries.
+
+neighbor_pairs buckets agents into square cells of the query radius and only
+compares agents in the same or adjacent cells, all with array operations, so the
+cost grows with the number of close pairs instead of N^2.
+"""
+import numpy as np
+
+# Half of the 3x3 cell stencil: every unordered pair of cells is visited once
+HALF_STENCIL = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def neighbor_pairs(P, radius):
+    """ Index arrays (i, j), i != j, of every unordered pair with centre distance <= radius """
+    P = np.asarray(P, dtype=float).reshape(-1, 2)
+    n = len(P)
+    if n < 2 or radius <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    cell = np.floor((P - P.min(axis=0)) / radius).astype(np.int64)
+    cell[:, 1] += 1  # keep cy - 1 non-negative so keys stay unique
+    stride = cell[:, 1].max() + 2
+    key = cell[:, 0] * stride + cell[:, 1]
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+
+    I, J = [], []
+    for dx, dy in HALF_STENCIL:
+        target = (cell[:, 0] + dx) * stride + cell[:, 1] + dy
+        lo = np.searchsorted(sorted_key, target, side='left')
+        counts = np.searchsorted(sorted_key, target, side='right') - lo
+        total = counts.sum()
+        if total == 0:
+            continue
+        i = np.repeat(np.arange(n), counts)
+        start = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        j = order[start + np.arange(total)]
+        if (dx, dy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        I.append(i)
+        J.append(j)
+    if not I:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    I, J = np.concatenate(I), np.concatenate(J)
+    d = P[I] - P[J]
+    close = (d ** 2).sum(axis=1) <= radius * radius
+    return I[close], J[close]
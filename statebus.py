@@ -0,0 +1,122 @@
+"""
+Shared-memory state bus between the solver and any number of observers.
+
+The solver process owns a ring buffer of the last `slots` ticks of positions and
+velocities in a multiprocessing.shared_memory block. Observers (viewers,
+recorders, snapshotters) attach by name in their own processes and read through
+NumPy views of the block, so adding an observer costs the solver nothing.
+
+Layout of the block (all int64/float64):
+    header   [n_agents, slots, latest sequence number]
+    seqs     (slots,)              sequence number stored in each slot, -1 while written
+    ticks    (slots,)              simulation tick of each slot
+    data     (slots, n_agents, 4)  x, y, vx, vy
+
+Writers bump a slot's sequence number only after the data is complete; readers
+check it before and after using a view (a seqlock), since a slot is overwritten
+once `slots` newer ticks have been published.
+
+    bus = StateBus.create(len(X), slots=16)          # solver
+    bus.publish(t, X, V)
+
+    bus = StateBus.attach(name)                      # observer process
+    seq, tick, state = bus.latest()
+    ... use state[:, 0:2] ...
+    if bus.is_current(seq): ...
+"""
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+HEADER = 3
+
+
+class StateBus:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+        self.n_agents, self.slots = int(header[0]), int(header[1])
+        self.header = header
+        offset = HEADER * 8
+        self.seqs = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slots * 8
+        self.ticks = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slots * 8
+        self.data = np.ndarray((self.slots, self.n_agents, 4), dtype=np.float64, buffer=shm.buf, offset=offset)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, n_agents, slots=8, name=None):
+        """ Allocate a new bus; the creating process is the single writer """
+        size = (HEADER + 2 * slots + slots * n_agents * 4) * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = [n_agents, slots, -1]
+        np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=HEADER * 8)[:] = -1
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """ Attach to an existing bus as a reader """
+        if sys.version_info >= (3, 13):
+            return cls(shared_memory.SharedMemory(name=name, track=False), owner=False)
+        # Before 3.13 attaching registers the block with the resource tracker, which unlinks
+        # it when the observer exits. Skip the registration; unregistering afterwards would
+        # also drop the owner's when the observer shares its tracker (multiprocessing children)
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: rtype != 'shared_memory' and register(name, rtype)
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    def publish(self, tick, X, V):
+        """ Write the state of one tick into the next slot """
+        seq = int(self.header[2]) + 1
+        slot = seq % self.slots
+        self.seqs[slot] = -1
+        self.ticks[slot] = tick
+        self.data[slot, :, 0:2] = X
+        self.data[slot, :, 2:4] = V
+        self.seqs[slot] = seq
+        self.header[2] = seq
+        return seq
+
+    def latest(self):
+        """ (seq, tick, view) of the newest complete slot, or (-1, -1, None) before the first publish """
+        seq = int(self.header[2])
+        return (seq,) + self.read(seq) if seq >= 0 else (-1, -1, None)
+
+    def read(self, seq):
+        """ (tick, view) of sequence number seq, or (-1, None) if it was overwritten or not written yet """
+        slot = seq % self.slots
+        if self.seqs[slot] != seq:
+            return -1, None
+        return int(self.ticks[slot]), self.data[slot]
+
+    def is_current(self, seq):
+        """ True while the slot of seq has not been overwritten; check after using a view """
+        return self.seqs[seq % self.slots] == seq
+
+    def wait_next(self, last_seq, timeout=None, poll=0.001):
+        """ Block until a sequence number newer than last_seq is published; returns it or -1 on timeout """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.header[2] <= last_seq:
+            if deadline is not None and time.monotonic() > deadline:
+                return -1
+            time.sleep(poll)
+        return int(self.header[2])
+
+    def close(self):
+        """ Detach; the owner also frees the shared memory """
+        del self.header, self.seqs, self.ticks, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -1,26 +1,45 @@
+import os
 import sys
-import tkinter as tk
-from tkinter import simpledialog, messagebox
 import numpy as np
-from RVO import RVO_update, compute_V_des
+from RVO import DESTINATION_PHASE, RVO_update_budgeted, compute_V_des_batch
+from checkpoint import Checkpointer, load_checkpoint
+from scenario import load_scenario, save_scenario
+from goals import GoalGrid
+
+# Tk is imported by load_gui() so the module can be imported headless
+tk = filedialog = simpledialog = messagebox = None
+
+
+def load_gui():
+    """Import the GUI toolkit on first use."""
+    global tk, filedialog, simpledialog, messagebox
+    if tk is None:
+        import tkinter as tk
+        from tkinter import filedialog, simpledialog, messagebox
+
 
 
 class BotSimulationApp:
     def __init__(self, root):
+        load_gui()
         self.root = root
         self.canvas_width = 400
         self.canvas_height = 400
         self.bot_size = 20  # Define the size of the square bots
         self.goal_size = 20  # Define the size of the square goals
         self.goal_positions = []
+        self.goal_grid = GoalGrid(self.goal_size)  # Background grid for goal overlap checks
 
         # Initialize simulation parameters
         self.num_bots = 0
         self.bots_positions = []
         self.V_max = []
+        self.time_budget = 0.03  # Seconds of solver time per tick before agents are degraded
+        self.checkpoint_path = 'test2.ckpt.npz'  # Runs are saved here every checkpoint_every ticks
+        self.checkpoint_every = 100
         self.ws_model = {
             'robot_radius': self.bot_size // 2,
-            'robot_dimensions': [(2, 2) for _ in range(10)],
+            'robot_dimensions': [],  # (width, height) per bot, filled in by set_bots
             'circular_obstacles': [],
             'boundary': []
         }
@@ -49,6 +68,12 @@ class BotSimulationApp:
         btn_reset = tk.Button(self.root, text="Reset", command=self.reset_simulation)
         btn_reset.grid(row=2, column=0, columnspan=2, pady=10)
 
+        btn_save_layout = tk.Button(self.root, text="Save Layout", command=self.save_layout)
+        btn_save_layout.grid(row=3, column=0, pady=10)
+
+        btn_load_layout = tk.Button(self.root, text="Load Layout", command=self.load_layout)
+        btn_load_layout.grid(row=3, column=1, pady=10)
+
         # Bind click events
         self.canvas_goals.bind("<Button-1>", self.on_click_set_goal)
 
@@ -56,6 +81,7 @@ class BotSimulationApp:
         """Prompt user to input number of bots."""
         self.num_bots = simpledialog.askinteger("Input", "Enter number of bots:")
         self.V_max = [40 for _ in range(self.num_bots)]
+        self.ws_model['robot_dimensions'] = [(self.bot_size, self.bot_size) for _ in range(self.num_bots)]
 
         # Arrange bots in a line on the right canvas
         self.bots_positions = self.arrange_in_line()
@@ -100,15 +126,40 @@ class BotSimulationApp:
 
         # Add goal position and draw the square
         self.goal_positions.append([x, y])
+        self.goal_grid.add(x, y)
+        self.draw_goal(x, y)
+
+    def draw_goal(self, x, y):
+        """Draw a goal square on the left (first) canvas."""
         self.canvas_goals.create_rectangle(x - self.goal_size // 2, y - self.goal_size // 2,
                                            x + self.goal_size // 2, y + self.goal_size // 2, fill='blue')
 
+    def save_layout(self):
+        """Save the bots and goal layout as a scenario file."""
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Scenario", "*.json")])
+        if file_path:
+            save_scenario(file_path, self.bots_positions, self.goal_positions, self.V_max, self.ws_model)
+
+    def load_layout(self):
+        """Load a bots and goal layout saved with save_layout."""
+        file_path = filedialog.askopenfilename(filetypes=[("Scenario", "*.json")])
+        if not file_path:
+            return
+        scenario = load_scenario(file_path)
+        self.bots_positions = [list(pos) for pos in scenario['X']]
+        self.goal_positions = [list(pos) for pos in scenario['goal']]
+        self.goal_grid = GoalGrid(self.goal_size, self.goal_positions)
+        self.num_bots = len(self.bots_positions)
+        self.V_max = list(scenario['V_max'])
+        self.ws_model['robot_dimensions'] = [(self.bot_size, self.bot_size) for _ in range(self.num_bots)]
+        self.draw_bots_in_line()
+        self.canvas_goals.delete("all")
+        for x, y in self.goal_positions:
+            self.draw_goal(x, y)
+
     def is_intersecting(self, x, y):
         """Check if a new square at (x, y) would intersect with any existing squares."""
-        for gx, gy in self.goal_positions:
-            if abs(gx - x) < self.goal_size and abs(gy - y) < self.goal_size:
-                return True
-        return False
+        return not self.goal_grid.fits(x, y)
 
     def flash_red_warning(self, x, y):
         """Flash a red square when an intersection is detected."""
@@ -118,10 +169,23 @@ class BotSimulationApp:
         self.root.after(500, lambda: self.canvas_goals.delete("warning"))  # Remove warning after 500ms
 
     def start_simulation(self):
-        """Run the bot simulation after setting up initial and goal positions."""
-        if len(self.bots_positions) == self.num_bots and len(self.goal_positions) == self.num_bots:
+        """Run the bot simulation after setting up initial and goal positions, or resume the saved run."""
+        if not self.num_bots and os.path.exists(self.checkpoint_path) and messagebox.askyesno(
+                "Resume", "Resume the run saved in %s?" % self.checkpoint_path):
+            self.resume_simulation()
+        elif len(self.bots_positions) == self.num_bots and len(self.goal_positions) == self.num_bots:
             self.run_simulation()
 
+    def resume_simulation(self):
+        """Continue the run saved in the checkpoint file from its tick."""
+        state = load_checkpoint(self.checkpoint_path)
+        self.bots_positions, self.goal_positions = state['X'], state['goal']
+        self.num_bots = len(self.bots_positions)
+        self.V_max = [40 for _ in range(self.num_bots)]
+        for x, y in self.goal_positions:
+            self.draw_goal(x, y)
+        self.run_simulation(state['V'], state['tick'])
+
     def reset_simulation(self):
         """Reset the canvas and clear the positions of bots and goals."""
         # Clear the canvas
@@ -131,30 +195,35 @@ class BotSimulationApp:
         # Reset positions and velocity
         self.bots_positions = []
         self.goal_positions = []
+        self.goal_grid.clear()
         self.num_bots = 0
         self.V_max = []
 
         # Notify the user that the reset is complete
         messagebox.showinfo("Reset Complete", "The simulation has been reset.")
 
-    def run_simulation(self):
-        """Run the simulation and visualize bot movements."""
+    def run_simulation(self, V=None, start=0):
+        """Run the simulation and visualize bot movements, from tick start with velocities V when resuming."""
         X = self.bots_positions
         goal = self.goal_positions
         total_time = 1000
         step = 0.1
 
-        # Initialize velocities
-        V = [[0, 0] for _ in range(len(X))]
+        # Initialize velocities unless resuming
+        if V is None:
+            V = [[0, 0] for _ in range(len(X))]
 
-        # Simulation loop
-        t = 0
+        # Simulation loop, saved to the checkpoint file every checkpoint_every ticks
+        checkpointer = Checkpointer(self.checkpoint_path, self.checkpoint_every)
+        t = start
         while t * step < total_time:
-            # Compute desired velocity to goal
-            V_des = compute_V_des(X, goal, self.V_max)
+            # Compute desired velocity to goal, slowing down over the last bot length
+            # so bots settle on their goals
+            V_des, arrived = compute_V_des_batch(X, goal, self.V_max, slowdown_radius=self.bot_size)
 
-            # Compute the optimal velocity to avoid collision
-            V = RVO_update(X, V_des, V, self.ws_model)
+            # Compute the optimal velocity to avoid collision within the per-tick budget
+            V, degraded = RVO_update_budgeted(X, V_des, V, self.ws_model, self.time_budget)
+            self.root.title(f"Bot Simulation - degraded agents: {degraded}")
 
             # Update positions
             X = update_positions(X, V, step)
@@ -172,6 +241,7 @@ class BotSimulationApp:
 
             self.root.update()
             t += 1
+            checkpointer.maybe_save(t, X, V, goal, DESTINATION_PHASE)
 
         # Simulation complete
         messagebox.showinfo("Simulation Complete", "All bots reached their goals.")
@@ -184,6 +254,7 @@ def update_positions(X, V, step):
 
 def main():
     """Main entry point for the application."""
+    load_gui()
     root = tk.Tk()
     root.title("Bot Simulation")
     app = BotSimulationApp(root)
@@ -1,28 +1,49 @@
+import os
 import sys
-import tkinter as tk
-from tkinter import filedialog, simpledialog, messagebox
-from PIL import Image, ImageTk
 import numpy as np
-from RVO import RVO_update, compute_V_des
+from RVO import DESTINATION_PHASE, RVO_update_budgeted, compute_V_des_batch
+from checkpoint import Checkpointer, load_checkpoint
+from scenario import load_scenario, save_scenario
+from goals import GoalGrid, goals_from_image
+from pyramid import ImagePyramid
+
+# Tk and PIL are imported by load_gui() so the module can be imported headless
+tk = filedialog = simpledialog = messagebox = Image = ImageTk = None
+
+
+def load_gui():
+    """Import the GUI toolkits on first use."""
+    global tk, filedialog, simpledialog, messagebox, Image, ImageTk
+    if tk is None:
+        import tkinter as tk
+        from tkinter import filedialog, simpledialog, messagebox
+        from PIL import Image, ImageTk
+
 
 class BotSimulationApp:
     def __init__(self, root):
+        load_gui()
         self.root = root
         self.canvas_width = 400
         self.canvas_height = 400
         self.bot_size = 40  # Updated bot size to 240x240 pixels
         self.goal_size = 40  # Updated goal size to 240x240 pixels
         self.goal_positions = []
-        self.image = None
+        self.goal_grid = GoalGrid(self.goal_size)  # Background grid for goal overlap checks
+        self.image = None  # Uploaded image at canvas size
         self.image_tk = None
+        self.pyramid = None  # Tiled pyramid of the uploaded image, serving bot tiles at display size
 
         # Initialize simulation parameters
         self.num_bots = 0
         self.bots_positions = []
         self.V_max = []
+        self.time_budget = 0.03  # Seconds of solver time per tick before agents are degraded
+        self.checkpoint_path = 'test3.ckpt.npz'  # Runs are saved here every checkpoint_every ticks
+        self.checkpoint_every = 100
         self.ws_model = {
             'robot_radius': self.bot_size // 2,
-            'robot_dimensions': [(2, 2) for _ in range(10)],
+            'robot_dimensions': [],  # (width, height) per bot, filled in by set_bots
             'circular_obstacles': [],
             'boundary': []
         }
@@ -54,6 +75,15 @@ class BotSimulationApp:
         btn_reset = tk.Button(self.root, text="Reset", command=self.reset_simulation)
         btn_reset.grid(row=2, column=1, pady=10)
 
+        btn_save_layout = tk.Button(self.root, text="Save Layout", command=self.save_layout)
+        btn_save_layout.grid(row=3, column=0, pady=10)
+
+        btn_load_layout = tk.Button(self.root, text="Load Layout", command=self.load_layout)
+        btn_load_layout.grid(row=3, column=1, pady=10)
+
+        btn_image_goals = tk.Button(self.root, text="Goals From Image", command=self.generate_goals)
+        btn_image_goals.grid(row=4, column=0, pady=10)
+
         # Bind click events
         self.canvas_goals.bind("<Button-1>", self.on_click_set_goal)
 
@@ -61,9 +91,9 @@ class BotSimulationApp:
         """Allow user to upload an image to the first canvas."""
         file_path = filedialog.askopenfilename()
         if file_path:
-            # Load the image
-            self.image = Image.open(file_path)
-            self.image = self.image.resize((self.canvas_width, self.canvas_height), Image.ANTIALIAS)
+            # Build the tiled pyramid once and show the image at canvas size
+            self.pyramid = ImagePyramid(file_path)
+            self.image = self.pyramid.view((self.canvas_width, self.canvas_height))
             self.image_tk = ImageTk.PhotoImage(self.image)
 
             # Display the image on the first canvas
@@ -73,6 +103,7 @@ class BotSimulationApp:
         """Prompt user to input number of bots."""
         self.num_bots = simpledialog.askinteger("Input", "Enter number of bots:")
         self.V_max = [40 for _ in range(self.num_bots)]
+        self.ws_model['robot_dimensions'] = [(self.bot_size, self.bot_size) for _ in range(self.num_bots)]
 
         # Arrange bots in a line on the right canvas
         self.bots_positions = self.arrange_in_line()
@@ -117,15 +148,62 @@ class BotSimulationApp:
 
         # Add goal position and draw the square
         self.goal_positions.append([x, y])
+        self.goal_grid.add(x, y)
+        self.draw_goal(x, y)
+
+    def draw_goal(self, x, y):
+        """Draw a goal square on the left (first) canvas."""
         self.canvas_goals.create_rectangle(x - self.goal_size // 2, y - self.goal_size // 2,
                                            x + self.goal_size // 2, y + self.goal_size // 2, outline='blue')
 
+    def save_layout(self):
+        """Save the bots and goal layout as a scenario file."""
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Scenario", "*.json")])
+        if file_path:
+            save_scenario(file_path, self.bots_positions, self.goal_positions, self.V_max, self.ws_model)
+
+    def load_layout(self):
+        """Load a bots and goal layout saved with save_layout."""
+        file_path = filedialog.askopenfilename(filetypes=[("Scenario", "*.json")])
+        if not file_path:
+            return
+        scenario = load_scenario(file_path)
+        self.bots_positions = [list(pos) for pos in scenario['X']]
+        self.goal_positions = [list(pos) for pos in scenario['goal']]
+        self.goal_grid = GoalGrid(self.goal_size, self.goal_positions)
+        self.num_bots = len(self.bots_positions)
+        self.V_max = list(scenario['V_max'])
+        self.ws_model['robot_dimensions'] = [(self.bot_size, self.bot_size) for _ in range(self.num_bots)]
+        self.draw_bots_in_line()
+        self.redraw_goals()
+
+    def generate_goals(self):
+        """Place one goal per bot on the uploaded image, more of them where the image is dark (or opaque)."""
+        if self.image is None or not self.num_bots:
+            messagebox.showwarning("Warning", "Upload an image and set the bots first!")
+            return
+        if self.image.mode == 'RGBA':
+            goals = goals_from_image(self.image, self.num_bots, self.goal_size, mode='alpha')
+        else:
+            goals = goals_from_image(self.image.convert('RGB'), self.num_bots, self.goal_size, invert=True)
+        if len(goals) < self.num_bots:
+            messagebox.showwarning("Warning", f"Only {len(goals)} goals fit on the image!")
+            return
+        self.goal_positions = goals.tolist()
+        self.goal_grid = GoalGrid(self.goal_size, self.goal_positions)
+        self.redraw_goals()
+
+    def redraw_goals(self):
+        """Redraw the image and all goals on the left (first) canvas."""
+        self.canvas_goals.delete("all")
+        if self.image_tk:
+            self.canvas_goals.create_image(0, 0, anchor=tk.NW, image=self.image_tk)
+        for x, y in self.goal_positions:
+            self.draw_goal(x, y)
+
     def is_intersecting(self, x, y):
         """Check if a new square at (x, y) would intersect with any existing squares."""
-        for gx, gy in self.goal_positions:
-            if abs(gx - x) < self.goal_size and abs(gy - y) < self.goal_size:
-                return True
-        return False
+        return not self.goal_grid.fits(x, y)
 
     def flash_red_warning(self, x, y):
         """Flash a red square when an intersection is detected."""
@@ -135,10 +213,23 @@ class BotSimulationApp:
         self.root.after(500, lambda: self.canvas_goals.delete("warning"))  # Remove warning after 500ms
 
     def start_simulation(self):
-        """Run the bot simulation after setting up initial and goal positions."""
-        if len(self.bots_positions) == self.num_bots and len(self.goal_positions) == self.num_bots:
+        """Run the bot simulation after setting up initial and goal positions, or resume the saved run."""
+        if not self.num_bots and os.path.exists(self.checkpoint_path) and messagebox.askyesno(
+                "Resume", "Resume the run saved in %s?" % self.checkpoint_path):
+            self.resume_simulation()
+        elif len(self.bots_positions) == self.num_bots and len(self.goal_positions) == self.num_bots:
             self.run_simulation()
 
+    def resume_simulation(self):
+        """Continue the run saved in the checkpoint file from its tick."""
+        state = load_checkpoint(self.checkpoint_path)
+        self.bots_positions, self.goal_positions = state['X'], state['goal']
+        self.num_bots = len(self.bots_positions)
+        self.V_max = [40 for _ in range(self.num_bots)]
+        for x, y in self.goal_positions:
+            self.draw_goal(x, y)
+        self.run_simulation(state['V'], state['tick'])
+
     def reset_simulation(self):
         """Reset the canvas and clear the positions of bots and goals."""
         # Clear the canvas
@@ -148,30 +239,35 @@ class BotSimulationApp:
         # Reset positions and velocity
         self.bots_positions = []
         self.goal_positions = []
+        self.goal_grid.clear()
         self.num_bots = 0
         self.V_max = []
 
         # Notify the user that the reset is complete
         messagebox.showinfo("Reset Complete", "The simulation has been reset.")
 
-    def run_simulation(self):
-        """Run the simulation and visualize bot movements."""
+    def run_simulation(self, V=None, start=0):
+        """Run the simulation and visualize bot movements, from tick start with velocities V when resuming."""
         X = self.bots_positions
         goal = self.goal_positions
         total_time = 1000
         step = 0.1
 
-        # Initialize velocities
-        V = [[0, 0] for _ in range(len(X))]
+        # Initialize velocities unless resuming
+        if V is None:
+            V = [[0, 0] for _ in range(len(X))]
 
-        # Simulation loop
-        t = 0
+        # Simulation loop, saved to the checkpoint file every checkpoint_every ticks
+        checkpointer = Checkpointer(self.checkpoint_path, self.checkpoint_every)
+        t = start
         while t * step < total_time:
-            # Compute desired velocity to goal
-            V_des = compute_V_des(X, goal, self.V_max)
+            # Compute desired velocity to goal, slowing down over the last bot length
+            # so bots settle on their goals
+            V_des, arrived = compute_V_des_batch(X, goal, self.V_max, slowdown_radius=self.bot_size)
 
-            # Compute the optimal velocity to avoid collision
-            V = RVO_update(X, V_des, V, self.ws_model)
+            # Compute the optimal velocity to avoid collision within the per-tick budget
+            V, degraded = RVO_update_budgeted(X, V_des, V, self.ws_model, self.time_budget)
+            self.root.title(f"Bot Simulation - degraded agents: {degraded}")
 
             # Update positions
             X = update_positions(X, V, step)
@@ -192,15 +288,22 @@ class BotSimulationApp:
 
             self.canvas_bots.update()
             t += 1
+            checkpointer.maybe_save(t, X, V, goal, DESTINATION_PHASE)
 
     def extract_image_section(self, bot_id):
         """Extract the part of the image corresponding to the given bot's ID."""
+        if len(self.goal_positions) == self.num_bots:
+            # Mosaic: each bot carries the part of the image under its goal
+            gx, gy = (int(c) for c in self.goal_positions[bot_id])
+            half = self.bot_size // 2
+            return self.image_section(gx - half, gy - half, self.bot_size, self.bot_size)
+
         # Determine the number of columns/rows based on the number of bots
         num_columns = int(np.ceil(np.sqrt(self.num_bots)))
 
         # Calculate width and height of each section
-        section_width = self.image.width // num_columns
-        section_height = self.image.height // num_columns
+        section_width = self.canvas_width // num_columns
+        section_height = self.canvas_height // num_columns
 
         # Calculate the x and y coordinates for the current bot's section
         row = bot_id // num_columns
@@ -208,12 +311,13 @@ class BotSimulationApp:
         x_start = col * section_width
         y_start = row * section_height
 
-        # Crop the image section corresponding to this bot
-        cropped_image = self.image.crop((x_start, y_start, x_start + section_width, y_start + section_height))
+        # Image section corresponding to this bot, served at bot size
+        return self.image_section(x_start, y_start, section_width, section_height, (self.bot_size, self.bot_size))
 
-        # Resize to fit bot size
-        cropped_image = cropped_image.resize((self.bot_size, self.bot_size), Image.ANTIALIAS)
-        return cropped_image
+    def image_section(self, x, y, width, height, size=None):
+        """Part of the uploaded image under a canvas box, served by the pyramid at the size it is shown."""
+        sx, sy = self.pyramid.to_full((self.canvas_width, self.canvas_height))
+        return self.pyramid.region((x * sx, y * sy, (x + width) * sx, (y + height) * sy), size or (width, height))
 
 # Utility functions
 def update_positions(X, V, step):
@@ -222,6 +326,7 @@ def update_positions(X, V, step):
 
 # Run the app
 if __name__ == "__main__":
+    load_gui()
     root = tk.Tk()
     app = BotSimulationApp(root)
     root.mainloop()
@@ -1,18 +1,15 @@
 #!/usr/bin/env python
-import matplotlib
-import matplotlib.pyplot as pyplot
-from matplotlib.path import Path
-import matplotlib.patches as patches
-from matplotlib.patches import Polygon
-import matplotlib.cm as cmx
-import matplotlib.colors as colors
-
 from math import pi as PI
 from math import atan2, sin, cos, sqrt
 
+# matplotlib is imported on first use so that importing this module stays cheap
+# for headless runs that never render.
 
 
 def visualize_traj_dynamic(ws_model, X, U, goal, time = None, name=None):
+    import matplotlib
+    import matplotlib.patches
+    import matplotlib.pyplot as pyplot
     figure = pyplot.figure()
     ax = figure.add_subplot(1,1,1)
     cmap = get_cmap(len(X))
@@ -25,6 +22,15 @@ def visualize_traj_dynamic(ws_model, X, U, goal, time = None, name=None):
                 fill = True,
                 alpha=1)
         ax.add_patch(srec)
+    for hole in ws_model.get('dynamic_obstacles', []):
+        mover = matplotlib.patches.Circle(
+                (hole[0], hole[1]),
+                radius = hole[2],
+                facecolor= 'orange',
+                edgecolor='red',
+                alpha=1)
+        ax.add_patch(mover)
+        ax.arrow(hole[0], hole[1], hole[3], hole[4], head_width=0.05, head_length=0.1, fc='red', ec='red')
     # ---plot traj---
     for i in range(0,len(X)):
         #-------plot car
@@ -61,6 +67,8 @@ def visualize_traj_dynamic(ws_model, X, U, goal, time = None, name=None):
 
 def get_cmap(N):
     '''Returns a function that maps each index in 0, 1, ... N-1 to a distinct RGB color.'''
+    import matplotlib.cm as cmx
+    import matplotlib.colors as colors
     color_norm  = colors.Normalize(vmin=0, vmax=N-1)
     scalar_map = cmx.ScalarMappable(norm=color_norm, cmap='hsv') 
     def map_index_to_rgb_color(index):
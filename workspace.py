@@ -0,0 +1,581 @@
+"""
+Allocation-free RVO ticks on preallocated buffers.
+
+A Workspace is sized once for N agents, the static obstacles of a ws_model and
+the largest number of neighbours any agent may have. It owns the agent state,
+the cone buffers and all per-agent scratch space of the numpy backend's
+algorithm, and every tick writes into them with out= operations, so steady-state
+ticks allocate next to nothing and produce the same velocities as the numpy
+backend.
+
+    work = Workspace(len(X), ws_model, max_neighbors=32)
+    work.load(X, V)
+    for t in range(ticks):
+        work.compute_V_des(goal, V_max)
+        work.update()
+        work.advance(step)
+    X, V = work.X, work.V
+
+The cone buffers hold max_neighbors cones per agent and the pair buffers N *
+max_neighbors / 2 pairs, so memory grows with N * max_neighbors. Without
+ws_model['neighbor_radius'] every pair is a neighbour, the pairs are fixed and
+max_neighbors defaults to N - 1. With it the pairs come from
+spatial.neighbor_pairs on every tick, which allocates in proportion to the pairs
+found; max_neighbors defaults to how many non-overlapping footprints fit within
+the radius (see neighbor_bound), and a tick raises ValueError when an agent has
+more than max_neighbors.
+
+The robot dimensions, circular obstacles, neighbor_radius, search_resolution and
+mode (VO, RVO or HRVO) of ws_model are read when the workspace is created. The
+number and radii of ws_model['dynamic_obstacles'] are fixed then too; their
+positions and velocities are copied in on every tick (see obstacles.py).
+
+NumPy hands a ufunc a temporary buffer whenever an operand is broadcast or a
+multi-dimensional operand is not contiguous, so broadcasts are written out with
+np.copyto first and every multi-dimensional ufunc operand is a contiguous view
+of a preallocated buffer.
+
+`python workspace.py` compares the peak allocations of steady-state ticks with
+the numpy backend and exits non-zero when the workspace holds more than a few KiB.
+"""
+import sys
+import tracemalloc
+
+import numpy as np
+
+from RVO import HRVO_MIN_DET, MODES, cone_mode, post_velocity
+from footprint import half_extents
+from rvo_numpy import PI, intersect_coarse_to_fine, obstacle_cones, obstacle_table, pair_cones, precision
+from spatial import neighbor_pairs
+
+# Candidate grid of RVO.intersect: angular step and radial samples
+D_THETA = 0.05
+N_RAD = 10
+
+
+def update_positions(X, V, step, out=None, scratch=None):
+    """ X + V * step for (N, 2) arrays, written to out (X itself for an in-place update) """
+    scratch = np.multiply(V, step, out=scratch)
+    return np.add(X, scratch, out=out)
+
+
+def neighbor_bound(n_agents, ws_model):
+    """
+    Default max_neighbors: N - 1 without ws_model['neighbor_radius']. With it, the most
+    agents whose footprints can lie around one agent within the radius without
+    overlapping: their areas add up to at most the disc of neighbor_radius plus the
+    largest half diagonal. Capped at N - 1.
+    """
+    bound = max(n_agents - 1, 0)
+    if ws_model.get('neighbor_radius') is None or bound == 0:
+        return bound
+    half = half_extents(ws_model, n_agents)
+    area = 4 * (half[:, 0] * half[:, 1]).min()
+    if area <= 0:
+        return bound
+    reach = ws_model['neighbor_radius'] + np.sqrt((half ** 2).sum(axis=1)).max()
+    # The disc holds the agent itself too
+    return min(bound, int(PI * reach ** 2 / area) - 1)
+
+
+def buffers(count, size, dtype):
+    """ count flat buffers of size elements """
+    return [np.zeros(size, dtype=dtype) for _ in range(count)]
+
+
+def view(buf, shape):
+    """ Contiguous view of the front of a flat buffer """
+    size = 1
+    for dim in shape:
+        size *= dim
+    return buf[:size].reshape(shape)
+
+
+class Workspace:
+    def __init__(self, n_agents, ws_model, max_neighbors=None):
+        dtype = precision(ws_model)
+        n = n_agents
+        holes = obstacle_table(ws_model)
+        n_holes = len(holes)
+        self.n_static = n_holes - len(ws_model.get('dynamic_obstacles', []))
+        self.n_agents, self.n_holes, self.ws_model, self.dtype = n, n_holes, ws_model, dtype
+        self.max_neighbors = neighbor_bound(n, ws_model) if max_neighbors is None else max_neighbors
+        self.ROB_RAD = ws_model['robot_radius'] + 1
+        self.MIN_SEPARATION = 4 * self.ROB_RAD
+        self.neighbor_radius = ws_model.get('neighbor_radius')
+        self.search_resolution = ws_model.get('search_resolution')
+        self.mode = cone_mode(ws_model)
+
+        # Agent state, and float64 copies of it: the cone geometry is evaluated in
+        # float64 before it is stored, as in rvo_numpy.build_cones
+        self.X = np.zeros((n, 2), dtype=dtype)
+        self.V = np.zeros((n, 2), dtype=dtype)
+        self.V_des = np.zeros((n, 2), dtype=dtype)
+        self.V_new = np.zeros((n, 2), dtype=dtype)
+        self.move = np.zeros((n, 2), dtype=dtype)
+        self.P64 = np.zeros((n, 2))
+        self.V64 = np.zeros((n, 2))
+        self.des64 = np.zeros((n, 2))
+        self.norm64, self.tmp64 = buffers(2, n, np.float64)
+        self.stopped = np.zeros(n, dtype=bool)
+        self.half = half_extents(ws_model, n)
+
+        # Agent-agent cones: row i holds the count[i] cones constraining agent i
+        shape = (n, self.max_neighbors)
+        self.apex_x, self.apex_y, self.left, self.right = (np.zeros(shape, dtype=dtype) for _ in range(4))
+        self.wrap = np.zeros(shape, dtype=bool)
+        self.count = np.zeros(n, dtype=np.intp)
+
+        # Unordered agent pairs i < j, at most N * max_neighbors / 2 of them; set_pairs
+        # sets each group's views of the pairs in use as an attribute of the same name
+        capacity = n * self.max_neighbors // 2
+        self.pair_buffers = {
+            'pair_index': buffers(4, capacity, np.intp),  # I, J and the flat cone slots of i and j
+            'pair': buffers(20, capacity, np.float64),
+            'sides': buffers(4, capacity, np.float64),
+            'bounds': buffers(4, capacity, np.float64),
+            'pair_flags': buffers(3, capacity, bool),
+        }
+        if self.mode == 'HRVO':
+            self.pair_buffers['hrvo'] = buffers(7, capacity, np.float64)
+            self.pair_buffers['hrvo_flags'] = buffers(2, capacity, bool)
+        if self.neighbor_radius is None:
+            self.set_pairs(*np.triu_indices(n, 1))
+        else:
+            self.set_pairs(np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+
+        # Circular obstacle cones; their apex is the agent translated by the obstacle's velocity
+        self.hole_x, self.hole_y, self.hole_vx, self.hole_vy = (np.ascontiguousarray(holes[:, c]) for c in (0, 1, 3, 4))
+        self.hole_rad = holes[:, 2] * 1.5 + self.ROB_RAD
+        self.hole_half_sum_x = self.half[:, 0:1] + holes[None, :, 2] / 2
+        self.hole_half_sum_y = self.half[:, 1:2] + holes[None, :, 2] / 2
+        self.hole_left = np.zeros((n, n_holes))
+        self.hole_right = np.zeros((n, n_holes))
+        self.hole_wrap = np.zeros((n, n_holes), dtype=bool)
+        self.hole_edge = np.zeros((n, n_holes), dtype=bool)
+        self.hole = [np.zeros((n, n_holes)) for _ in range(9)]
+
+        # Per-agent candidate search: a theta-major (theta, rad) grid against k cones
+        thetas = np.arange(0, 2 * PI, D_THETA, dtype=dtype)
+        self.cos_t = np.cos(thetas)[:, None]
+        self.sin_t = np.sin(thetas)[:, None]
+        self.n_theta = len(thetas)
+        kmax = self.max_neighbors + n_holes
+        n_cand = self.n_theta * (N_RAD + 1)  # arange may round up to N_RAD + 1 radii
+        self.cand = buffers(5, n_cand, dtype)
+        self.cand_blocked = np.zeros(n_cand, dtype=bool)
+        self.sel = buffers(8, kmax, dtype)
+        self.sel_flags = buffers(4, kmax, bool)
+        self.grid = buffers(5, n_cand * kmax, dtype)
+        self.grid_flags = buffers(4, n_cand * kmax, bool)
+
+    def load(self, X, V):
+        """ Copy positions and velocities into the workspace """
+        np.copyto(self.X, np.asarray(X, dtype=self.dtype).reshape(-1, 2))
+        np.copyto(self.V, np.asarray(V, dtype=self.dtype).reshape(-1, 2))
+
+    def compute_V_des(self, goal, V_max):
+        """ rvo_numpy.compute_V_des into self.V_des; goal (N, 2) and V_max (N,) as float64 arrays """
+        des, norm, tmp, stopped = self.des64, self.norm64, self.tmp64, self.stopped
+        np.subtract(goal, self.X, out=des)
+        np.square(des[:, 0], out=norm)
+        np.square(des[:, 1], out=tmp)
+        np.add(norm, tmp, out=norm)
+        np.sqrt(norm, out=norm)
+        np.add(norm, 0.001, out=norm)
+        np.less(norm, 0.1, out=stopped)
+        np.divide(V_max, norm, out=norm)
+        np.multiply(des[:, 0], norm, out=des[:, 0])
+        np.multiply(des[:, 1], norm, out=des[:, 1])
+        np.copyto(des, 0, where=stopped[:, None])
+        np.copyto(self.V_des, des)
+        return self.V_des
+
+    def set_pairs(self, I, J):
+        """
+        Use the unordered agent pairs (I, J), I < J, and give both cones of every pair a
+        slot in the row of the agent they constrain. Allocates, so it runs once unless
+        the pairs come from neighbor_radius.
+        """
+        m = len(I)
+        owner = np.concatenate([I, J])
+        count = np.bincount(owner, minlength=self.n_agents)
+        if count.max(initial=0) > self.max_neighbors:
+            i = int(np.argmax(count))
+            raise ValueError("Agent %d has %d neighbours, the workspace holds %d; raise max_neighbors"
+                             % (i, count[i], self.max_neighbors))
+        order = np.argsort(owner, kind='stable')
+        slot = np.empty_like(owner)
+        slot[order] = np.arange(2 * m) - np.repeat(np.cumsum(count) - count, count)
+        flat = owner * self.max_neighbors + slot
+        for name, group in self.pair_buffers.items():
+            setattr(self, name, [buf[:m] for buf in group])
+        np.copyto(self.count, count)
+        for buf, values in zip(self.pair_index, (I, J, flat[:m], flat[m:])):
+            np.copyto(buf, values)
+        for coord, half_sum in ((0, self.pair[18]), (1, self.pair[19])):
+            np.add(self.half[I, coord], self.half[J, coord], out=half_sum)
+
+    def build_cones(self):
+        """ Fill the cone buffers from the current X and V """
+        P, V = self.P64, self.V64
+        np.copyto(P, self.X)
+        np.copyto(V, self.V)
+        if self.neighbor_radius is not None:
+            I, J = neighbor_pairs(P, self.neighbor_radius)
+            self.set_pairs(np.minimum(I, J), np.maximum(I, J))
+        I, J, flat_ij, flat_ji = self.pair_index
+        (PIx, PIy, PJx, PJy, VIx, VIy, VJx, VJy, dx, dy, dist, ratio, half_angle, theta, angle, tmp, tmp2, tmp3,
+         half_sum_x, half_sum_y) = self.pair
+        sin_l, cos_l, sin_r, cos_r = self.sides
+        left_ij, right_ij, left_ji, right_ji = self.bounds
+        wrap_ij, wrap_ji, edge = self.pair_flags
+
+        # Each unordered pair once, evaluated from its lower index; j's bound vectors are i's negated
+        for values, coord, out_i, out_j in ((P, 0, PIx, PJx), (P, 1, PIy, PJy), (V, 0, VIx, VJx), (V, 1, VIy, VJy)):
+            np.take(values[:, coord], I, out=out_i, mode='wrap')
+            np.take(values[:, coord], J, out=out_j, mode='wrap')
+        np.subtract(PJx, PIx, out=dx)
+        np.subtract(PJy, PIy, out=dy)
+        self.clearance(dx, dy, half_sum_x, half_sum_y, dist, tmp)
+        np.maximum(dist, self.MIN_SEPARATION, out=dist)
+        np.divide(self.MIN_SEPARATION, dist, out=ratio)
+        np.arcsin(ratio, out=half_angle)
+        np.arctan2(dy, dx, out=theta)
+        for op, s, c, bound_i, bound_j in ((np.add, sin_l, cos_l, left_ij, left_ji),
+                                           (np.subtract, sin_r, cos_r, right_ij, right_ji)):
+            op(theta, half_angle, out=angle)
+            np.sin(angle, out=s)
+            np.cos(angle, out=c)
+            np.arctan2(s, c, out=bound_i)
+            np.negative(s, out=tmp2)
+            np.negative(c, out=tmp3)
+            np.arctan2(tmp2, tmp3, out=bound_j)
+        # Half-plane cones (clearance clamped to the minimum, ratio 1) are redone by
+        # rvo_numpy.pair_cones, which recomputes the knife-edge ones with libm
+        np.greater_equal(ratio, 1, out=edge)
+        if np.count_nonzero(edge):
+            k = np.flatnonzero(edge)
+            sides, bounds = pair_cones(np.stack([dx[k], dy[k]], axis=1), ratio[k])
+            for array, values in zip(self.sides + self.bounds, sides + bounds[0] + bounds[1]):
+                array[k] = values
+        for left, right, wrap in ((left_ij, right_ij, wrap_ij), (left_ji, right_ji, wrap_ji)):
+            np.subtract(right, left, out=tmp)
+            np.abs(tmp, out=tmp)
+            np.greater(tmp, PI, out=wrap)
+
+        # Apex translated by the offset of the mode
+        if self.mode == 'HRVO':
+            self.hrvo_shift()
+        for coord, apex, pI, pJ in ((0, self.apex_x, PIx, PJx), (1, self.apex_y, PIy, PJy)):
+            self.apex_offsets(coord, tmp2, tmp3)
+            np.add(pI, tmp2, out=tmp2)
+            np.add(pJ, tmp3, out=tmp3)
+            np.put(apex, flat_ij, tmp2)
+            np.put(apex, flat_ji, tmp3)
+        for cones, values_ij, values_ji in ((self.left, left_ij, left_ji), (self.right, right_ij, right_ji),
+                                            (self.wrap, wrap_ij, wrap_ji)):
+            np.put(cones, flat_ij, values_ij)
+            np.put(cones, flat_ji, values_ji)
+
+        if self.n_holes > self.n_static:
+            moving = np.asarray(self.ws_model['dynamic_obstacles'], dtype=float)
+            for column, values in ((0, self.hole_x), (1, self.hole_y), (3, self.hole_vx), (4, self.hole_vy)):
+                np.copyto(values[self.n_static:], moving[:, column])
+        if self.n_holes:
+            hdx, hdy, hdist, hratio, hhalf, htheta, hs, hc, htmp = self.hole
+            for coord, d, centre in ((0, hdx, self.hole_x), (1, hdy, self.hole_y)):
+                np.copyto(d, centre[None, :])
+                np.copyto(htmp, P[:, coord:coord + 1])
+                np.subtract(d, htmp, out=d)
+            self.clearance(hdx, hdy, self.hole_half_sum_x, self.hole_half_sum_y, hdist, htmp)
+            np.copyto(htmp, self.hole_rad[None, :])
+            np.maximum(hdist, htmp, out=hdist)
+            np.divide(htmp, hdist, out=hratio)
+            np.arcsin(hratio, out=hhalf)
+            np.arctan2(hdy, hdx, out=htheta)
+            for op, bound in ((np.add, self.hole_left), (np.subtract, self.hole_right)):
+                op(htheta, hhalf, out=htmp)
+                np.sin(htmp, out=hs)
+                np.cos(htmp, out=hc)
+                np.arctan2(hs, hc, out=bound)
+            np.greater_equal(hratio, 1, out=self.hole_edge)
+            if np.count_nonzero(self.hole_edge):
+                edge = self.hole_edge
+                self.hole_left[edge], self.hole_right[edge] = obstacle_cones(np.stack([hdx[edge], hdy[edge]], axis=1),
+                                                                             hratio[edge])
+            np.subtract(self.hole_right, self.hole_left, out=htmp)
+            np.abs(htmp, out=htmp)
+            np.greater(htmp, PI, out=self.hole_wrap)
+
+    def apex_offsets(self, coord, offset_ij, offset_ji):
+        """ Coordinate coord of rvo_numpy.apex_offsets: the apex offsets of every pair from pI and from pJ """
+        if self.mode == 'HRVO':
+            return self.hrvo_offsets(coord, offset_ij, offset_ji)
+        vI, vJ = self.pair[4 + coord], self.pair[6 + coord]
+        if self.mode == 'VO':
+            np.copyto(offset_ij, vJ)
+            np.copyto(offset_ji, vI)
+        else:
+            np.add(vJ, vI, out=offset_ij)
+            np.multiply(offset_ij, 0.5, out=offset_ij)
+            np.copyto(offset_ji, offset_ij)
+
+    def hrvo_shift(self):
+        """ Shift factor, passing side and degenerate pairs of rvo_numpy.apex_offsets for HRVO """
+        VIx, VIy, VJx, VJy, dx, dy = self.pair[4:10]
+        sin_l, cos_l, sin_r, cos_r = self.sides
+        det, wx, wy, s, side, scratch = self.hrvo[:6]
+        left_pass, degenerate = self.hrvo_flags
+        np.multiply(cos_r, sin_l, out=det)
+        np.multiply(sin_r, cos_l, out=scratch)
+        np.subtract(det, scratch, out=det)
+        np.less(det, HRVO_MIN_DET, out=degenerate)
+        np.subtract(VIx, VJx, out=wx)
+        np.subtract(VIy, VJy, out=wy)
+        np.multiply(dx, wy, out=s)
+        np.multiply(dy, wx, out=scratch)
+        np.subtract(s, scratch, out=s)
+        np.greater(s, 0, out=left_pass)
+        np.multiply(wx, sin_l, out=side)
+        np.multiply(wy, cos_l, out=scratch)
+        np.subtract(side, scratch, out=side)
+        np.multiply(side, 0.5, out=side)
+        np.multiply(wx, sin_r, out=s)
+        np.multiply(wy, cos_r, out=scratch)
+        np.subtract(s, scratch, out=s)
+        np.multiply(s, -0.5, out=s)
+        np.copyto(s, side, where=left_pass)
+        np.copyto(det, 1, where=degenerate)
+        np.divide(s, det, out=s)
+
+    def hrvo_offsets(self, coord, offset_ij, offset_ji):
+        """ Coordinate coord of the HRVO apex offsets from pI and from pJ, after hrvo_shift """
+        sin_l, cos_l, sin_r, cos_r = self.sides
+        vI, vJ = self.pair[4 + coord], self.pair[6 + coord]
+        s, side, half_vAB = self.hrvo[3], self.hrvo[4], self.hrvo[6]
+        left_pass, degenerate = self.hrvo_flags
+        np.copyto(side, cos_l if coord == 0 else sin_l)
+        np.copyto(side, cos_r if coord == 0 else sin_r, where=left_pass)
+        np.multiply(s, side, out=side)
+        np.add(vJ, vI, out=half_vAB)
+        np.multiply(half_vAB, 0.5, out=half_vAB)
+        np.add(vJ, side, out=offset_ij)
+        np.copyto(offset_ij, half_vAB, where=degenerate)
+        np.subtract(vI, side, out=offset_ji)
+        np.copyto(offset_ji, half_vAB, where=degenerate)
+
+    @staticmethod
+    def clearance(dx, dy, half_sum_x, half_sum_y, out, scratch):
+        """
+        footprint.box_clearance from the centre offsets. Overlapping boxes come out as
+        0.001 instead of 0, which the MIN_SEPARATION / obstacle radius floor hides.
+        """
+        np.abs(dx, out=out)
+        np.subtract(out, half_sum_x, out=out)
+        np.maximum(out, 0, out=out)
+        np.abs(dy, out=scratch)
+        np.subtract(scratch, half_sum_y, out=scratch)
+        np.maximum(scratch, 0, out=scratch)
+        np.add(out, scratch, out=out)
+        np.add(out, 0.001, out=out)
+
+    def select_velocity(self, V_des=None):
+        """ rvo_numpy.select_velocity for every agent into self.V_new """
+        V_des = self.V_des if V_des is None else V_des
+        for i in range(self.n_agents):
+            if self.search_resolution:
+                vA_post = self.intersect_coarse_to_fine(i, V_des[i])
+            else:
+                vA_post = self.intersect(i, V_des[i])
+            self.V_new[i] = post_velocity(self.X[i], vA_post, self.V[i], self.ws_model)
+        return self.V_new
+
+    def gather_cones(self, i):
+        """ Copy the cones of agent i to the front of the selection buffers and return their count """
+        c = self.count[i]
+        k = c + self.n_holes
+        apex_x, apex_y, left, right = self.sel[:4]
+        wrap = self.sel_flags[0]
+        for buf, cones in ((apex_x, self.apex_x), (apex_y, self.apex_y), (left, self.left), (right, self.right),
+                           (wrap, self.wrap)):
+            np.copyto(buf[:c], cones[i, :c])
+        np.add(self.X[i, 0], self.hole_vx, out=apex_x[c:k])
+        np.add(self.X[i, 1], self.hole_vy, out=apex_y[c:k])
+        np.copyto(left[c:k], self.hole_left[i])
+        np.copyto(right[c:k], self.hole_right[i])
+        np.copyto(wrap[c:k], self.hole_wrap[i])
+        return k
+
+    def intersect(self, i, vA):
+        """ rvo_numpy.intersect of agent i on the workspace buffers """
+        k = self.gather_cones(i)
+        apex_x, apex_y, left, right, rel_x, rel_y = (buf[:k] for buf in self.sel[:6])
+
+        # Candidate grid: the (theta, rad) sweep of rvo_numpy.candidate_grid
+        norm_v = np.sqrt(vA[0] ** 2 + vA[1] ** 2) + 0.001
+        rad = np.arange(0.02, norm_v + 0.02, norm_v / N_RAD, dtype=self.dtype)
+        shape = (self.n_theta, len(rad))
+        cx, cy, err, dist, tmp = (view(buf, shape) for buf in self.cand)
+        blocked = view(self.cand_blocked, shape)
+        np.copyto(tmp, rad)
+        np.copyto(cx, self.cos_t)
+        np.multiply(cx, tmp, out=cx)
+        np.copyto(cy, self.sin_t)
+        np.multiply(cy, tmp, out=cy)
+
+        # Direction of every candidate relative to every cone apex
+        np.subtract(self.X[i, 0], apex_x, out=rel_x)
+        np.subtract(self.X[i, 1], apex_y, out=rel_y)
+        shape = shape + (k,)
+        dx, dy, scratch = (view(buf, shape) for buf in self.grid[:3])
+        for d, cand, rel in ((dx, cx, rel_x), (dy, cy, rel_y)):
+            np.copyto(d, cand[:, :, None])
+            np.copyto(scratch, rel)
+            np.add(d, scratch, out=d)
+        theta_dif = np.arctan2(dy, dx, out=dx)
+
+        inside = self.in_between(right, theta_dif, left, self.sel_flags[0][:k])
+        np.logical_or.reduce(inside, axis=2, out=blocked)
+
+        # Closest admissible candidate to vA, or the closest one overall
+        np.subtract(cx, vA[0], out=err)
+        np.square(err, out=err)
+        np.subtract(cy, vA[1], out=dist)
+        np.square(dist, out=dist)
+        np.add(err, dist, out=dist)
+        np.sqrt(dist, out=dist)
+        np.add(dist, 0.001, out=dist)
+        if np.count_nonzero(blocked) < blocked.size:
+            np.copyto(dist, np.inf, where=blocked)
+        best = np.argmin(dist)
+        return [cx.flat[best], cy.flat[best]]
+
+    def intersect_coarse_to_fine(self, i, vA):
+        """ rvo_numpy.intersect_coarse_to_fine of agent i; allocates like the numpy backend's search """
+        k = self.gather_cones(i)
+        apex_x, apex_y, left, right = (buf[:k] for buf in self.sel[:4])
+        return list(intersect_coarse_to_fine(self.X[i], vA, np.stack([apex_x, apex_y], axis=1), left, right,
+                                             self.sel_flags[0][:k], self.search_resolution))
+
+    def in_between(self, theta_right, theta_dif, theta_left, wrap):
+        """
+        rvo_numpy.in_between on the workspace buffers; theta_right/left hold one angle per
+        cone and wrap the branch taken by each cone
+        """
+        shape = theta_dif.shape
+        k = shape[-1]
+        left_neg, left_pos, flag = (buf[:k] for buf in self.sel_flags[1:])
+        left2, right2 = (buf[:k] for buf in self.sel[6:8])
+        # grid[0] holds theta_dif, the other grid buffers are free again
+        right_full, left_full, wrapped, shifted = (view(buf, shape) for buf in self.grid[1:5])
+        inside, a, b, c = (view(buf, shape) for buf in self.grid_flags)
+
+        # Plain case
+        np.copyto(right_full, theta_right)
+        np.copyto(left_full, theta_left)
+        np.less_equal(right_full, theta_dif, out=a)
+        np.less_equal(theta_dif, left_full, out=b)
+        np.logical_and(a, b, out=inside)
+        if not np.count_nonzero(wrap):
+            return inside
+
+        # Cones across the +-pi seam
+        np.copyto(wrapped, theta_dif)
+        np.less(theta_dif, 0, out=a)
+        np.add(theta_dif, 2 * PI, out=shifted)
+        np.copyto(wrapped, shifted, where=a)
+        np.add(theta_left, 2 * PI, out=left2)
+        np.add(theta_right, 2 * PI, out=right2)
+
+        np.less(theta_left, 0, out=left_neg)
+        np.greater(theta_right, 0, out=flag)
+        np.logical_and(left_neg, flag, out=left_neg)
+        np.logical_not(left_neg, out=flag)
+        np.less_equal(right_full, wrapped, out=a)
+        np.copyto(right_full, left2)
+        np.less_equal(wrapped, right_full, out=b)
+        np.logical_and(a, b, out=a)
+        np.copyto(a, False, where=flag)
+
+        np.greater(theta_left, 0, out=left_pos)
+        np.less(theta_right, 0, out=flag)
+        np.logical_and(left_pos, flag, out=left_pos)
+        np.logical_not(left_pos, out=flag)
+        np.less_equal(left_full, wrapped, out=b)
+        np.copyto(left_full, right2)
+        np.less_equal(wrapped, left_full, out=c)
+        np.logical_and(b, c, out=b)
+        np.copyto(b, False, where=flag)
+
+        np.logical_or(a, b, out=a)
+        np.copyto(inside, a, where=wrap)
+        return inside
+
+    def update(self, V_des=None):
+        """ One RVO step: build the cones, select velocities and store them in self.V """
+        self.build_cones()
+        self.select_velocity(V_des)
+        np.copyto(self.V, self.V_new)
+        return self.V
+
+    def advance(self, step):
+        """ Move the agents by self.V * step in place """
+        return update_positions(self.X, self.V, step, out=self.X, scratch=self.move)
+
+
+def tick_allocations(n_agents=40, ticks=10, warmup=3, seed=0, mode='RVO'):
+    """
+    Peak bytes traced by tracemalloc during `ticks` steady-state ticks of a random
+    scenario, for the Workspace and for the numpy backend driven through RVO_update.
+    """
+    from RVO import RVO_update
+    from rvo_numpy import compute_V_des
+
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 20 * n_agents ** 0.5, (n_agents, 2))
+    goal = rng.uniform(0, 20 * n_agents ** 0.5, (n_agents, 2))
+    V_max = np.full(n_agents, 2.0)
+    ws_model = {'robot_radius': 0.5, 'circular_obstacles': [[0.0, 0.0, 1.0]], 'boundary': [],
+                'backend': 'numpy', 'mode': mode}
+    step = 0.1
+
+    work = Workspace(n_agents, ws_model)
+    work.load(X, np.zeros_like(X))
+
+    def workspace_tick():
+        work.compute_V_des(goal, V_max)
+        work.update()
+        work.advance(step)
+
+    state = {'X': X.tolist(), 'V': np.zeros_like(X).tolist()}
+
+    def backend_tick():
+        V = RVO_update(state['X'], compute_V_des(state['X'], goal, V_max), state['V'], ws_model)
+        state['X'] = [[p[0] + v[0] * step, p[1] + v[1] * step] for p, v in zip(state['X'], V)]
+        state['V'] = V
+
+    report = {}
+    for name, tick in (('workspace', workspace_tick), ('numpy', backend_tick)):
+        for _ in range(warmup):
+            tick()
+        tracemalloc.start()
+        for _ in range(ticks):
+            tick()
+        report[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return report
+
+
+if __name__ == '__main__':
+    # The views and scalars a tick creates on the way; a constant, whatever the agent count
+    LIMIT = 8192
+    failed = False
+    for mode in MODES:
+        report = tick_allocations(mode=mode)
+        for name, peak in report.items():
+            print('%-4s %-10s peak %8d bytes over the steady-state ticks' % (mode, name, peak))
+        if report['workspace'] > LIMIT:
+            print('%s workspace allocates more than %d bytes per tick' % (mode, LIMIT))
+            failed = True
+    sys.exit(1 if failed else 0)